@@ -0,0 +1,64 @@
+"""add active slot unique index on appointments
+
+Revision ID: a3f1c9d2e7b4
+Revises: 5ffb3388dc44
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c9d2e7b4'
+down_revision: Union[str, Sequence[str], None] = '5ffb3388dc44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_SLOT_PREDICATE = "lower(coalesce(status, 'pending')) NOT IN ('cancelled', 'cancelado', 'canceled')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Agendamentos duplicados já existentes impediriam a criação do índice.
+    # Nenhum agendamento é alterado aqui: a migração para e lista os horários
+    # em conflito para que sejam resolvidos à mão antes de rodar de novo.
+    duplicates = op.get_bind().execute(sa.text(f"""
+        SELECT id, user_id, appointment_date, appointment_time FROM (
+            SELECT id, user_id, appointment_date, appointment_time, COUNT(*) OVER (
+                PARTITION BY user_id, appointment_date, appointment_time
+            ) AS appointments
+            FROM appointments
+            WHERE {ACTIVE_SLOT_PREDICATE}
+        ) AS counted
+        WHERE counted.appointments > 1
+        ORDER BY user_id, appointment_date, appointment_time, id
+    """)).all()
+    if duplicates:
+        ids_by_slot = {}
+        for row in duplicates:
+            ids_by_slot.setdefault((row.user_id, row.appointment_date, row.appointment_time), []).append(row.id)
+        slots = "\n".join(
+            f"  user_id={user_id} {day} {start}: ids {', '.join(map(str, ids))}"
+            for (user_id, day, start), ids in ids_by_slot.items()
+        )
+        raise RuntimeError(
+            "Há agendamentos ativos no mesmo horário do mesmo profissional; cancele ou "
+            f"remarque os excedentes antes de criar uq_appointments_active_slot:\n{slots}"
+        )
+    op.create_index(
+        'uq_appointments_active_slot',
+        'appointments',
+        ['user_id', 'appointment_date', 'appointment_time'],
+        unique=True,
+        postgresql_where=sa.text(ACTIVE_SLOT_PREDICATE),
+        sqlite_where=sa.text(ACTIVE_SLOT_PREDICATE),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_appointments_active_slot', table_name='appointments')
@@ -0,0 +1,57 @@
+"""add appointment price snapshot
+
+Revision ID: a7c3e9f1b2d4
+Revises: f2b7d4a6c1e9
+Create Date: 2026-10-18 20:05:12.418350
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f1b2d4'
+down_revision: Union[str, Sequence[str], None] = 'f2b7d4a6c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('appointments', sa.Column('price', sa.Float(), nullable=True))
+    op.add_column('appointments', sa.Column('duration_minutes', sa.Integer(), nullable=True))
+    # Agendamentos existentes ficam com o preço e a duração atuais do serviço.
+    op.execute("""
+        UPDATE appointments
+        SET price = (SELECT services.price FROM services WHERE services.id = appointments.service_id),
+            duration_minutes = (SELECT services.duration_minutes FROM services
+                                WHERE services.id = appointments.service_id)
+    """)
+    # Receita e minutos do resumo passam a vir desses valores: recalcula.
+    op.execute("""
+        UPDATE schedule_day_summaries
+        SET revenue = coalesce((
+                SELECT SUM(coalesce(appointments.price, 0))
+                FROM appointments
+                WHERE appointments.user_id = schedule_day_summaries.user_id
+                  AND appointments.appointment_date = schedule_day_summaries.day
+                  AND lower(coalesce(appointments.status, 'pending'))
+                      NOT IN ('cancelled', 'cancelado', 'canceled')
+            ), 0),
+            booked_minutes = coalesce((
+                SELECT SUM(coalesce(appointments.duration_minutes, 0))
+                FROM appointments
+                WHERE appointments.user_id = schedule_day_summaries.user_id
+                  AND appointments.appointment_date = schedule_day_summaries.day
+                  AND lower(coalesce(appointments.status, 'pending'))
+                      NOT IN ('cancelled', 'cancelado', 'canceled')
+            ), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('appointments', 'duration_minutes')
+    op.drop_column('appointments', 'price')
@@ -0,0 +1,59 @@
+"""add composite lookup indexes
+
+Revision ID: b7d2e4f1a9c3
+Revises: a3f1c9d2e7b4
+Create Date: 2026-10-18 11:02:07.554913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f1a9c3'
+down_revision: Union[str, Sequence[str], None] = 'a3f1c9d2e7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY no Postgres para não bloquear escritas em tabelas grandes;
+    # exige rodar fora da transação da migração.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_appointments_user_date_status',
+            'appointments',
+            ['user_id', 'appointment_date', 'status'],
+            postgresql_include=['appointment_time', 'service_id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_availabilities_user_day',
+            'availabilities',
+            ['user_id', 'day_of_week'],
+            postgresql_include=['start_time', 'end_time'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_services_organization_id'),
+            'services',
+            ['organization_id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_users_organization_id'),
+            'users',
+            ['organization_id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_organization_id'), table_name='users')
+    op.drop_index(op.f('ix_services_organization_id'), table_name='services')
+    op.drop_index('ix_availabilities_user_day', table_name='availabilities')
+    op.drop_index('ix_appointments_user_date_status', table_name='appointments')
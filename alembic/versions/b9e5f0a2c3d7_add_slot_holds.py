@@ -0,0 +1,44 @@
+"""add slot holds
+
+Revision ID: b9e5f0a2c3d7
+Revises: a7c3e9f1b2d4
+Create Date: 2026-10-18 20:48:31.502716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e5f0a2c3d7'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9f1b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'slot_holds',
+        sa.Column('token', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('start_time', sa.Time(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('token'),
+    )
+    op.create_index('ix_slot_holds_user_day', 'slot_holds', ['user_id', 'day'], unique=False)
+    op.create_index('ix_slot_holds_expires_at', 'slot_holds', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_slot_holds_expires_at', table_name='slot_holds')
+    op.drop_index('ix_slot_holds_user_day', table_name='slot_holds')
+    op.drop_table('slot_holds')
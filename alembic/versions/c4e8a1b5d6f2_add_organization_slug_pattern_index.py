@@ -0,0 +1,33 @@
+"""add organization slug pattern index
+
+Revision ID: c4e8a1b5d6f2
+Revises: b7d2e4f1a9c3
+Create Date: 2026-10-18 14:26:53.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1b5d6f2'
+down_revision: Union[str, Sequence[str], None] = 'b7d2e4f1a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_organizations_slug_pattern',
+        'organizations',
+        ['slug'],
+        postgresql_ops={'slug': 'text_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_organizations_slug_pattern', table_name='organizations')
@@ -0,0 +1,61 @@
+"""add schedule day summaries
+
+Revision ID: d5f9b2c7e8a1
+Revises: c4e8a1b5d6f2
+Create Date: 2026-10-18 15:02:11.417305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f9b2c7e8a1'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1b5d6f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'schedule_day_summaries',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('appointments', sa.Integer(), nullable=False),
+        sa.Column('cancelled', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('booked_minutes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('organization_id', 'day', 'user_id'),
+    )
+    # Preenche o resumo com o histórico já existente.
+    op.execute("""
+        INSERT INTO schedule_day_summaries
+            (organization_id, day, user_id, appointments, cancelled, revenue, booked_minutes)
+        SELECT users.organization_id, appointments.appointment_date, appointments.user_id,
+               SUM(CASE WHEN lower(coalesce(appointments.status, 'pending'))
+                             NOT IN ('cancelled', 'cancelado', 'canceled') THEN 1 ELSE 0 END),
+               SUM(CASE WHEN lower(coalesce(appointments.status, 'pending'))
+                             IN ('cancelled', 'cancelado', 'canceled') THEN 1 ELSE 0 END),
+               SUM(CASE WHEN lower(coalesce(appointments.status, 'pending'))
+                             NOT IN ('cancelled', 'cancelado', 'canceled')
+                        THEN coalesce(services.price, 0) ELSE 0 END),
+               SUM(CASE WHEN lower(coalesce(appointments.status, 'pending'))
+                             NOT IN ('cancelled', 'cancelado', 'canceled')
+                        THEN coalesce(services.duration_minutes, 0) ELSE 0 END)
+        FROM appointments
+        JOIN users ON users.id = appointments.user_id
+        LEFT OUTER JOIN services ON services.id = appointments.service_id
+        WHERE users.organization_id IS NOT NULL
+        GROUP BY users.organization_id, appointments.appointment_date, appointments.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('schedule_day_summaries')
@@ -0,0 +1,49 @@
+"""add appointment status summaries
+
+Revision ID: e6a0c3d8f9b2
+Revises: d5f9b2c7e8a1
+Create Date: 2026-10-18 16:40:27.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a0c3d8f9b2'
+down_revision: Union[str, Sequence[str], None] = 'd5f9b2c7e8a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'appointment_status_summaries',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('appointments', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('organization_id', 'day', 'user_id', 'status'),
+    )
+    # Preenche com o histórico já existente.
+    op.execute("""
+        INSERT INTO appointment_status_summaries (organization_id, day, user_id, status, appointments)
+        SELECT users.organization_id, appointments.appointment_date, appointments.user_id,
+               lower(coalesce(appointments.status, 'pending')), COUNT(*)
+        FROM appointments
+        JOIN users ON users.id = appointments.user_id
+        WHERE users.organization_id IS NOT NULL
+        GROUP BY users.organization_id, appointments.appointment_date, appointments.user_id,
+                 lower(coalesce(appointments.status, 'pending'))
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('appointment_status_summaries')
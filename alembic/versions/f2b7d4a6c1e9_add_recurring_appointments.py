@@ -0,0 +1,70 @@
+"""add recurring appointments
+
+Revision ID: f2b7d4a6c1e9
+Revises: e6a0c3d8f9b2
+Create Date: 2026-10-18 18:12:44.170392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d4a6c1e9'
+down_revision: Union[str, Sequence[str], None] = 'e6a0c3d8f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'recurring_appointments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False),
+        sa.Column('client_name', sa.String(length=100), nullable=True),
+        sa.Column('client_email', sa.String(length=100), nullable=True),
+        sa.Column('client_phone', sa.String(length=20), nullable=True),
+        sa.Column('day_of_week', sa.Integer(), nullable=False),
+        sa.Column('appointment_time', sa.Time(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('interval_weeks', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['service_id'], ['services.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_recurring_appointments_id'), 'recurring_appointments', ['id'], unique=False)
+    op.create_index('ix_recurring_appointments_user_day', 'recurring_appointments',
+                    ['user_id', 'day_of_week'], unique=False)
+
+    op.create_table(
+        'recurrence_exceptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recurring_id', sa.Integer(), nullable=False),
+        sa.Column('original_date', sa.Date(), nullable=False),
+        sa.Column('cancelled', sa.Boolean(), nullable=False),
+        sa.Column('new_date', sa.Date(), nullable=True),
+        sa.Column('new_time', sa.Time(), nullable=True),
+        sa.ForeignKeyConstraint(['recurring_id'], ['recurring_appointments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_recurrence_exceptions_id'), 'recurrence_exceptions', ['id'], unique=False)
+    op.create_index('uq_recurrence_exceptions_occurrence', 'recurrence_exceptions',
+                    ['recurring_id', 'original_date'], unique=True)
+    op.create_index('ix_recurrence_exceptions_recurring_new_date', 'recurrence_exceptions',
+                    ['recurring_id', 'new_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recurrence_exceptions_recurring_new_date', table_name='recurrence_exceptions')
+    op.drop_index('uq_recurrence_exceptions_occurrence', table_name='recurrence_exceptions')
+    op.drop_index(op.f('ix_recurrence_exceptions_id'), table_name='recurrence_exceptions')
+    op.drop_table('recurrence_exceptions')
+    op.drop_index('ix_recurring_appointments_user_day', table_name='recurring_appointments')
+    op.drop_index(op.f('ix_recurring_appointments_id'), table_name='recurring_appointments')
+    op.drop_table('recurring_appointments')
@@ -1,15 +1,20 @@
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app import models, schemas, crud, database
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload
+from app import models, schemas, crud, database, metrics
+from app.cache import TTLCache
 
 load_dotenv()
 
@@ -17,16 +22,56 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Modo "stateless": o principal é montado a partir das claims do JWT e a
+# verificação de usuário/organização ativos fica num cache por worker.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "true").lower() in ("1", "true", "yes")
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Alterar BCRYPT_ROUNDS faz os hashes antigos serem refeitos no próximo login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# --- POOL DE HASHING ---
+# O bcrypt libera o GIL, então um pool de threads pequeno basta para limitar
+# quanta CPU o hashing consome por worker. Além dos que estão executando,
+# no máximo PASSWORD_HASH_QUEUE chamadas esperam na fila; acima disso (ou
+# depois de PASSWORD_HASH_QUEUE_TIMEOUT segundos) a requisição recebe 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+def _run_password_job(fn, *args):
+    if not _password_slots.acquire(timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return _password_executor.submit(fn, *args).result()
+    finally:
+        _password_slots.release()
+
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_password_job(pwd_context.verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password, hashed_password):
+    # Devolve (válida, novo_hash); novo_hash só vem quando o custo configurado mudou.
+    return _run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password):    
-    return pwd_context.hash(password)
+    return _run_password_job(pwd_context.hash, password)
 
 def create_access_token(data: dict):
     to_code = data.copy()
@@ -36,29 +81,118 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_code, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais.",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = crud.get_user_by_email(db, email=email)
-    if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+def _check_organization_active(user: models.User):
     if user.organization_id and user.organization:
         if not user.organization.is_active:
             raise HTTPException(
                  status_code=403, 
                  detail="Sua barbearia está suspensa. Entre em contato com o suporte."
              )
-            
-    return user
\ No newline at end of file
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    payload = _decode_token(token)
+
+    user = crud.get_user_by_email(db, email=payload["sub"])
+    if user is None:
+        raise _credentials_exception()
+
+    _check_organization_active(user)
+    return user
+
+
+# --- PRINCIPAL LEVE (SEM CONSULTA AO BANCO) ---
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    role: models.UserRole
+    organization_id: int = None
+
+
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(email: str):
+    _principal_cache.delete(email)
+
+
+def invalidate_organization(organization_id: int):
+    _principal_cache.delete_where(lambda _, principal: principal.organization_id == organization_id)
+
+
+def _load_principal(db: Session, email: str):
+    user = db.query(models.User)\
+             .options(joinedload(models.User.organization))\
+             .filter(models.User.email == email)\
+             .first()
+    if user is None:
+        return None
+
+    _check_organization_active(user)
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        role=models.UserRole(user.role),
+        organization_id=user.organization_id,
+    )
+    _principal_cache.set(email, principal)
+    return principal
+
+
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    # Com AUTH_STATELESS desligado devolve o próprio models.User.
+    if not AUTH_STATELESS:
+        return get_current_user(token=token, db=db)
+
+    payload = _decode_token(token)
+    if "role" not in payload or "org_id" not in payload:
+        # Tokens antigos sem as claims necessárias seguem o caminho completo.
+        return get_current_user(token=token, db=db)
+
+    email = payload["sub"]
+    principal = _principal_cache.get(email)
+    metrics.record_cache_lookup("principal", principal is not None)
+    if principal is None:
+        principal = _load_principal(db, email)
+        if principal is None:
+            raise _credentials_exception()
+
+    # Claims desatualizadas (papel ou barbearia alterados) invalidam o token.
+    if principal.role.value != payload["role"] or principal.organization_id != payload["org_id"]:
+        raise _credentials_exception()
+
+    return principal
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _on_user_changed(mapper, connection, target):
+    invalidate_user(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        invalidate_user(old_email)
+
+
+@event.listens_for(models.Organization, "after_update")
+@event.listens_for(models.Organization, "after_delete")
+def _on_organization_changed(mapper, connection, target):
+    invalidate_organization(target.id)
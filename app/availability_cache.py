@@ -0,0 +1,108 @@
+import hashlib
+import os
+import uuid
+from datetime import date
+
+from fastapi import Request, Response
+
+from app import metrics
+from app.cache import TTLCache, load_backend
+
+# Cache das respostas de GET /appointments/available/.
+#
+# A chave de cada resposta carrega três "gerações": a do dia do barbeiro
+# (muda com agendamentos), a do barbeiro (muda com disponibilidades) e a da
+# barbearia (muda com a duração dos serviços). Invalidar é só trocar a
+# geração; as entradas antigas ficam inalcançáveis e expiram sozinhas.
+#
+# O backend padrão é um LRU local ao worker. Com vários workers, aponte
+# SLOTS_CACHE_BACKEND para um backend compartilhado (subclasse de
+# app.cache.CacheBackend) para que a invalidação valha para todos.
+
+SLOTS_CACHE_ENABLED = os.getenv("SLOTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOTS_CACHE_TTL_SECONDS = float(os.getenv("SLOTS_CACHE_TTL_SECONDS", "30"))
+SLOTS_CACHE_MAXSIZE = int(os.getenv("SLOTS_CACHE_MAXSIZE", "20000"))
+SLOTS_CACHE_BACKEND = os.getenv("SLOTS_CACHE_BACKEND")
+
+# Gerações vivem mais que as respostas, para a chave de um dia sem mudanças
+# continuar a mesma. Uma geração que sumiu (vencida ou despejada pelo LRU)
+# nunca volta a um valor antigo: vira uma geração nova.
+GENERATION_TTL_SECONDS = SLOTS_CACHE_TTL_SECONDS * 10
+
+if SLOTS_CACHE_BACKEND:
+    backend = load_backend(SLOTS_CACHE_BACKEND)
+else:
+    backend = TTLCache(maxsize=SLOTS_CACHE_MAXSIZE, ttl=SLOTS_CACHE_TTL_SECONDS)
+
+
+def _generation(scope: str) -> str:
+    return backend.get(f"slots:gen:{scope}") or _bump(scope)
+
+
+def _bump(scope: str) -> str:
+    generation = uuid.uuid4().hex
+    backend.set(f"slots:gen:{scope}", generation, ttl=GENERATION_TTL_SECONDS)
+    return generation
+
+
+def cache_key(user_id: int, organization_id: int, query_date: date, service_id: int, step: int) -> str:
+    day = query_date.isoformat()
+    return ":".join((
+        "slots", str(user_id), day, str(service_id), str(step),
+        _generation(f"day:{user_id}:{day}"),
+        _generation(f"user:{user_id}"),
+        _generation(f"org:{organization_id}"),
+    ))
+
+
+def make_etag(slots) -> str:
+    digest = hashlib.blake2b(",".join(slots).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get(key: str):
+    # Devolve (etag, [horários ISO]) ou None.
+    if not SLOTS_CACHE_ENABLED:
+        return None
+    entry = backend.get(key)
+    metrics.record_cache_lookup("slots", entry is not None)
+    return entry
+
+
+def store(key: str, available_times):
+    slots = [value.isoformat() for value in available_times]
+    entry = (make_etag(slots), slots)
+    if SLOTS_CACHE_ENABLED:
+        backend.set(key, entry, ttl=SLOTS_CACHE_TTL_SECONDS)
+    return entry
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def respond(request: Request, response: Response, entry):
+    # 304 sem corpo quando o cliente já tem esta versão dos horários.
+    etag, slots = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return slots
+
+
+# --- INVALIDAÇÃO ---
+
+def invalidate_day(user_id: int, query_date: date):
+    _bump(f"day:{user_id}:{query_date.isoformat()}")
+
+
+def invalidate_user(user_id: int):
+    _bump(f"user:{user_id}")
+
+
+def invalidate_organization(organization_id: int):
+    _bump(f"org:{organization_id}")
@@ -0,0 +1,114 @@
+import codecs
+import csv
+import io
+import json
+from datetime import date, time
+
+from pydantic import ValidationError
+
+from app import crud, schemas
+
+# Importação/exportação em lote de agendamentos (CSV ou NDJSON).
+# Cada linha do arquivo é um registro; campos CSV com quebra de linha
+# não são suportados.
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_FIELDS = crud.EXPORT_COLUMNS
+CSV_MEDIA_TYPE = "text/csv"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def detect_format(content_type: str, requested: str = None) -> str:
+    if requested:
+        return requested
+    return "csv" if CSV_MEDIA_TYPE in (content_type or "") else "ndjson"
+
+
+async def iter_lines(chunks):
+    # Junta os pedaços do corpo da requisição e devolve uma linha por vez, ainda
+    # em bytes: a decodificação fica no RowParser, que sabe o número da linha.
+    # O BOM só é retirado do começo do arquivo.
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if first:
+                line = line.removeprefix(codecs.BOM_UTF8)
+                first = False
+            yield line
+    if pending:
+        yield pending.removeprefix(codecs.BOM_UTF8) if first else pending
+
+
+class RowParser:
+    """Converte linhas do arquivo em (número_da_linha, AppointmentCreate, extras) ou erro."""
+
+    def __init__(self, file_format: str):
+        self.file_format = file_format
+        self.header = None
+        self.line_number = 0
+
+    def parse(self, raw: bytes):
+        self.line_number += 1
+        try:
+            line = raw.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError as exc:
+            return {"line": self.line_number, "detail": f"linha não está em UTF-8: {exc.reason}"}
+        if not line.strip():
+            return None
+        try:
+            if self.file_format == "csv":
+                values = next(csv.reader([line]))
+                if self.header is None:
+                    self.header = [name.strip() for name in values]
+                    return None
+                record = {name: value for name, value in zip(self.header, values) if value != ""}
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("cada linha deve ser um objeto JSON")
+            appointment = schemas.AppointmentCreate(**record)
+            extras = {
+                "user_id": int(record["user_id"]) if record.get("user_id") not in (None, "") else None,
+                "status": record.get("status") or "pending",
+            }
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )
+            return {"line": self.line_number, "detail": detail}
+        except (ValueError, TypeError) as exc:
+            return {"line": self.line_number, "detail": str(exc)}
+        return (self.line_number, appointment, extras)
+
+
+def _export_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([_export_value(getattr(row, name)) for name in EXPORT_FIELDS])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({name: _export_value(getattr(row, name)) for name in EXPORT_FIELDS}))
+        if len(lines) >= 1000:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
@@ -0,0 +1,76 @@
+import importlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Interface mínima de um backend de cache (local ou compartilhado entre workers).
+
+    Chaves são strings e valores precisam ser serializáveis em JSON, para que
+    um backend compartilhado (Redis, memcached...) possa ser plugado.
+    """
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+def load_backend(path: str, **options) -> CacheBackend:
+    # "pacote.modulo:Classe" ou "pacote.modulo.Classe"
+    module_name, _, class_name = path.replace(":", ".").rpartition(".")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(**options)
+
+
+class TTLCache(CacheBackend):
+    """Cache LRU limitado em tamanho, com expiração por tempo (por worker)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -1,11 +1,59 @@
-from sqlalchemy.orm import Session
-from app import models, schemas, auth
+from sqlalchemy import and_, case, delete, func, insert, literal, null, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app import models, schemas, auth, slots, availability_cache, metrics, schedule, slot_events, holds, recurrence
+from slugify import slugify
 
-from datetime import datetime, date, timedelta
+import logging
+import os
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
 
 
 def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+    # O login e a autenticação sempre olham a organização: carrega no mesmo SELECT.
+    return db.query(models.User)\
+             .options(joinedload(models.User.organization))\
+             .filter(models.User.email == email)\
+             .first()
+
+
+# --- LEITURAS PROJETADAS ---
+# As listagens podem trazer só as colunas do schema de resposta, como tuplas
+# nomeadas: sem objetos ORM, identity map nem rastreamento de mudanças.
+
+def schema_columns(schema, model, **expressions):
+    # Colunas na ordem dos campos do schema; `expressions` substitui a coluna
+    # de um campo calculado.
+    return tuple(
+        expressions[name].label(name) if name in expressions else getattr(model, name)
+        for name in schema.model_fields
+    )
+
+
+SERVICE_READ_COLUMNS = schema_columns(schemas.Service, models.Service)
+TEAM_READ_COLUMNS = schema_columns(schemas.UserResponse, models.User)
+AVAILABILITY_READ_COLUMNS = schema_columns(schemas.Availability, models.Availability)
+APPOINTMENT_READ_COLUMNS = schema_columns(schemas.AppointmentListItem, models.Appointment, recurring_id=null())
+AppointmentItem = namedtuple("AppointmentItem", schemas.AppointmentListItem.model_fields)
+
+
+def _fetch(db: Session, stmt, columns):
+    if columns:
+        return db.execute(stmt).all()
+    return db.scalars(stmt).all()
+
+
+def get_users_by_organization(db: Session, organization_id: int, after_id: int = None, limit: int = 100,
+                              columns=None):
+    stmt = select(*columns) if columns else select(models.User)
+    stmt = stmt.where(models.User.organization_id == organization_id)
+    if after_id is not None:
+        stmt = stmt.where(models.User.id > after_id)
+    return _fetch(db, stmt.order_by(models.User.id).limit(limit), columns)
 
 
 def create_user(db: Session, user: schemas.UserCreate):
@@ -15,10 +63,75 @@ def create_user(db: Session, user: schemas.UserCreate):
 
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
 
     return db_user
 
+# --- CADASTRO DE BARBEARIA + DONO ---
+
+class EmailAlreadyRegisteredError(Exception):
+    pass
+
+
+SIGNUP_ATTEMPTS = 5
+
+
+def existing_slugs_query(base_slug: str):
+    # slugify só gera [a-z0-9-], então o prefixo não tem curingas do LIKE.
+    return select(models.Organization.slug).where(
+        or_(models.Organization.slug == base_slug,
+            models.Organization.slug.like(f"{base_slug}-%"))
+    )
+
+
+def next_free_slug(base_slug: str, existing: set) -> str:
+    if base_slug not in existing:
+        return base_slug
+    prefix = f"{base_slug}-"
+    used = {
+        int(slug[len(prefix):])
+        for slug in existing
+        if slug.startswith(prefix) and slug[len(prefix):].isdigit()
+    }
+    counter = 1
+    while counter in used:
+        counter += 1
+    return f"{prefix}{counter}"
+
+
+def create_organization_with_owner(db: Session, user: schemas.UserCreate, hashed_password: str):
+    base_slug = slugify(user.organization_name) or "barbearia"
+
+    # Uma consulta traz todos os slugs "base" e "base-N"; o sufixo livre é
+    # escolhido em memória. Se outro cadastro levar o mesmo slug antes do
+    # commit, o índice único recusa e tentamos de novo.
+    for attempt in range(SIGNUP_ATTEMPTS):
+        slug = next_free_slug(base_slug, set(db.scalars(existing_slugs_query(base_slug))))
+        new_org = models.Organization(
+            name=user.organization_name,
+            slug=slug,
+            plan_type="free",
+            is_active=True
+        )
+        new_user = models.User(
+            email=user.email,
+            name=user.name,
+            hashed_password=hashed_password,
+            organization=new_org,
+            role=models.UserRole.OWNER,
+            is_active=True
+        )
+        db.add(new_user)
+        try:
+            db.commit()
+            return new_user
+        except IntegrityError:
+            db.rollback()
+            if get_user_by_email(db, email=user.email):
+                raise EmailAlreadyRegisteredError()
+            if attempt == SIGNUP_ATTEMPTS - 1:
+                raise
+
+
 def get_services(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Service).offset(skip).limit(limit).all()
 
@@ -31,15 +144,15 @@ def create_service(db: Session, service: schemas.ServiceCreate, organization_id:
     )
     db.add(db_service)
     db.commit()
-    db.refresh(db_service)
     return db_service
 
-def get_services_by_organization(db: Session, organization_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Service)\
-             .filter(models.Service.organization_id == organization_id)\
-             .offset(skip)\
-             .limit(limit)\
-             .all()
+def get_services_by_organization(db: Session, organization_id: int, after_id: int = None, limit: int = 100,
+                                 columns=None):
+    stmt = select(*columns) if columns else select(models.Service)
+    stmt = stmt.where(models.Service.organization_id == organization_id)
+    if after_id is not None:
+        stmt = stmt.where(models.Service.id > after_id)
+    return _fetch(db, stmt.order_by(models.Service.id).limit(limit), columns)
              
 def get_service_by_id(db: Session, service_id: int, organization_id: int= None):
     return db.query(models.Service).filter(
@@ -54,7 +167,8 @@ def update_service(db: Session, service_id: int, service: schemas.ServiceUpdate,
         for key, value in update_data.items():
             setattr(db_service, key, value)
         db.commit()
-        db.refresh(db_service)
+        availability_cache.invalidate_organization(organization_id)
+        slot_events.services_changed(organization_id)
     return db_service
 
 def delete_service(db: Session,
@@ -64,6 +178,8 @@ def delete_service(db: Session,
     if db_service:
         db.delete(db_service)
         db.commit()
+        availability_cache.invalidate_organization(organization_id)
+        slot_events.services_changed(organization_id)
     return db_service
           
 
@@ -76,13 +192,17 @@ def create_availability(db: Session, availability: schemas.AvailabilityCreate, u
     )
     db.add(db_availability)
     db.commit()
-    db.refresh(db_availability)
+    availability_cache.invalidate_user(user_id)
+    slot_events.availability_changed(user_id)
     return db_availability
 
-def get_availabilities_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Availability).filter(
-        models.Availability.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def get_availabilities_by_user(db: Session, user_id: int, after_id: int = None, limit: int = 100,
+                               columns=None):
+    stmt = select(*columns) if columns else select(models.Availability)
+    stmt = stmt.where(models.Availability.user_id == user_id)
+    if after_id is not None:
+        stmt = stmt.where(models.Availability.id > after_id)
+    return _fetch(db, stmt.order_by(models.Availability.id).limit(limit), columns)
 
 def delete_availability(db: Session, availability_id: int, user_id: int):
     db_availability = db.query(models.Availability).filter(
@@ -93,51 +213,215 @@ def delete_availability(db: Session, availability_id: int, user_id: int):
     if db_availability:
         db.delete(db_availability)
         db.commit()
+        availability_cache.invalidate_user(user_id)
+        slot_events.availability_changed(user_id)
     return db_availability
 
 # --- CRUD DE AGENDAMENTOS (APPOINTMENTS) ---
-def create_appointment(db: Session, appointment: schemas.AppointmentCreate, user_id: int):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        return None
-    
-
-    db_service = get_service_by_id(db, service_id=appointment.service_id, organization_id=user.organization_id)
-    if not db_service:
-        return None 
-    
-    clean_time = appointment.appointment_time.replace(microsecond=0)
-    appointment.appointment_time = clean_time
-    
-    day_appointments = db.query(models.Appointment).filter(
-        models.Appointment.user_id == user_id,
-        models.Appointment.appointment_date == appointment.appointment_date,
-    ).all()
-    
-    for appt in day_appointments:
-        db_time = appt.appointment_time.replace(microsecond=0)
-        
-        if db_time == clean_time:
-            status_lower = str(appt.status).lower() if appt.status else "pending"
-            
-            if status_lower not in ['cancelled', 'cancelado', 'canceled']:
-                print("    -> Horário ocupado.")
-                return None
-         
-    
-    db_appointment = models.Appointment(
-        **appointment.dict(),
-        user_id=user_id
+
+class SlotUnavailableError(Exception):
+    pass
+
+
+def is_active_status(status: str) -> bool:
+    return (status or "pending").lower() not in models.CANCELLED_STATUSES
+
+
+def _insert_ignoring_conflicts(db, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def no_recurring_rule(user_id: int, day: date):
+    # Filtro grosso, em SQL puro: nenhuma regra do barbeiro pode ter
+    # ocorrência no dia (mesmo dia da semana dentro do período, ou uma
+    # ocorrência remarcada para ele). Intervalo em semanas e horário ficam
+    # para a checagem completa em Python.
+    rule = models.RecurringAppointment
+    exception = models.RecurrenceException
+    return and_(
+        ~select(rule.id).where(
+            rule.user_id == user_id,
+            rule.day_of_week == day.weekday(),
+            rule.start_date <= day,
+            or_(rule.end_date.is_(None), rule.end_date >= day)
+        ).exists(),
+        ~select(exception.id).join(rule, rule.id == exception.recurring_id).where(
+            rule.user_id == user_id,
+            exception.new_date == day
+        ).exists(),
+    )
+
+
+def booking_statement(db, appointment: schemas.AppointmentCreate, user_id: int, recurring_guard: bool = False):
+    values = appointment.dict()
+    values["appointment_time"] = appointment.appointment_time.replace(microsecond=0)
+    values["user_id"] = user_id
+
+    # INSERT ... SELECT: o serviço só é encontrado se pertencer à barbearia do
+    # barbeiro, e o índice uq_appointments_active_slot resolve o conflito de
+    # horário no próprio INSERT, sem SELECT prévio e sem corrida entre workers.
+    # Preço e duração vêm da mesma linha do serviço, congelados no agendamento.
+    # Com `recurring_guard`, também não grava se alguma regra recorrente puder
+    # cair no dia: quem chama confere as ocorrências e tenta de novo sem ela.
+    columns = [*values, "price", "duration_minutes"]
+    source = select(*[
+        models.Service.id if name == "service_id"
+        else getattr(models.Service, name) if name in ("price", "duration_minutes")
+        else literal(values[name], type_=models.Appointment.__table__.c[name].type)
+        for name in columns
+    ]).where(
+        models.Service.id == appointment.service_id,
+        models.Service.organization_id == select(models.User.organization_id)
+                                          .where(models.User.id == user_id)
+                                          .scalar_subquery()
+    )
+    if recurring_guard:
+        source = source.where(no_recurring_rule(user_id, appointment.appointment_date))
+
+    stmt = _insert_ignoring_conflicts(db, models.Appointment)
+    stmt = stmt.from_select(columns, source).returning(models.Appointment)
+    return select(models.Appointment).from_statement(stmt)
+
+
+def booking_service_query(service_id: int, user_id: int):
+    return select(models.Service.id, models.Service.duration_minutes).join(
+        models.User, models.User.organization_id == models.Service.organization_id
+    ).where(
+        models.Service.id == service_id,
+        models.User.id == user_id
+    )
+
+
+def held_by_others(appointment: schemas.AppointmentCreate, user_id: int, hold_token: str = None) -> bool:
+    # Sem reservas no dia do barbeiro (o caso comum) não há o que conferir.
+    return bool(holds.store.busy(user_id, appointment.appointment_date, exclude_token=hold_token))
+
+
+def hold_conflict(service_row, appointment: schemas.AppointmentCreate, user_id: int, hold_token: str = None) -> bool:
+    return service_row is not None and bool(holds.conflicting_holds(
+        user_id, appointment.appointment_date, appointment.appointment_time,
+        slot_duration(service_row), ignore_token=hold_token
+    ))
+
+
+def recurring_conflict(service_row, occurrences, appointment: schemas.AppointmentCreate) -> bool:
+    # Como nas reservas, conflita quando o atendimento inteiro esbarra numa
+    # ocorrência, não só quando começa no mesmo horário.
+    return service_row is not None and occurrence_conflict(
+        occurrences, appointment.appointment_date, appointment.appointment_time, slot_duration(service_row)
     )
-    db.add(db_appointment)
+
+
+def booking_conflict(user_id: int, appointment: schemas.AppointmentCreate) -> SlotUnavailableError:
+    # Toda recusa por conflito de horário sai no log e na métrica, qualquer
+    # que seja o caminho (reserva, recorrência, índice único).
+    logger.info(
+        "booking_conflict user_id=%s date=%s time=%s",
+        user_id, appointment.appointment_date, appointment.appointment_time,
+        extra={"user_id": user_id, "appointment_date": appointment.appointment_date,
+               "appointment_time": appointment.appointment_time},
+    )
+    metrics.BOOKINGS.labels(outcome="conflict").inc()
+    return SlotUnavailableError()
+
+
+def _execute_booking(db: Session, appointment: schemas.AppointmentCreate, user_id: int, recurring_guard: bool):
+    try:
+        return db.execute(booking_statement(db, appointment, user_id, recurring_guard)).scalar_one_or_none()
+    except IntegrityError:
+        db.rollback()
+        raise booking_conflict(user_id, appointment)
+
+
+def create_appointment(db: Session, appointment: schemas.AppointmentCreate, user_id: int,
+                       hold_token: str = None):
+    # Horário reservado por outra pessoa: recusa antes de tentar gravar.
+    service_row = None
+    if held_by_others(appointment, user_id, hold_token):
+        service_row = db.execute(booking_service_query(appointment.service_id, user_id)).first()
+        if hold_conflict(service_row, appointment, user_id, hold_token):
+            raise booking_conflict(user_id, appointment)
+
+    # Barbeiro sem regra recorrente no dia (o caso comum): o próprio INSERT
+    # confere isso e o agendamento sai numa ida ao banco. Se não gravou, é
+    # serviço inexistente, horário ocupado ou uma regra que pode cair no dia;
+    # só então as ocorrências são expandidas e o INSERT é refeito sem a guarda.
+    db_appointment = _execute_booking(db, appointment, user_id, recurring_guard=True)
+    if db_appointment is None:
+        db.rollback()
+        service_row = service_row or db.execute(booking_service_query(appointment.service_id, user_id)).first()
+        if service_row is None:
+            metrics.BOOKINGS.labels(outcome="not_found").inc()
+            return None
+        day = appointment.appointment_date
+        if recurring_conflict(service_row, get_occurrences(db, [user_id], day, day), appointment):
+            raise booking_conflict(user_id, appointment)
+        db_appointment = _execute_booking(db, appointment, user_id, recurring_guard=False)
+        if db_appointment is None:
+            db.rollback()
+            raise booking_conflict(user_id, appointment)
+
+    # O RETURNING já trouxe a linha completa; fora da sessão ela não expira no commit.
+    db.expunge(db_appointment)
+    apply_summary_delta(db, models.Appointment.id == db_appointment.id)
     db.commit()
-    db.refresh(db_appointment)
+    booking_created(user_id, db_appointment)
     return db_appointment
 
-def get_appointments_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Appointment).filter(
-        models.Appointment.user_id == user_id
-    ).offset(skip).limit(limit).all()
+
+def booking_created(user_id: int, db_appointment: models.Appointment):
+    # Depois do commit: métrica, cache e evento do horário ocupado. O cache e o
+    # broker de eventos podem ser remotos; o crud assíncrono chama pelo threadpool.
+    metrics.BOOKINGS.labels(outcome="created").inc()
+    availability_cache.invalidate_day(user_id, db_appointment.appointment_date)
+    slot_events.slot_changed(user_id, db_appointment.appointment_date, db_appointment.appointment_time,
+                             db_appointment.service_id, taken=True)
+
+APPOINTMENT_ORDER = (models.Appointment.appointment_date, models.Appointment.appointment_time, models.Appointment.id)
+
+
+def get_appointments_by_user(db: Session, user_id: int, after: tuple = None, limit: int = 100,
+                             date_from: date = None, date_to: date = None, columns=None):
+    stmt = select(*columns) if columns else select(models.Appointment)
+    stmt = stmt.where(models.Appointment.user_id == user_id)
+    if date_from is not None:
+        stmt = stmt.where(models.Appointment.appointment_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.Appointment.appointment_date <= date_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(*APPOINTMENT_ORDER) > tuple_(*after))
+    return _fetch(db, stmt.order_by(*APPOINTMENT_ORDER).limit(limit), columns)
+
+
+def appointment_key(row):
+    # Chave do cursor de /appointments/me/; ocorrências recorrentes, sem id,
+    # entram com -recurring_id e ficam antes dos agendamentos do mesmo horário.
+    return (row.appointment_date, row.appointment_time,
+            row.id if row.id is not None else -row.recurring_id)
+
+
+def add_user_occurrences(db: Session, user_id: int, rows, after: tuple, limit: int,
+                         date_from: date, date_to: date):
+    # Junta à página de agendamentos as ocorrências da janela (que precisa ter
+    # fim), na mesma ordem e depois do mesmo cursor. Com a página cheia, as
+    # ocorrências só vão até o dia do último agendamento dela.
+    first_day = max(day for day in (date_from, after and after[0], date.min) if day)
+    last_day = rows[-1].appointment_date if len(rows) >= limit else date_to
+    if first_day > last_day:
+        return rows
+    items = [
+        AppointmentItem(**{field: getattr(item, field, None) for field in AppointmentItem._fields})
+        ._replace(status="pending")
+        for item in get_occurrences(db, [user_id], first_day, last_day)
+    ]
+    if after is not None:
+        items = [item for item in items if appointment_key(item) > after]
+    return sorted([*rows, *items], key=appointment_key)[:limit]
 
 def delete_appointment(db: Session, appointment_id: int, user_id: int):
     db_appointment = db.query(models.Appointment).filter(
@@ -146,48 +430,930 @@ def delete_appointment(db: Session, appointment_id: int, user_id: int):
     ).first()
 
     if db_appointment:
+        apply_summary_delta(db, models.Appointment.id == db_appointment.id, sign=-1)
         db.delete(db_appointment)
         db.commit()
+        availability_cache.invalidate_day(user_id, db_appointment.appointment_date)
+        if is_active_status(db_appointment.status):
+            slot_events.slot_changed(user_id, db_appointment.appointment_date, db_appointment.appointment_time,
+                                     db_appointment.service_id, taken=False)
+    return db_appointment
+
+def update_appointment_status(db: Session, appointment_id: int, status: str):
+    # UPDATE ... RETURNING: altera e devolve a linha atualizada num só comando.
+    # O resumo do dia sai com o status antigo e volta com o novo.
+    # Reativar um agendamento cancelado cujo horário já foi ocupado esbarra
+    # no índice uq_appointments_active_slot: SlotUnavailableError, como na criação.
+    try:
+        apply_summary_delta(db, models.Appointment.id == appointment_id, sign=-1)
+        db_appointment = db.scalars(
+            update(models.Appointment)
+            .where(models.Appointment.id == appointment_id)
+            .values(status=status)
+            .returning(models.Appointment)
+        ).first()
+        apply_summary_delta(db, models.Appointment.id == appointment_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise SlotUnavailableError()
+    if db_appointment:
+        availability_cache.invalidate_day(db_appointment.user_id, db_appointment.appointment_date)
+        slot_events.slot_changed(db_appointment.user_id, db_appointment.appointment_date,
+                                 db_appointment.appointment_time, db_appointment.service_id,
+                                 taken=is_active_status(db_appointment.status))
     return db_appointment
 
-def get_available_times(db: Session, user_id: int, query_date: date):
-    day_of_week = query_date.weekday()
-   
-    availability = db.query(models.Availability).filter(
+# --- RESERVAS TEMPORÁRIAS (HOLDS) ---
+
+def create_hold(db: Session, hold: schemas.SlotHoldCreate, user_id: int, organization_id: int):
+    # None quando o serviço não existe; SlotUnavailableError quando o horário
+    # não está livre (fora da grade, agendado ou já reservado).
+    duration = slot_duration(db.execute(service_duration_query(hold.service_id, organization_id)).first())
+    if duration is None:
+        return None
+
+    start = hold.appointment_time.replace(second=0, microsecond=0)
+    windows = [
+        (slots.to_minutes(window_start), slots.to_minutes(window_end))
+        for window_start, window_end in db.execute(day_windows_query(user_id, hold.appointment_date))
+    ]
+    appointments = db.execute(day_appointments_query(user_id, hold.appointment_date)).all()
+    appointments += recurring_busy(db, user_id, hold.appointment_date)
+    busy = slots.busy_intervals(
+        (slots.to_minutes(appt_time), appt_duration) for appt_time, appt_duration in appointments
+    )
+    if not slots.fits(windows, busy, slots.to_minutes(start), duration):
+        raise SlotUnavailableError()
+
+    db_hold = holds.acquire(user_id, organization_id, hold.appointment_date, start, duration, hold.service_id)
+    if db_hold is None:
+        raise SlotUnavailableError()
+    return db_hold
+
+
+def confirm_hold(db: Session, token: str, client: schemas.SlotHoldConfirm, user_id: int):
+    # None quando a reserva não existe, venceu ou é de outro barbeiro.
+    hold = holds.store.get(token)
+    if hold is None or hold.user_id != user_id:
+        return None
+    appointment = schemas.AppointmentCreate(
+        **client.dict(),
+        appointment_date=hold.day,
+        appointment_time=hold.start,
+        service_id=hold.service_id,
+    )
+    db_appointment = None
+    try:
+        db_appointment = create_appointment(db, appointment, user_id, hold_token=token)
+        return db_appointment
+    finally:
+        # Confirmada ou não, a reserva acaba aqui. No sucesso o próprio
+        # agendamento já avisou que o horário está ocupado; na falha o
+        # horário volta a ficar livre e isso precisa ser avisado.
+        holds.release(token, notify=db_appointment is None)
+
+
+# --- AGENDAMENTOS RECORRENTES ---
+# Regras guardadas uma vez e expandidas por app.recurrence só na janela
+# consultada. As ocorrências entram como ocupadas no motor de horários, no
+# quadro da agenda e nos relatórios, e um agendamento avulso não pode se
+# sobrepor a uma ocorrência.
+
+class InvalidOccurrenceChange(Exception):
+    pass
+
+
+def recurring_query(user_ids, date_from: date, date_to: date):
+    # Regras ativas na janela e, na mesma consulta, as exceções que mexem nela
+    # (data original ou nova dentro da janela): uma linha por exceção.
+    rule = models.RecurringAppointment
+    exception = models.RecurrenceException
+    return select(
+        rule.id.label("recurring_id"),
+        rule.user_id,
+        rule.start_date,
+        rule.end_date,
+        rule.interval_weeks,
+        rule.appointment_time,
+        rule.service_id,
+        models.Service.name.label("service_name"),
+        models.Service.price,
+        models.Service.duration_minutes,
+        rule.client_name,
+        rule.client_email,
+        rule.client_phone,
+        exception.original_date,
+        exception.cancelled,
+        exception.new_date,
+        exception.new_time,
+    ).outerjoin(
+        models.Service, models.Service.id == rule.service_id
+    ).outerjoin(
+        exception, and_(
+            exception.recurring_id == rule.id,
+            or_(
+                exception.original_date.between(date_from, date_to),
+                exception.new_date.between(date_from, date_to)
+            )
+        )
+    ).where(
+        rule.user_id.in_(user_ids),
+        rule.start_date <= date_to,
+        or_(rule.end_date.is_(None), rule.end_date >= date_from)
+    )
+
+
+def expand_recurring(rows, date_from: date, date_to: date):
+    rules = {}
+    exceptions = []
+    for row in rows:
+        rules.setdefault(row.recurring_id, row)
+        if row.original_date is not None:
+            exceptions.append(row)
+    return list(recurrence.expand(rules.values(), exceptions, date_from, date_to))
+
+
+def get_occurrences(db: Session, user_ids, date_from: date, date_to: date):
+    return expand_recurring(db.execute(recurring_query(user_ids, date_from, date_to)), date_from, date_to)
+
+
+def recurring_busy(db: Session, user_id: int, query_date: date):
+    return recurrence.busy_by_day(get_occurrences(db, [user_id], query_date, query_date))[(user_id, query_date)]
+
+
+def organization_occurrences(db: Session, organization_id: int, date_from: date, date_to: date):
+    # Ocorrências de toda a equipe; quem chama já limita o tamanho da janela.
+    member_ids = select(models.User.id).where(models.User.organization_id == organization_id)
+    return get_occurrences(db, member_ids, date_from, date_to)
+
+
+def occurrence_conflict(occurrences, day: date, start, duration: int, ignore: tuple = None) -> bool:
+    # `ignore` é (recurring_id, original_date) da própria ocorrência sendo remarcada.
+    busy = slots.busy_intervals(
+        (slots.to_minutes(item.appointment_time), item.duration_minutes)
+        for item in occurrences
+        if item.appointment_date == day and (item.recurring_id, item.original_date) != ignore
+    )
+    return slots.overlaps(busy, slots.to_minutes(start), duration)
+
+
+def _appointments_conflict(db: Session, user_id: int, day: date, start, duration: int) -> bool:
+    busy = slots.busy_intervals(
+        (slots.to_minutes(appt_time), appt_duration)
+        for appt_time, appt_duration in db.execute(day_appointments_query(user_id, day))
+    )
+    return slots.overlaps(busy, slots.to_minutes(start), duration)
+
+
+def _times_overlap(start, duration: int, other_start, other_duration: int) -> bool:
+    return slots.overlaps(slots.busy_intervals([(slots.to_minutes(other_start), other_duration)]),
+                          slots.to_minutes(start), duration)
+
+
+def create_recurring(db: Session, rule: schemas.RecurringAppointmentCreate, user_id: int, organization_id: int):
+    # None quando o serviço não existe na barbearia; SlotUnavailableError quando
+    # alguma ocorrência se sobreporia a um agendamento, a uma reserva ativa, a
+    # outra regra ou a uma ocorrência remarcada de outra regra.
+    duration = slot_duration(db.execute(service_duration_query(rule.service_id, organization_id)).first())
+    if duration is None:
+        return None
+    start = rule.appointment_time.replace(microsecond=0)
+
+    taken = db.execute(select(
+        models.Appointment.appointment_date,
+        models.Appointment.appointment_time,
+        APPOINTMENT_DURATION
+    ).outerjoin(models.Service, models.Appointment.service_id == models.Service.id).where(
+        models.Appointment.user_id == user_id,
+        models.Appointment.appointment_date >= rule.start_date,
+        ACTIVE_APPOINTMENT_FILTER,
+        *([models.Appointment.appointment_date <= rule.end_date] if rule.end_date else [])
+    ))
+    if any(
+        recurrence.is_occurrence(rule.start_date, rule.interval_weeks, rule.end_date, day)
+        and _times_overlap(start, duration, appt_time, appt_duration)
+        for day, appt_time, appt_duration in taken
+    ):
+        raise SlotUnavailableError()
+
+    if any(
+        recurrence.is_occurrence(rule.start_date, rule.interval_weeks, rule.end_date, hold.day)
+        and _times_overlap(start, duration, hold.start, hold.duration)
+        for hold in holds.store.for_user(user_id)
+    ):
+        raise SlotUnavailableError()
+
+    # Remarcadas caem fora do dia da semana e do horário da própria regra, então
+    # a comparação entre regras abaixo não as vê.
+    moved = db.execute(select(
+        func.coalesce(models.RecurrenceException.new_date, models.RecurrenceException.original_date),
+        func.coalesce(models.RecurrenceException.new_time, models.RecurringAppointment.appointment_time),
+        models.Service.duration_minutes
+    ).join(
+        models.RecurringAppointment,
+        models.RecurringAppointment.id == models.RecurrenceException.recurring_id
+    ).outerjoin(models.Service, models.Service.id == models.RecurringAppointment.service_id).where(
+        models.RecurringAppointment.user_id == user_id,
+        models.RecurrenceException.cancelled.is_(False),
+        or_(models.RecurrenceException.new_date.isnot(None), models.RecurrenceException.new_time.isnot(None))
+    ))
+    if any(
+        recurrence.is_occurrence(rule.start_date, rule.interval_weeks, rule.end_date, day)
+        and _times_overlap(start, duration, moved_time, moved_duration)
+        for day, moved_time, moved_duration in moved
+    ):
+        raise SlotUnavailableError()
+
+    others = db.execute(select(
+        models.RecurringAppointment.start_date,
+        models.RecurringAppointment.interval_weeks,
+        models.RecurringAppointment.end_date,
+        models.RecurringAppointment.appointment_time,
+        models.Service.duration_minutes
+    ).outerjoin(models.Service, models.Service.id == models.RecurringAppointment.service_id).where(
+        models.RecurringAppointment.user_id == user_id,
+        models.RecurringAppointment.day_of_week == rule.start_date.weekday()
+    ))
+    if any(
+        _times_overlap(start, duration, other.appointment_time, other.duration_minutes)
+        and recurrence.rules_intersect(rule.start_date, rule.interval_weeks, rule.end_date,
+                                       other.start_date, other.interval_weeks, other.end_date)
+        for other in others
+    ):
+        raise SlotUnavailableError()
+
+    db_rule = models.RecurringAppointment(
+        **rule.dict(exclude={"appointment_time"}),
+        appointment_time=start,
+        day_of_week=rule.start_date.weekday(),
+        user_id=user_id
+    )
+    db.add(db_rule)
+    db.commit()
+    availability_cache.invalidate_user(user_id)
+    slot_events.availability_changed(user_id)
+    return db_rule
+
+
+def get_recurring_by_user(db: Session, user_id: int):
+    return db.scalars(
+        select(models.RecurringAppointment)
+        .where(models.RecurringAppointment.user_id == user_id)
+        .order_by(models.RecurringAppointment.id)
+    ).all()
+
+
+def _get_recurring(db: Session, recurring_id: int, user_id: int):
+    return db.scalars(select(models.RecurringAppointment).where(
+        models.RecurringAppointment.id == recurring_id,
+        models.RecurringAppointment.user_id == user_id
+    )).first()
+
+
+def delete_recurring(db: Session, recurring_id: int, user_id: int):
+    db_rule = _get_recurring(db, recurring_id, user_id)
+    if db_rule:
+        db.delete(db_rule)
+        db.commit()
+        availability_cache.invalidate_user(user_id)
+        slot_events.availability_changed(user_id)
+    return db_rule
+
+
+def change_occurrence(db: Session, recurring_id: int, user_id: int, original_date: date,
+                      change: schemas.RecurrenceExceptionUpdate):
+    # Cancela ou remarca uma ocorrência. None quando a regra não existe ou a
+    # data não é uma ocorrência dela.
+    db_rule = _get_recurring(db, recurring_id, user_id)
+    if db_rule is None or not recurrence.is_occurrence(
+        db_rule.start_date, db_rule.interval_weeks, db_rule.end_date, original_date
+    ):
+        return None
+
+    new_date = change.appointment_date
+    new_time = change.appointment_time.replace(microsecond=0) if change.appointment_time else None
+    touched = {original_date}
+    if not change.cancelled and (new_date or new_time):
+        day = new_date or original_date
+        start = new_time or db_rule.appointment_time
+        # A ocorrência remarcada continua dentro do período da regra.
+        if day < db_rule.start_date or (db_rule.end_date and day > db_rule.end_date):
+            raise InvalidOccurrenceChange()
+        duration = slot_duration(db.execute(
+            select(models.Service.duration_minutes).where(models.Service.id == db_rule.service_id)
+        ).first())
+        if _appointments_conflict(db, user_id, day, start, duration) or occurrence_conflict(
+            get_occurrences(db, [user_id], day, day), day, start, duration, ignore=(recurring_id, original_date)
+        ):
+            raise SlotUnavailableError()
+        touched.add(day)
+
+    db_exception = db.scalars(select(models.RecurrenceException).where(
+        models.RecurrenceException.recurring_id == recurring_id,
+        models.RecurrenceException.original_date == original_date
+    )).first()
+    if db_exception is None:
+        db_exception = models.RecurrenceException(recurring_id=recurring_id, original_date=original_date)
+        db.add(db_exception)
+    else:
+        touched.add(db_exception.new_date or original_date)
+    db_exception.cancelled = change.cancelled
+    db_exception.new_date = None if change.cancelled else new_date
+    db_exception.new_time = None if change.cancelled else new_time
+    db.commit()
+
+    for day in touched:
+        availability_cache.invalidate_day(user_id, day)
+    slot_events.availability_changed(user_id)
+    return db_exception
+
+
+# --- IMPORTAÇÃO / EXPORTAÇÃO EM LOTE ---
+
+def import_context(db: Session, organization_id: int):
+    # {service_id: (preço, duração)} dos serviços da barbearia e os ids da equipe.
+    services = {
+        service_id: (price, duration_minutes)
+        for service_id, price, duration_minutes in db.execute(
+            select(models.Service.id, models.Service.price, models.Service.duration_minutes)
+            .where(models.Service.organization_id == organization_id)
+        )
+    }
+    member_ids = set(db.scalars(
+        select(models.User.id).where(models.User.organization_id == organization_id)
+    ))
+    return services, member_ids
+
+
+def import_appointments_batch(db: Session, batch, default_user_id: int, allowed_user_ids: set, services: dict):
+    # `batch` é uma lista de (linha, AppointmentCreate, extras); `services` vem
+    # de import_context. Devolve (quantidade_importada, erros_por_linha).
+    errors = []
+    candidates = []
+    for line, appointment, extras in batch:
+        user_id = extras["user_id"] or default_user_id
+        if user_id not in allowed_user_ids:
+            errors.append({"line": line, "detail": f"Profissional com id {user_id} não encontrado"})
+            continue
+        if appointment.service_id not in services:
+            errors.append({"line": line, "detail": f"Serviço com id {appointment.service_id} não encontrado"})
+            continue
+        values = appointment.dict()
+        values["appointment_time"] = appointment.appointment_time.replace(microsecond=0)
+        values["user_id"] = user_id
+        values["status"] = extras["status"]
+        values["price"], values["duration_minutes"] = services[appointment.service_id]
+        candidates.append((line, values))
+
+    def slot_key(values):
+        return (values["user_id"], values["appointment_date"], values["appointment_time"])
+
+    # Conflitos com o banco: uma única consulta cobre todos os agendamentos do
+    # lote e outra as ocorrências recorrentes; como no agendamento avulso, as
+    # reservas (holds) de cada dia também ocupam o horário. Vale a sobreposição
+    # dos intervalos, não só o mesmo horário de início.
+    active = [values for _, values in candidates if is_active_status(values["status"])]
+    busy = defaultdict(list)
+    if active:
+        user_ids = {values["user_id"] for values in active}
+        first_day = min(values["appointment_date"] for values in active)
+        last_day = max(values["appointment_date"] for values in active)
+        for user_id, appt_date, appt_time, appt_duration in db.execute(
+            select(
+                models.Appointment.user_id,
+                models.Appointment.appointment_date,
+                models.Appointment.appointment_time,
+                APPOINTMENT_DURATION
+            ).outerjoin(models.Service, models.Appointment.service_id == models.Service.id).where(
+                models.Appointment.user_id.in_(user_ids),
+                models.Appointment.appointment_date >= first_day,
+                models.Appointment.appointment_date <= last_day,
+                ACTIVE_APPOINTMENT_FILTER
+            )
+        ):
+            busy[(user_id, appt_date)].append((appt_time, appt_duration))
+        for key, occurrences in recurrence.busy_by_day(get_occurrences(db, user_ids, first_day, last_day)).items():
+            busy[key].extend(occurrences)
+        for key in {(values["user_id"], values["appointment_date"]) for values in active}:
+            busy[key].extend(holds.store.busy(*key))
+
+    rows = []
+    pending_lines = {}
+    for line, values in candidates:
+        if is_active_status(values["status"]):
+            day_key = (values["user_id"], values["appointment_date"])
+            duration = values["duration_minutes"] or slots.DEFAULT_DURATION_MINUTES
+            intervals = slots.busy_intervals(
+                (slots.to_minutes(appt_time), appt_duration) for appt_time, appt_duration in busy[day_key]
+            )
+            if slots.overlaps(intervals, slots.to_minutes(values["appointment_time"]), duration):
+                errors.append({"line": line, "detail": "Horário indisponível para este profissional."})
+                continue
+            busy[day_key].append((values["appointment_time"], duration))
+            pending_lines[slot_key(values)] = line
+        rows.append(values)
+
+    if not rows:
+        return 0, errors
+
+    # O índice único continua valendo para agendamentos gravados em paralelo:
+    # o que não voltar no RETURNING perdeu a disputa pelo horário.
+    stmt = _insert_ignoring_conflicts(db, models.Appointment).returning(
+        models.Appointment.id,
+        models.Appointment.user_id,
+        models.Appointment.appointment_date,
+        models.Appointment.appointment_time,
+        models.Appointment.status,
+        models.Appointment.service_id
+    )
+    inserted = db.execute(stmt, rows).all()
+    if inserted:
+        apply_summary_delta(db, models.Appointment.id.in_([row.id for row in inserted]))
+    db.commit()
+
+    inserted_active = {(row.user_id, row.appointment_date, row.appointment_time) for row in inserted
+                       if is_active_status(row.status)}
+    for key, line in pending_lines.items():
+        if key not in inserted_active:
+            errors.append({"line": line, "detail": "Horário indisponível para este profissional."})
+
+    for user_id, appt_date in {(values["user_id"], values["appointment_date"]) for values in rows}:
+        availability_cache.invalidate_day(user_id, appt_date)
+    for row in inserted:
+        if is_active_status(row.status):
+            slot_events.slot_changed(row.user_id, row.appointment_date, row.appointment_time,
+                                     row.service_id, taken=True)
+
+    return len(inserted), errors
+
+
+EXPORT_COLUMNS = [
+    "id", "user_id", "client_name", "client_email", "client_phone",
+    "appointment_date", "appointment_time", "service_id", "status",
+]
+
+
+def appointments_export_query(organization_id: int = None, user_id: int = None,
+                              date_from: date = None, date_to: date = None):
+    stmt = select(*[models.Appointment.__table__.c[name] for name in EXPORT_COLUMNS])
+    if user_id is not None:
+        stmt = stmt.where(models.Appointment.user_id == user_id)
+    else:
+        stmt = stmt.join(models.User, models.Appointment.user_id == models.User.id)\
+                   .where(models.User.organization_id == organization_id)
+    if date_from is not None:
+        stmt = stmt.where(models.Appointment.appointment_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.Appointment.appointment_date <= date_to)
+    # yield_per: as linhas chegam do cursor em blocos, sem carregar tudo.
+    return stmt.order_by(*APPOINTMENT_ORDER).execution_options(yield_per=1000)
+
+
+ACTIVE_APPOINTMENT_FILTER = models.active_status(models.Appointment.status)
+
+# Duração que o agendamento ocupa: a gravada na hora do agendamento (a mesma
+# dos resumos); o serviço só vale para linhas antigas, sem a cópia. Quem usa
+# faz o outer join com services.
+APPOINTMENT_DURATION = func.coalesce(
+    models.Appointment.duration_minutes, models.Service.duration_minutes
+).label("duration_minutes")
+
+
+def service_duration_query(service_id: int, organization_id: int):
+    return select(models.Service.duration_minutes).where(
+        models.Service.id == service_id,
+        models.Service.organization_id == organization_id
+    )
+
+
+def slot_duration(row):
+    # None quando o serviço não existe na barbearia.
+    if row is None:
+        return None
+    return row.duration_minutes or slots.DEFAULT_DURATION_MINUTES
+
+
+def day_windows_query(user_id: int, query_date: date):
+    return select(models.Availability.start_time, models.Availability.end_time).where(
         models.Availability.user_id == user_id,
-        models.Availability.day_of_week == day_of_week
-    ).first()
+        models.Availability.day_of_week == query_date.weekday()
+    )
 
-    if not availability:
-        print("-> Sem disponibilidade configurada para este dia.")
-        return [] 
-    
-    current_time = availability.start_time.replace(microsecond=0)
-    end_time = availability.end_time.replace(microsecond=0)
 
-    # 3. Buscar agendamentos existentes
-    existing_appointments = db.query(models.Appointment).filter(
+def day_appointments_query(user_id: int, query_date: date):
+    return select(
+        models.Appointment.appointment_time,
+        APPOINTMENT_DURATION
+    ).outerjoin(models.Service, models.Appointment.service_id == models.Service.id).where(
         models.Appointment.user_id == user_id,
         models.Appointment.appointment_date == query_date,
-        
-        models.Appointment.status.notin_(['cancelled', 'cancelado', 'canceled'])
-    ).all()
+        ACTIVE_APPOINTMENT_FILTER
+    )
+
+
+def _slot_duration(db: Session, service_id: int, organization_id: int, step: int):
+    if service_id is None:
+        return step
+    return slot_duration(db.execute(service_duration_query(service_id, organization_id)).first())
+
 
-    busy_times = {appt.appointment_time.replace(microsecond=0) for appt in existing_appointments}
-  
-    free_slots = []
+def compute_slots(windows, appointments, duration: int, step: int):
+    busy = slots.busy_intervals(
+        (slots.to_minutes(appt_time), appt_duration) for appt_time, appt_duration in appointments
+    )
+    return [slots.to_time(minute) for minute in slots.free_slots(windows, busy, duration, step)]
+
+
+def get_available_times(db: Session, user_id: int, query_date: date,
+                        service_id: int = None, organization_id: int = None,
+                        step: int = slots.DEFAULT_STEP_MINUTES):
+    duration = _slot_duration(db, service_id, organization_id, step)
+    if duration is None:
+        return None
 
-    dummy_date = date(2000, 1, 1)
-    curr_dt = datetime.combine(dummy_date, current_time)
-    end_dt = datetime.combine(dummy_date, end_time)
+    windows = [
+        (slots.to_minutes(start), slots.to_minutes(end))
+        for start, end in db.execute(day_windows_query(user_id, query_date))
+    ]
 
-    while curr_dt < end_dt:
-        time_val = curr_dt.time()
-        
-        if time_val not in busy_times:
-            free_slots.append(time_val)
+    if not windows:
+        logger.debug("no_availability user_id=%s date=%s", user_id, query_date,
+                     extra={"user_id": user_id, "query_date": query_date})
+        return []
 
-        curr_dt += timedelta(minutes=30) 
+    appointments = db.execute(day_appointments_query(user_id, query_date)).all()
+    appointments += holds.store.busy(user_id, query_date)
+    appointments += recurring_busy(db, user_id, query_date)
+    free_slots = compute_slots(windows, appointments, duration, step)
 
-    print(f"-> Total de slots livres retornados: {len(free_slots)}")
+    logger.debug("available_slots user_id=%s date=%s count=%d", user_id, query_date, len(free_slots),
+                 extra={"user_id": user_id, "query_date": query_date, "slots": len(free_slots)})
     return free_slots
+
+
+def get_available_times_range(db: Session, organization_id: int, date_from: date, date_to: date,
+                              user_ids: list = None, service_id: int = None,
+                              step: int = slots.DEFAULT_STEP_MINUTES):
+    # Grade {barbeiro: {data: [horários]}}: uma consulta para as disponibilidades
+    # e outra para os agendamentos do período; o resto é calculado em memória.
+    duration = _slot_duration(db, service_id, organization_id, step)
+    if duration is None:
+        return None
+
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+
+    availability_query = db.query(
+        models.Availability.user_id,
+        models.Availability.day_of_week,
+        models.Availability.start_time,
+        models.Availability.end_time
+    ).join(models.User, models.Availability.user_id == models.User.id).filter(
+        models.User.organization_id == organization_id,
+        models.Availability.day_of_week.in_({day.weekday() for day in days})
+    )
+    if user_ids:
+        availability_query = availability_query.filter(models.Availability.user_id.in_(user_ids))
+
+    windows = defaultdict(list)
+    for user_id, day_of_week, start, end in availability_query:
+        windows[(user_id, day_of_week)].append((slots.to_minutes(start), slots.to_minutes(end)))
+
+    barber_ids = sorted({user_id for user_id, _ in windows})
+    if not barber_ids:
+        return {}
+
+    appointments = defaultdict(list)
+    for user_id, appt_date, appt_time, appt_duration in db.query(
+        models.Appointment.user_id,
+        models.Appointment.appointment_date,
+        models.Appointment.appointment_time,
+        APPOINTMENT_DURATION
+    ).outerjoin(models.Service, models.Appointment.service_id == models.Service.id).filter(
+        models.Appointment.user_id.in_(barber_ids),
+        models.Appointment.appointment_date >= date_from,
+        models.Appointment.appointment_date <= date_to,
+        ACTIVE_APPOINTMENT_FILTER
+    ):
+        appointments[(user_id, appt_date)].append((appt_time, appt_duration))
+    for key, busy in recurrence.busy_by_day(get_occurrences(db, barber_ids, date_from, date_to)).items():
+        appointments[key].extend(busy)
+
+    return {
+        user_id: {
+            day: compute_slots(
+                windows.get((user_id, day.weekday()), ()),
+                [*appointments.get((user_id, day), ()), *holds.store.busy(user_id, day)],
+                duration,
+                step,
+            )
+            for day in days
+        }
+        for user_id in barber_ids
+    }
+
+
+# --- RESUMO DIÁRIO DA AGENDA ---
+# schedule_day_summaries e appointment_status_summaries acompanham cada
+# escrita em appointments na mesma transação: a linha entra no resumo (+1)
+# ao ser criada e sai (-1) ao ser removida; na troca de status sai com o
+# status antigo e entra com o novo. Receita e minutos usam o preço e a
+# duração gravados no agendamento, então o -1 tira exatamente o que o +1
+# somou, mesmo depois de o serviço ser editado ou removido.
+#
+# A reconstrução (rebuild_summaries) apaga e recalcula os resumos de uma
+# barbearia. No Postgres ela segura um advisory lock exclusivo da barbearia
+# e cada escrita segura o mesmo lock compartilhado: escritas não se
+# bloqueiam entre si, só esperam a reconstrução terminar, e nenhuma é
+# contada duas vezes ou perdida. No SQLite o lock de escrita do próprio
+# banco já serializa as duas. Só Postgres e SQLite
+# têm o upsert usado aqui; nos demais bancos o quadro e os relatórios são
+# calculados a partir dos próprios agendamentos.
+
+SCHEDULE_SUMMARY_ENABLED = os.getenv("SCHEDULE_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_APPOINTMENT_STATUS = models.normalized_status(models.Appointment.status)
+_SUMMARY_COUNTERS = ("appointments", "cancelled", "revenue", "booked_minutes")
+_APPOINTMENT_IS_CANCELLED = _APPOINTMENT_STATUS.in_(models.CANCELLED_STATUSES)
+
+
+def summary_enabled(db) -> bool:
+    return SCHEDULE_SUMMARY_ENABLED and db.get_bind().dialect.name in ("postgresql", "sqlite")
+
+
+def _upsert_adding(db, model, counters, source):
+    # INSERT ... SELECT que, na chave já existente, soma os contadores.
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    keys = [column.name for column in model.__table__.primary_key.columns]
+    stmt = dialect.insert(model).from_select(keys + list(counters), source)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters},
+    )
+
+
+def _summary_source(appointment_filter, *columns, group_by=()):
+    return select(
+        models.User.organization_id,
+        models.Appointment.appointment_date.label("day"),
+        models.Appointment.user_id,
+        *columns
+    ).join(
+        models.User, models.User.id == models.Appointment.user_id
+    ).where(
+        appointment_filter,
+        models.User.organization_id.is_not(None)
+    ).group_by(
+        models.User.organization_id, models.Appointment.appointment_date, models.Appointment.user_id,
+        *group_by
+    )
+
+
+def _day_counters(sign: int = 1):
+    def active(value):
+        return func.sum(case((_APPOINTMENT_IS_CANCELLED, 0), else_=value)) * sign
+
+    return (
+        active(1).label("appointments"),
+        (func.sum(case((_APPOINTMENT_IS_CANCELLED, 1), else_=0)) * sign).label("cancelled"),
+        active(func.coalesce(models.Appointment.price, 0)).label("revenue"),
+        active(func.coalesce(models.Appointment.duration_minutes, 0)).label("booked_minutes"),
+    )
+
+
+def _status_counters(sign: int = 1):
+    return _APPOINTMENT_STATUS.label("status"), (func.count() * sign).label("appointments")
+
+
+SUMMARY_LOCK_NAMESPACE = 2201
+
+
+def _summary_write_lock(appointment_filter):
+    # Lock compartilhado de cada barbearia tocada, em ordem (sem deadlock).
+    return select(
+        func.pg_advisory_xact_lock_shared(SUMMARY_LOCK_NAMESPACE, models.User.organization_id)
+    ).select_from(models.Appointment).join(
+        models.User, models.User.id == models.Appointment.user_id
+    ).where(
+        appointment_filter,
+        models.User.organization_id.is_not(None)
+    ).group_by(models.User.organization_id).order_by(models.User.organization_id)
+
+
+def _summary_rebuild_lock(organization_id: int):
+    return select(func.pg_advisory_xact_lock(SUMMARY_LOCK_NAMESPACE, organization_id))
+
+
+def _summary_upserts(db, appointment_filter, sign: int = 1):
+    day_source = _summary_source(appointment_filter, *_day_counters(sign))
+    status_source = _summary_source(
+        appointment_filter, *_status_counters(sign), group_by=(_APPOINTMENT_STATUS,)
+    )
+    return (
+        _upsert_adding(db, models.ScheduleDaySummary, _SUMMARY_COUNTERS, day_source),
+        _upsert_adding(db, models.AppointmentStatusSummary, ("appointments",), status_source),
+    )
+
+
+def summary_delta_statements(db, appointment_filter, sign: int = 1):
+    # Soma (sign=1) ou subtrai (sign=-1) dos resumos os agendamentos do filtro.
+    statements = _summary_upserts(db, appointment_filter, sign)
+    if db.get_bind().dialect.name == "postgresql":
+        statements = (_summary_write_lock(appointment_filter), *statements)
+    return statements
+
+
+def apply_summary_delta(db: Session, appointment_filter, sign: int = 1):
+    if summary_enabled(db):
+        for stmt in summary_delta_statements(db, appointment_filter, sign):
+            db.execute(stmt)
+
+
+def rebuild_summaries(db: Session, organization_id: int = None):
+    # Recalcula os resumos do zero, uma barbearia por transação. Pode rodar
+    # com a barbearia aberta: as escritas dela esperam o lock da reconstrução.
+    if organization_id is None:
+        for each_id in db.scalars(select(models.Organization.id).order_by(models.Organization.id)).all():
+            rebuild_summaries(db, each_id)
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(_summary_rebuild_lock(organization_id))
+    for model in (models.ScheduleDaySummary, models.AppointmentStatusSummary):
+        db.execute(delete(model).where(model.organization_id == organization_id))
+    for stmt in _summary_upserts(db, models.User.organization_id == organization_id):
+        db.execute(stmt)
+    db.commit()
+
+
+def schedule_board_query(organization_id: int, date_from: date, date_to: date):
+    # Uma consulta com tudo o que o quadro mostra: agendamento, barbeiro e serviço.
+    return select(
+        models.Appointment.id,
+        null().label("recurring_id"),
+        models.Appointment.appointment_date,
+        models.Appointment.appointment_time,
+        models.Appointment.user_id,
+        models.User.name.label("barber_name"),
+        models.Appointment.client_name,
+        models.Appointment.client_phone,
+        models.Appointment.status,
+        models.Appointment.service_id,
+        models.Service.name.label("service_name"),
+        models.Appointment.price,
+        models.Appointment.duration_minutes,
+    ).join(
+        models.User, models.User.id == models.Appointment.user_id
+    ).outerjoin(
+        models.Service, models.Service.id == models.Appointment.service_id
+    ).where(
+        models.User.organization_id == organization_id,
+        models.Appointment.appointment_date >= date_from,
+        models.Appointment.appointment_date <= date_to
+    ).order_by(
+        models.Appointment.appointment_date, models.Appointment.appointment_time, models.Appointment.user_id
+    )
+
+
+def day_summaries_query(organization_id: int, date_from: date, date_to: date):
+    summary = models.ScheduleDaySummary
+    return select(
+        summary.day, summary.user_id, *[getattr(summary, name) for name in _SUMMARY_COUNTERS]
+    ).where(
+        summary.organization_id == organization_id,
+        summary.day >= date_from,
+        summary.day <= date_to
+    )
+
+
+def organization_availability_query(organization_id: int):
+    return select(
+        models.Availability.user_id,
+        models.Availability.day_of_week,
+        models.Availability.start_time,
+        models.Availability.end_time
+    ).join(
+        models.User, models.User.id == models.Availability.user_id
+    ).where(models.User.organization_id == organization_id)
+
+
+def get_schedule_board(db: Session, organization_id: int, date_from: date, date_to: date):
+    barbers = get_organization_members(db, organization_id)
+    appointments = db.execute(schedule_board_query(organization_id, date_from, date_to)).all()
+    occurrences = schedule.occurrence_rows(organization_occurrences(db, organization_id, date_from, date_to))
+    if summary_enabled(db):
+        summaries = schedule.merge_summaries(
+            db.execute(day_summaries_query(organization_id, date_from, date_to)),
+            schedule.summarize_appointments(occurrences)
+        )
+    else:
+        summaries = schedule.summarize_appointments([*appointments, *occurrences])
+    appointments = sorted([*appointments, *occurrences],
+                          key=lambda row: (row.appointment_date, row.appointment_time, row.user_id))
+    available = schedule.available_minutes(db.execute(organization_availability_query(organization_id)))
+    return schedule.build_board(date_from, date_to, barbers, appointments, summaries, available)
+
+
+# --- RELATÓRIOS ---
+# Os relatórios leem só os resumos: o custo depende do período pedido, não
+# do tamanho do histórico. Sem os resumos, a mesma agregação é feita sobre
+# appointments, com as mesmas colunas. As ocorrências dos agendamentos
+# recorrentes não têm linha em nenhum dos dois e são somadas em memória,
+# expandidas só no período pedido.
+
+DailyRevenue = namedtuple("DailyRevenue", ("day", "appointments", "cancelled", "revenue"))
+BarberTotals = namedtuple("BarberTotals", ("user_id", "appointments", "revenue", "booked_minutes"))
+
+
+def _occurrence_summaries(db: Session, organization_id: int, date_from: date, date_to: date):
+    return schedule.summarize_appointments(
+        schedule.occurrence_rows(organization_occurrences(db, organization_id, date_from, date_to))
+    )
+
+
+def _add_occurrences(row_type, rows, summaries):
+    # `row_type` começa pela chave do agrupamento; os demais campos são somados.
+    key, *fields = row_type._fields
+    totals = {getattr(row, key): row_type(*row) for row in rows}
+    for summary in summaries:
+        current = totals.get(getattr(summary, key)) or row_type(getattr(summary, key), *[0] * len(fields))
+        totals[current[0]] = current._replace(
+            **{field: getattr(current, field) + getattr(summary, field) for field in fields}
+        )
+    return [totals[value] for value in sorted(totals)]
+
+def _period_filter(organization_id: int, date_from: date, date_to: date):
+    return (
+        models.User.organization_id == organization_id,
+        models.Appointment.appointment_date >= date_from,
+        models.Appointment.appointment_date <= date_to,
+    )
+
+
+def _day_summaries(db, organization_id: int, date_from: date, date_to: date):
+    if summary_enabled(db):
+        return day_summaries_query(organization_id, date_from, date_to).subquery()
+    return _summary_source(
+        and_(*_period_filter(organization_id, date_from, date_to)), *_day_counters()
+    ).subquery()
+
+
+def _status_summaries(db, organization_id: int, date_from: date, date_to: date):
+    summary = models.AppointmentStatusSummary
+    if summary_enabled(db):
+        return select(summary.day, summary.user_id, summary.status, summary.appointments).where(
+            summary.organization_id == organization_id,
+            summary.day >= date_from,
+            summary.day <= date_to
+        ).subquery()
+    return _summary_source(
+        and_(*_period_filter(organization_id, date_from, date_to)), *_status_counters(),
+        group_by=(_APPOINTMENT_STATUS,)
+    ).subquery()
+
+
+def get_daily_revenue(db: Session, organization_id: int, date_from: date, date_to: date):
+    days = _day_summaries(db, organization_id, date_from, date_to)
+    return _add_occurrences(DailyRevenue, db.execute(
+        select(
+            days.c.day,
+            func.sum(days.c.appointments).label("appointments"),
+            func.sum(days.c.cancelled).label("cancelled"),
+            func.sum(days.c.revenue).label("revenue"),
+        ).group_by(days.c.day).order_by(days.c.day)
+    ), _occurrence_summaries(db, organization_id, date_from, date_to))
+
+
+def get_status_counts(db: Session, organization_id: int, date_from: date, date_to: date):
+    statuses = _status_summaries(db, organization_id, date_from, date_to)
+    total = func.sum(statuses.c.appointments)
+    counts = dict(db.execute(
+        select(statuses.c.status, total.label("appointments"))
+        .group_by(statuses.c.status)
+        .having(total > 0)
+    ).all())
+    # Toda ocorrência recorrente conta como pendente.
+    occurrences = len(organization_occurrences(db, organization_id, date_from, date_to))
+    if occurrences:
+        counts["pending"] = counts.get("pending", 0) + occurrences
+    return sorted(counts.items())
+
+
+def get_barber_totals(db: Session, organization_id: int, date_from: date, date_to: date):
+    days = _day_summaries(db, organization_id, date_from, date_to)
+    return _add_occurrences(BarberTotals, db.execute(
+        select(
+            days.c.user_id,
+            func.sum(days.c.appointments).label("appointments"),
+            func.sum(days.c.revenue).label("revenue"),
+            func.sum(days.c.booked_minutes).label("booked_minutes"),
+        ).group_by(days.c.user_id)
+    ), _occurrence_summaries(db, organization_id, date_from, date_to))
+
+
+def get_organization_members(db: Session, organization_id: int):
+    return db.execute(
+        select(models.User.id, models.User.name)
+        .where(models.User.organization_id == organization_id)
+        .order_by(models.User.id)
+    ).all()
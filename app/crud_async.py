@@ -0,0 +1,81 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from datetime import date
+
+from app import crud, holds, metrics, models, recurrence, schemas, slots
+
+# Versões assíncronas do caminho quente de agendamento. As consultas são as
+# mesmas do crud síncrono; só a execução muda. O store de reservas, o cache e
+# o broker de eventos são síncronos (e podem ir ao banco ou à rede): rodam no
+# threadpool para não travar o event loop.
+
+
+async def get_available_times(db: AsyncSession, user_id: int, query_date: date,
+                              service_id: int = None, organization_id: int = None,
+                              step: int = slots.DEFAULT_STEP_MINUTES):
+    duration = step
+    if service_id is not None:
+        result = await db.execute(crud.service_duration_query(service_id, organization_id))
+        duration = crud.slot_duration(result.first())
+        if duration is None:
+            return None
+
+    result = await db.execute(crud.day_windows_query(user_id, query_date))
+    windows = [(slots.to_minutes(start), slots.to_minutes(end)) for start, end in result]
+    if not windows:
+        return []
+
+    result = await db.execute(crud.day_appointments_query(user_id, query_date))
+    appointments = result.all() + await run_in_threadpool(holds.store.busy, user_id, query_date)
+    result = await db.execute(crud.recurring_query([user_id], query_date, query_date))
+    appointments += recurrence.busy_by_day(crud.expand_recurring(result, query_date, query_date))[(user_id, query_date)]
+    return crud.compute_slots(windows, appointments, duration, step)
+
+
+async def _execute_booking(db: AsyncSession, appointment: schemas.AppointmentCreate, user_id: int,
+                           recurring_guard: bool):
+    try:
+        result = await db.execute(crud.booking_statement(db, appointment, user_id, recurring_guard))
+        return result.scalar_one_or_none()
+    except IntegrityError:
+        await db.rollback()
+        raise crud.booking_conflict(user_id, appointment)
+
+
+async def create_appointment(db: AsyncSession, appointment: schemas.AppointmentCreate, user_id: int,
+                             hold_token: str = None):
+    service_row = None
+    if await run_in_threadpool(crud.held_by_others, appointment, user_id, hold_token):
+        result = await db.execute(crud.booking_service_query(appointment.service_id, user_id))
+        service_row = result.first()
+        if await run_in_threadpool(crud.hold_conflict, service_row, appointment, user_id, hold_token):
+            raise crud.booking_conflict(user_id, appointment)
+
+    # Mesmo roteiro do crud síncrono: INSERT com a guarda das regras
+    # recorrentes e, se não gravou, a checagem completa antes de refazer.
+    db_appointment = await _execute_booking(db, appointment, user_id, recurring_guard=True)
+    if db_appointment is None:
+        await db.rollback()
+        if service_row is None:
+            result = await db.execute(crud.booking_service_query(appointment.service_id, user_id))
+            service_row = result.first()
+        if service_row is None:
+            metrics.BOOKINGS.labels(outcome="not_found").inc()
+            return None
+        day = appointment.appointment_date
+        result = await db.execute(crud.recurring_query([user_id], day, day))
+        if crud.recurring_conflict(service_row, crud.expand_recurring(result, day, day), appointment):
+            raise crud.booking_conflict(user_id, appointment)
+        db_appointment = await _execute_booking(db, appointment, user_id, recurring_guard=False)
+        if db_appointment is None:
+            await db.rollback()
+            raise crud.booking_conflict(user_id, appointment)
+
+    if crud.summary_enabled(db):
+        for stmt in crud.summary_delta_statements(db, models.Appointment.id == db_appointment.id):
+            await db.execute(stmt)
+    await db.commit()
+    await run_in_threadpool(crud.booking_created, user_id, db_appointment)
+    return db_appointment
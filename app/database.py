@@ -1,10 +1,17 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
 
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from app import metrics, read_routing
+from app.cache import TTLCache, load_backend
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
@@ -12,8 +19,235 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("Nenhuma DATABASE_URL encontrada no ambiente. Crie um ficheiro .env.")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# DB_ASYNC=true liga as rotas assíncronas (AsyncSession + asyncpg) para o
+# caminho de agendamento; o caminho síncrono continua sendo o padrão.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+# --- POOL DE CONEXÕES ---
+# DB_MAX_CONNECTIONS é o orçamento total de conexões desta aplicação no
+# Postgres; cada worker do gunicorn (WEB_CONCURRENCY) fica com uma fatia,
+# dividida entre os engines do worker (com DB_ASYNC, o síncrono e o
+# assíncrono). Atrás do PgBouncer use DB_NULLPOOL=true e deixe o pooling para ele.
+
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+DB_NULLPOOL = _env_flag("DB_NULLPOOL", "false")
+ENGINES_PER_WORKER = 2 if DB_ASYNC else 1
+
+
+def pool_options(url: str, engines: int = None) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    if DB_NULLPOOL:
+        return {"poolclass": NullPool, "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true")}
+
+    per_worker = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY // (engines or ENGINES_PER_WORKER))
+    pool_size = int(os.getenv("DB_POOL_SIZE", max(1, per_worker * 3 // 4)))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", max(0, per_worker - pool_size)))
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true"),
+    }
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        metrics.DB_POOL_WAIT.observe(seconds)
+        if timed_out:
+            metrics.DB_POOL_TIMEOUTS.inc()
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self):
+        metrics.DB_POOL_CHECKED_OUT.inc()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self):
+        metrics.DB_POOL_CHECKED_OUT.dec()
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # Mede as esperas por conexão livre: só conta o checkout que encontrou o
+    # pool esgotado (nenhuma ociosa e o overflow no limite).
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_connections = self.size() + max_overflow if max_overflow >= 0 else None
+
+    def exhausted(self) -> bool:
+        return (
+            self.max_connections is not None
+            and self.checkedin() == 0
+            and self.checkedout() >= self.max_connections
+        )
+
+    def connect(self):
+        waiting = self.exhausted()
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if waiting:
+            pool_stats.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def _instrument_pool(sync_engine):
+    event.listen(sync_engine, "checkout", lambda *args: pool_stats.on_checkout())
+    event.listen(sync_engine, "checkin", lambda *args: pool_stats.on_checkin())
+
+
+def pool_status() -> dict:
+    status = {
+        "workers": WEB_CONCURRENCY,
+        "stats": pool_stats.snapshot(),
+        "pool": engine.pool.status(),
+        "read_replicas": [read_engine.pool.status() for read_engine in read_engines],
+    }
+    if isinstance(engine.pool, QueuePool):
+        status.update(
+            size=engine.pool.size(),
+            overflow=engine.pool.overflow(),
+            checked_in=engine.pool.checkedin(),
+        )
+    return status
+
+
+def _create_engine(url: str, engines: int = None):
+    options = pool_options(url, engines)
+    if "pool_size" in options:
+        options["poolclass"] = InstrumentedQueuePool
+    new_engine = create_engine(url, **options)
+    _instrument_pool(new_engine)
+    return new_engine
+
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+# Sem expirar no commit: o objeto recém-gravado já tem a chave primária e os
+# valores enviados, então a resposta não precisa de um SELECT de refresh.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+def read_only_bind(sync_engine):
+    # No Postgres a transação também é aberta como READ ONLY; a característica
+    # volta ao normal quando a conexão retorna ao pool.
+    if sync_engine.dialect.name == "postgresql":
+        return sync_engine.execution_options(postgresql_readonly=True)
+    return sync_engine
+
+
+def _reject_flush(session, flush_context, instances):
+    raise RuntimeError("Sessão somente leitura: use get_db para gravar.")
+
+
+def make_read_only(session):
+    event.listen(session, "before_flush", _reject_flush)
+    return session
+
+
+# --- RÉPLICAS DE LEITURA ---
+# DATABASE_READ_URL aceita uma ou mais URLs separadas por vírgula. Sem ela,
+# tudo lê do primário. READ_STICKY_SECONDS é a janela de read-your-writes;
+# com vários workers, READ_STICKY_BACKEND (um app.cache.CacheBackend
+# compartilhado) faz a janela valer em todos eles.
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URL", "").split(",") if url.strip()]
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+READ_STICKY_BACKEND = os.getenv("READ_STICKY_BACKEND")
+
+# Só o engine síncrono lê das réplicas: o orçamento delas não é dividido.
+read_engines = [_create_engine(url, engines=1) for url in DATABASE_READ_URLS]
+read_router = read_routing.ReadRouter(
+    read_only_bind(engine),
+    [read_only_bind(read_engine) for read_engine in read_engines],
+    sticky_seconds=READ_STICKY_SECONDS,
+    backend=load_backend(READ_STICKY_BACKEND) if READ_STICKY_BACKEND else TTLCache(maxsize=100000, ttl=READ_STICKY_SECONDS),
+)
+
+
+# Sessões de manutenção (session.info["maintenance"]), como a limpeza das
+# reservas vencidas que roda dentro de qualquer GET, gravam sem que isso
+# seja uma escrita do cliente da requisição.
+MAINTENANCE_SESSION_INFO = {"maintenance": True}
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_read_your_writes(session):
+    # Qualquer outro commit durante a requisição (inclusive o da AsyncSession)
+    # manda as próximas leituras desse cliente para o primário.
+    if session.info.get("maintenance"):
+        return
+    read_router.mark_write(read_routing.current_key())
+
+
+# Sessões das rotas GET: nunca fazem flush nem commit, e as listagens
+# projetadas nem chegam a colocar objetos no identity map. O bind (primário
+# ou réplica) é escolhido a cada sessão.
+ReadSessionLocal = sessionmaker(autoflush=False, expire_on_commit=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    # create_async_engine mantém a AsyncAdaptedQueuePool; a medição de espera
+    # fica no engine síncrono. Os dois dividem a fatia de conexões do worker.
+    async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), **pool_options(SQLALCHEMY_DATABASE_URL))
+    _instrument_pool(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -23,4 +257,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db():
+    db = make_read_only(ReadSessionLocal(bind=read_router.current_bind()))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_primary_read_db():
+    # Leituras cujo resultado vai para um cache compartilhado (horários
+    # livres): uma réplica atrasada deixaria o horário recém-agendado livre
+    # na geração nova do cache durante todo o TTL.
+    db = make_read_only(ReadSessionLocal(bind=read_router.primary))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,298 @@
+import heapq
+import os
+import secrets
+import threading
+import time as clock
+from dataclasses import dataclass
+from datetime import date, time
+
+from sqlalchemy import delete, func, select
+
+from app import availability_cache, database, models, slot_events, slots
+from app.cache import load_backend
+
+# Reservas temporárias de horário ("holds"). Quem abre o formulário de
+# agendamento reserva o horário por alguns minutos e recebe um token; o
+# agendamento é confirmado com esse token. Enquanto a reserva vale, o
+# horário aparece ocupado para os outros, que desistem antes de preencher o
+# formulário em vez de perder a disputa no final.
+#
+# Com um worker, o store padrão vive na memória: um dicionário por token, um
+# índice por (barbeiro, dia) e um heap com os vencimentos, para expirar sem
+# varrer todas as reservas. Com vários workers (WEB_CONCURRENCY > 1) a
+# reserva precisa valer em todos eles, e o padrão passa a ser a tabela
+# slot_holds (DatabaseHoldStore). SLOT_HOLDS_BACKEND escolhe outro store
+# (subclasse de HoldStore).
+
+SLOT_HOLD_TTL_SECONDS = float(os.getenv("SLOT_HOLD_TTL_SECONDS", "300"))
+SLOT_HOLDS_MAX = int(os.getenv("SLOT_HOLDS_MAX", "50000"))
+SLOT_HOLDS_BACKEND = os.getenv("SLOT_HOLDS_BACKEND")
+
+
+@dataclass(frozen=True)
+class Hold:
+    token: str
+    user_id: int
+    organization_id: int
+    day: date
+    start: time
+    duration: int
+    service_id: int
+    expires_at: float
+
+    def overlaps(self, start: int, duration: int) -> bool:
+        return _overlaps(slots.to_minutes(self.start), self.duration, start, duration)
+
+
+def _overlaps(start: int, duration: int, other_start: int, other_duration: int) -> bool:
+    return start < other_start + other_duration and other_start < start + duration
+
+
+class HoldStore:
+    """Interface do store de reservas."""
+
+    def acquire(self, user_id: int, organization_id: int, day: date, start: time, duration: int,
+                service_id: int, ttl: float) -> Hold:
+        # None quando o horário já está reservado por outra pessoa.
+        raise NotImplementedError
+
+    def get(self, token: str) -> Hold:
+        raise NotImplementedError
+
+    def release(self, token: str) -> Hold:
+        raise NotImplementedError
+
+    def busy(self, user_id: int, day: date, exclude_token: str = None):
+        # [(início, duração)] das reservas válidas, no formato dos agendamentos.
+        raise NotImplementedError
+
+    def for_user(self, user_id: int):
+        # [Hold] válidas do barbeiro, em qualquer dia.
+        raise NotImplementedError
+
+    def expire_due(self):
+        # Remove e devolve as reservas vencidas.
+        raise NotImplementedError
+
+
+class HoldLimitError(Exception):
+    pass
+
+
+class InMemoryHoldStore(HoldStore):
+    def __init__(self, maxsize: int = SLOT_HOLDS_MAX, clock_fn=clock.time):
+        self.maxsize = maxsize
+        self._now = clock_fn
+        self._holds = {}
+        self._by_day = {}
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def _remove(self, token: str):
+        hold = self._holds.pop(token, None)
+        if hold is not None:
+            day_holds = self._by_day[(hold.user_id, hold.day)]
+            del day_holds[token]
+            if not day_holds:
+                del self._by_day[(hold.user_id, hold.day)]
+        return hold
+
+    def _expire(self, now: float):
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, token = heapq.heappop(self._expiry_heap)
+            hold = self._remove(token)
+            if hold is not None:
+                expired.append(hold)
+        return expired
+
+    def acquire(self, user_id, organization_id, day, start, duration, service_id, ttl):
+        now = self._now()
+        start_minute = slots.to_minutes(start)
+        with self._lock:
+            self._expire(now)
+            if any(hold.overlaps(start_minute, duration) for hold in self._by_day.get((user_id, day), {}).values()):
+                return None
+            if len(self._holds) >= self.maxsize:
+                raise HoldLimitError()
+            hold = Hold(secrets.token_urlsafe(16), user_id, organization_id, day, start, duration,
+                        service_id, now + ttl)
+            self._holds[hold.token] = hold
+            self._by_day.setdefault((user_id, day), {})[hold.token] = hold
+            heapq.heappush(self._expiry_heap, (hold.expires_at, hold.token))
+        return hold
+
+    def get(self, token):
+        hold = self._holds.get(token)
+        if hold is None or hold.expires_at <= self._now():
+            return None
+        return hold
+
+    def release(self, token):
+        # O item do heap fica para trás e é descartado quando vencer.
+        with self._lock:
+            return self._remove(token)
+
+    def busy(self, user_id, day, exclude_token=None):
+        now = self._now()
+        with self._lock:
+            return [
+                (hold.start, hold.duration)
+                for token, hold in self._by_day.get((user_id, day), {}).items()
+                if hold.expires_at > now and token != exclude_token
+            ]
+
+    def for_user(self, user_id):
+        now = self._now()
+        with self._lock:
+            return [
+                hold
+                for (held_user, _), day_holds in self._by_day.items() if held_user == user_id
+                for hold in day_holds.values() if hold.expires_at > now
+            ]
+
+    def expire_due(self):
+        now = self._now()
+        with self._lock:
+            return self._expire(now)
+
+    def __len__(self):
+        return len(self._holds)
+
+
+class DatabaseHoldStore(HoldStore):
+    """Reservas na tabela slot_holds, compartilhadas entre os workers.
+
+    No Postgres, acquire segura um advisory lock do barbeiro durante a
+    transação, para duas reservas sobrepostas não passarem juntas. As
+    vencidas saem com DELETE ... RETURNING no máximo a cada
+    `sweep_interval` segundos por worker; até lá, as consultas já ignoram
+    o que venceu. A limpeza roda dentro de GETs e usa uma sessão de
+    manutenção, que não prende o cliente ao primário (read-your-writes).
+    """
+
+    LOCK_NAMESPACE = 2202
+
+    def __init__(self, maxsize: int = SLOT_HOLDS_MAX, clock_fn=clock.time, session_factory=None,
+                 sweep_interval: float = 1.0):
+        self.maxsize = maxsize
+        self._now = clock_fn
+        self._session = session_factory or database.SessionLocal
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    @staticmethod
+    def _hold(row) -> Hold:
+        return Hold(row.token, row.user_id, row.organization_id, row.day, row.start_time,
+                    row.duration_minutes, row.service_id, row.expires_at)
+
+    def acquire(self, user_id, organization_id, day, start, duration, service_id, ttl):
+        now = self._now()
+        start_minute = slots.to_minutes(start)
+        table = models.SlotHold
+        with self._session() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                db.execute(select(func.pg_advisory_xact_lock(self.LOCK_NAMESPACE, user_id)))
+            day_holds = db.scalars(select(table).where(
+                table.user_id == user_id, table.day == day, table.expires_at > now
+            )).all()
+            if any(self._hold(row).overlaps(start_minute, duration) for row in day_holds):
+                return None
+            if db.scalar(select(func.count()).select_from(table).where(table.expires_at > now)) >= self.maxsize:
+                raise HoldLimitError()
+            hold = Hold(secrets.token_urlsafe(16), user_id, organization_id, day, start, duration,
+                        service_id, now + ttl)
+            db.add(table(token=hold.token, user_id=user_id, organization_id=organization_id, day=day,
+                         start_time=start, duration_minutes=duration, service_id=service_id,
+                         expires_at=hold.expires_at))
+            db.commit()
+        return hold
+
+    def get(self, token):
+        table = models.SlotHold
+        with self._session() as db:
+            row = db.scalars(select(table).where(table.token == token, table.expires_at > self._now())).first()
+            return self._hold(row) if row is not None else None
+
+    def release(self, token):
+        table = models.SlotHold
+        with self._session() as db:
+            row = db.execute(delete(table).where(table.token == token).returning(*table.__table__.c)).first()
+            db.commit()
+            return self._hold(row) if row is not None else None
+
+    def busy(self, user_id, day, exclude_token=None):
+        table = models.SlotHold
+        stmt = select(table.start_time, table.duration_minutes).where(
+            table.user_id == user_id, table.day == day, table.expires_at > self._now()
+        )
+        if exclude_token is not None:
+            stmt = stmt.where(table.token != exclude_token)
+        with self._session() as db:
+            return [(start, duration) for start, duration in db.execute(stmt)]
+
+    def for_user(self, user_id):
+        table = models.SlotHold
+        with self._session() as db:
+            rows = db.scalars(select(table).where(table.user_id == user_id, table.expires_at > self._now()))
+            return [self._hold(row) for row in rows]
+
+    def expire_due(self):
+        # Cada reserva vencida volta para um único worker, que avisa a liberação.
+        now = self._now()
+        if now < self._next_sweep:
+            return []
+        self._next_sweep = now + self.sweep_interval
+        table = models.SlotHold
+        with self._session(info=database.MAINTENANCE_SESSION_INFO) as db:
+            rows = db.execute(delete(table).where(table.expires_at <= now).returning(*table.__table__.c)).all()
+            db.commit()
+        return [self._hold(row) for row in rows]
+
+
+def _default_store() -> HoldStore:
+    if SLOT_HOLDS_BACKEND:
+        return load_backend(SLOT_HOLDS_BACKEND)
+    if database.WEB_CONCURRENCY > 1:
+        return DatabaseHoldStore()
+    return InMemoryHoldStore()
+
+
+store = _default_store()
+
+
+def _slot_changed(hold: Hold, taken: bool):
+    availability_cache.invalidate_day(hold.user_id, hold.day)
+    slot_events.slot_changed(hold.user_id, hold.day, hold.start, hold.service_id, taken=taken)
+
+
+def expire_due():
+    # Chamado antes de servir horários: libera (e avisa) as reservas vencidas,
+    # para que nenhuma resposta em cache continue mostrando o horário preso.
+    for hold in store.expire_due():
+        _slot_changed(hold, taken=False)
+
+
+def acquire(user_id: int, organization_id: int, day: date, start: time, duration: int,
+            service_id: int, ttl: float = SLOT_HOLD_TTL_SECONDS) -> Hold:
+    expire_due()
+    hold = store.acquire(user_id, organization_id, day, start, duration, service_id, ttl)
+    if hold is not None:
+        _slot_changed(hold, taken=True)
+    return hold
+
+
+def release(token: str, notify: bool = True) -> Hold:
+    hold = store.release(token)
+    if hold is not None and notify:
+        _slot_changed(hold, taken=False)
+    return hold
+
+
+def conflicting_holds(user_id: int, day: date, start: time, duration: int, ignore_token: str = None):
+    start_minute = slots.to_minutes(start)
+    return [
+        (held_start, held_duration)
+        for held_start, held_duration in store.busy(user_id, day, exclude_token=ignore_token)
+        if _overlaps(slots.to_minutes(held_start), held_duration, start_minute, duration)
+    ]
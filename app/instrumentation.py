@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Contagem e tempo das consultas SQL de cada requisição.
+# Os eventos do SQLAlchemy são registrados na classe Engine, então valem
+# para todos os engines (síncrono, assíncrono e os dos testes). O acumulador
+# da requisição fica num ContextVar, que o threadpool do Starlette copia
+# para as rotas síncronas.
+
+# Consultas que levam SLOW_QUERY_MS ou mais são registradas com o SQL e a
+# quantidade de parâmetros. Os valores (senhas, e-mails, telefones...) só
+# entram no log com SLOW_QUERY_LOG_PARAMS=true, para depurar fora de produção.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_PARAMS = os.getenv("SLOW_QUERY_LOG_PARAMS", "false").lower() in ("1", "true", "yes")
+SERVER_TIMING_HEADER = "Server-Timing"
+
+logger = logging.getLogger("app.sql")
+request_logger = logging.getLogger("app.requests")
+
+
+class QueryStats:
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_sql")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+# O início fica no contexto de execução da própria consulta, e não numa pilha
+# da conexão: uma consulta que falha não dispara after_cursor_execute e não
+# pode deixar sobra para as próximas da mesma conexão do pool.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = context._query_started_at
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        params = repr(parameters) if SLOW_QUERY_LOG_PARAMS else f"<{parameter_count(parameters, executemany)} redacted>"
+        logger.warning(
+            "slow_query duration_ms=%.1f sql=%r params=%s",
+            elapsed_ms, statement, params,
+            extra={"duration_ms": round(elapsed_ms, 1), "sql": statement, "params": params},
+        )
+
+
+def parameter_count(parameters, executemany: bool) -> int:
+    if not parameters:
+        return 0
+    if executemany:
+        return sum(len(row) for row in parameters)
+    return len(parameters)
+
+
+def server_timing(stats: QueryStats, total_ms: float) -> str:
+    return (
+        f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", '
+        f'db-slowest;dur={stats.slowest_ms:.1f}, '
+        f"app;dur={total_ms:.1f}"
+    )
+
+
+class QueryTimingMiddleware:
+    """Middleware ASGI: devolve as medidas em Server-Timing e registra uma linha por requisição."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((SERVER_TIMING_HEADER.lower().encode(), server_timing(stats, total_ms).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            # Respostas em streaming continuam consultando depois do cabeçalho;
+            # a linha de log tem o total da requisição inteira.
+            request_logger.info(
+                "request method=%s path=%s status=%s queries=%d db_ms=%.1f slowest_ms=%.1f total_ms=%.1f",
+                scope["method"], scope["path"], status_code, stats.count,
+                stats.total_ms, stats.slowest_ms, total_ms,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "queries": stats.count,
+                    "db_ms": round(stats.total_ms, 1),
+                    "slowest_ms": round(stats.slowest_ms, 1),
+                    "slowest_sql": stats.slowest_sql,
+                    "total_ms": round(total_ms, 1),
+                },
+            )
@@ -1,15 +1,16 @@
-from datetime import date, time, timedelta
-from fastapi import FastAPI, Depends, HTTPException, status
+from datetime import date, datetime, time, timedelta, timezone
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, status
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import List
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app import crud, schemas, models, auth
+from app import crud, schemas, models, auth, slots, database, pagination, availability_cache, bulk, routes_async, instrumentation, metrics, logging_config, serialization, read_routing, reports, slot_events, holds
 from app.models import UserRole
-from app.database import SessionLocal, engine, get_db
+from app.database import SessionLocal, engine, get_db, get_primary_read_db, get_read_db
 from pydantic import BaseModel
-from slugify import slugify
 
 class AppoiontmentStatusUpdate(BaseModel):
     status: str
@@ -36,7 +37,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, logging_config.REQUEST_ID_HEADER],
 )
+# Logging em JSON ao subir a aplicação, qualquer que seja o servidor
+# (gunicorn, uvicorn, TestClient); chamadas repetidas não duplicam handlers.
+app.add_event_handler("startup", logging_config.configure_logging)
+
+app.add_middleware(instrumentation.QueryTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(read_routing.ReadRoutingMiddleware)
+# Por último: é o mais externo, então o id da requisição já vale para os demais.
+app.add_middleware(logging_config.RequestIdMiddleware)
+
+if database.DB_ASYNC:
+    # Precisa vir antes das rotas síncronas: a primeira rota que casa é a usada.
+    app.include_router(routes_async.router)
 
 
 @app.post("/token", response_model=schemas.Token)
@@ -46,12 +61,17 @@ def login_for_access_token(
     ):
     
     user = crud.get_user_by_email(db, email=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if user:
+        valid, new_hash = auth.verify_and_update_password(form_data.password, user.hashed_password)
+    if not user or not valid:
         raise HTTPException(
             status_code=401,
             detail="E-mail ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     access_token = auth.create_access_token(
@@ -75,48 +95,28 @@ def create_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db_user = crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
-    
-    base_slug = slugify(user.organization_name)
-    slug = base_slug
-    counter = 1
-    
-    while db.query(models.Organization).filter(models.Organization.slug == slug).first():
-        slug = f"{base_slug}-{counter}"
-        counter += 1
-    new_org = models.Organization(
-        name=user.organization_name,
-        slug=slug,
-        plan_type="free",
-        is_active=True
-    
-    )
-    db.add(new_org)
-    db.flush()
-    db.refresh(new_org)
-    
+
     hashed_password = auth.get_password_hash(user.password)
-    
-    new_user = models.User(
-        email=user.email,
-        name=user.name,
-        hashed_password=hashed_password,
-        organization_id=new_org.id,
 
-        role=UserRole.OWNER,
-        is_active=True
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return new_user
+    try:
+        return crud.create_organization_with_owner(db, user=user, hashed_password=hashed_password)
+    except crud.EmailAlreadyRegisteredError:
+        raise HTTPException(status_code=400, detail="E-mail já cadastrado")
 
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Boas vindas ao BarberAPI!"}
 
+@app.get("/health/pool")
+def read_pool_status():
+    return database.pool_status()
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/users/me/", response_model=schemas.User)
 def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
     return current_user
@@ -137,16 +137,21 @@ def create_new_service(
 
 @app.get("/services/", response_model=List[schemas.Service])
 def read_all_services(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(auth.get_current_user)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db), 
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
+    after = pagination.decode_cursor(cursor, pagination.ID_CURSOR)
     services = crud.get_services_by_organization(
         db, 
         organization_id=current_user.organization_id,
-        skip=skip, limit=limit)
-    return services
+        after_id=after[0] if after else None,
+        limit=limit + 1,
+        columns=serialization.list_columns(crud.SERVICE_READ_COLUMNS))
+    services = pagination.paginate(response, services, limit, key=lambda service: (service.id,))
+    return serialization.list_response(services, response)
 
 @app.put("/services/{service_id}", response_model=schemas.Service)
 def update_existing_service(
@@ -189,7 +194,7 @@ def create_team_member(
             detail="Apenas donos podem adicionar membros à equipe."
         )
 
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = db.query(models.User.id).filter(models.User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email já cadastrado.")
 
@@ -207,18 +212,26 @@ def create_team_member(
     
     db.add(new_team_member)
     db.commit()
-    db.refresh(new_team_member)
 
     return new_team_member
 
 @app.get("/team/", response_model=list[schemas.UserResponse])
 def read_my_team(
-    db: Session = Depends(get_db),
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    return db.query(models.User)\
-             .filter(models.User.organization_id == current_user.organization_id)\
-             .all()
+    after = pagination.decode_cursor(cursor, pagination.ID_CURSOR)
+    members = crud.get_users_by_organization(
+        db,
+        organization_id=current_user.organization_id,
+        after_id=after[0] if after else None,
+        limit=limit + 1,
+        columns=serialization.list_columns(crud.TEAM_READ_COLUMNS))
+    members = pagination.paginate(response, members, limit, key=lambda member: (member.id,))
+    return serialization.list_response(members, response)
 
 @app.delete("/team/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_member(
@@ -259,10 +272,21 @@ def create_new_availability(
 
 @app.get("/availability/me/", response_model=List[schemas.Availability])
 def read_my_availabilities(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    return crud.get_availabilities_by_user(db, user_id=current_user.id)
+    after = pagination.decode_cursor(cursor, pagination.ID_CURSOR)
+    availabilities = crud.get_availabilities_by_user(
+        db,
+        user_id=current_user.id,
+        after_id=after[0] if after else None,
+        limit=limit + 1,
+        columns=serialization.list_columns(crud.AVAILABILITY_READ_COLUMNS, serialization.AVAILABILITY_JSON_COLUMNS))
+    availabilities = pagination.paginate(response, availabilities, limit, key=lambda availability: (availability.id,))
+    return serialization.list_response(availabilities, response)
 
 @app.delete("/availability/{availability_id}", response_model=schemas.Availability)
 def delete_my_availability(
@@ -276,23 +300,242 @@ def delete_my_availability(
     return db_availability
 
 # --- ENDPOINT DE CRIAÇÃO DE AGENDAMENTOS ---
-@app.post("/appointments/", response_model=schemas.Appointment, status_code=status.HTTP_201_CREATED)
+@app.post("/appointments/", response_model=schemas.Appointment, status_code=status.HTTP_201_CREATED,
+          include_in_schema=not database.DB_ASYNC)
 def create_new_appointment(
     appointment: schemas.AppointmentCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    db_appointment =  crud.create_appointment(db=db, appointment=appointment, user_id=current_user.id)
+    try:
+        db_appointment = crud.create_appointment(db=db, appointment=appointment, user_id=current_user.id)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
     if db_appointment is None:
         raise HTTPException(status_code=404, detail=f"Serviço com id {appointment.service_id} não encontrado")
     return db_appointment
 
-@app.get("/appointments/me/", response_model=List[schemas.Appointment])
+# --- RESERVAS TEMPORÁRIAS DE HORÁRIO ---
+def hold_response(hold: holds.Hold) -> dict:
+    return {
+        "token": hold.token,
+        "appointment_date": hold.day,
+        "appointment_time": hold.start,
+        "service_id": hold.service_id,
+        "duration_minutes": hold.duration,
+        "expires_at": datetime.fromtimestamp(hold.expires_at, timezone.utc),
+    }
+
+@app.post("/appointments/holds/", response_model=schemas.SlotHold, status_code=status.HTTP_201_CREATED)
+def create_slot_hold(
+    hold: schemas.SlotHoldCreate,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    try:
+        db_hold = crud.create_hold(db, hold, user_id=current_user.id, organization_id=current_user.organization_id)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
+    except holds.HoldLimitError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Muitas reservas em aberto.")
+    if db_hold is None:
+        raise HTTPException(status_code=404, detail=f"Serviço com id {hold.service_id} não encontrado")
+    return hold_response(db_hold)
+
+@app.post("/appointments/holds/{token}/confirm", response_model=schemas.Appointment,
+          status_code=status.HTTP_201_CREATED)
+def confirm_slot_hold(
+    token: str,
+    client: schemas.SlotHoldConfirm,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    try:
+        db_appointment = crud.confirm_hold(db, token, client, user_id=current_user.id)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
+    if db_appointment is None:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada ou expirada")
+    return db_appointment
+
+@app.delete("/appointments/holds/{token}", status_code=status.HTTP_204_NO_CONTENT)
+def release_slot_hold(
+    token: str,
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    hold = holds.store.get(token)
+    if hold is None or hold.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada ou expirada")
+    holds.release(token)
+
+# --- AGENDAMENTOS RECORRENTES ---
+MAX_OCCURRENCES_RANGE_DAYS = 92
+
+@app.post("/appointments/recurring/", response_model=schemas.RecurringAppointment,
+          status_code=status.HTTP_201_CREATED)
+def create_recurring_appointment(
+    rule: schemas.RecurringAppointmentCreate,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    try:
+        db_rule = crud.create_recurring(db, rule, user_id=current_user.id,
+                                        organization_id=current_user.organization_id)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail=f"Serviço com id {rule.service_id} não encontrado")
+    return db_rule
+
+@app.get("/appointments/recurring/", response_model=List[schemas.RecurringAppointment])
+def read_my_recurring_appointments(
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    return crud.get_recurring_by_user(db, user_id=current_user.id)
+
+@app.get("/appointments/recurring/occurrences/", response_model=List[schemas.RecurringOccurrence])
+def read_my_recurring_occurrences(
+    date_from: date,
+    date_to: date,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to deve ser igual ou posterior a date_from.")
+    if (date_to - date_from).days >= MAX_OCCURRENCES_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O intervalo máximo é de {MAX_OCCURRENCES_RANGE_DAYS} dias."
+        )
+    occurrences = crud.get_occurrences(db, [current_user.id], date_from, date_to)
+    return sorted(occurrences, key=lambda item: (item.appointment_date, item.appointment_time))
+
+@app.delete("/appointments/recurring/{recurring_id}", response_model=schemas.RecurringAppointment)
+def delete_my_recurring_appointment(
+    recurring_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    db_rule = crud.delete_recurring(db, recurring_id=recurring_id, user_id=current_user.id)
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Agendamento recorrente não encontrado")
+    return db_rule
+
+@app.put("/appointments/recurring/{recurring_id}/occurrences/{original_date}",
+         response_model=schemas.RecurrenceException)
+def change_recurring_occurrence(
+    recurring_id: int,
+    original_date: date,
+    change: schemas.RecurrenceExceptionUpdate,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    # Cancela ou remarca só esta ocorrência; as demais seguem a regra.
+    try:
+        db_exception = crud.change_occurrence(db, recurring_id, current_user.id, original_date, change)
+    except crud.InvalidOccurrenceChange:
+        raise HTTPException(status_code=400, detail="A nova data precisa estar dentro do período da recorrência.")
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
+    if db_exception is None:
+        raise HTTPException(status_code=404, detail="Ocorrência não encontrada")
+    return db_exception
+
+@app.get("/appointments/me/", response_model=List[schemas.AppointmentListItem])
 def read_my_appointments(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    after = pagination.decode_cursor(cursor, pagination.APPOINTMENT_CURSOR)
+    appointments = crud.get_appointments_by_user(
+        db,
+        user_id=current_user.id,
+        after=after,
+        limit=limit + 1,
+        date_from=date_from,
+        date_to=date_to,
+        columns=serialization.list_columns(crud.APPOINTMENT_READ_COLUMNS))
+    if date_to is not None:
+        # Só com a janela fechada as ocorrências recorrentes têm fim.
+        appointments = crud.add_user_occurrences(
+            db, current_user.id, appointments, after, limit + 1, date_from, date_to
+        )
+    appointments = pagination.paginate(response, appointments, limit, key=crud.appointment_key)
+    return serialization.list_response(appointments, response)
+
+@app.post("/appointments/import", response_model=schemas.AppointmentImportResult)
+async def import_appointments(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    return crud.get_appointments_by_user(db, user_id=current_user.id)
+    services, member_ids = await run_in_threadpool(crud.import_context, db, current_user.organization_id)
+    if current_user.role in (UserRole.OWNER, UserRole.ADMIN):
+        allowed_user_ids = member_ids
+    else:
+        allowed_user_ids = {current_user.id}
+
+    parser = bulk.RowParser(bulk.detect_format(request.headers.get("content-type"), format))
+    imported = 0
+    errors = []
+    batch = []
+
+    async def flush():
+        nonlocal imported
+        count, batch_errors = await run_in_threadpool(
+            crud.import_appointments_batch, db, list(batch), current_user.id, allowed_user_ids, services
+        )
+        imported += count
+        errors.extend(batch_errors)
+        batch.clear()
+
+    async for line in bulk.iter_lines(request.stream()):
+        parsed = parser.parse(line)
+        if parsed is None:
+            continue
+        if isinstance(parsed, dict):
+            errors.append(parsed)
+            continue
+        batch.append(parsed)
+        if len(batch) >= bulk.IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    errors.sort(key=lambda error: error["line"])
+    return {"imported": imported, "errors": errors}
+
+@app.get("/appointments/export")
+def export_appointments(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    # Donos e admins exportam a barbearia inteira; barbeiros, só a própria agenda.
+    if current_user.role in (UserRole.OWNER, UserRole.ADMIN):
+        stmt = crud.appointments_export_query(
+            organization_id=current_user.organization_id, date_from=date_from, date_to=date_to
+        )
+    else:
+        stmt = crud.appointments_export_query(user_id=current_user.id, date_from=date_from, date_to=date_to)
+
+    rows = db.execute(stmt)
+    if format == "csv":
+        return StreamingResponse(
+            bulk.iter_csv(rows),
+            media_type=bulk.CSV_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="agendamentos.csv"'},
+        )
+    return StreamingResponse(bulk.iter_ndjson(rows), media_type=bulk.NDJSON_MEDIA_TYPE)
 
 @app.patch("/appointments/{appointment_id}/status", response_model=schemas.Appointment)
 def update_appointment_status(
@@ -301,14 +544,12 @@ def update_appointment_status(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    db_appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
-    
+    try:
+        db_appointment = crud.update_appointment_status(db, appointment_id=appointment_id, status=status_data.status)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
     if not db_appointment:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
-    
-    db_appointment.status = status_data.status
-    db.commit()
-    db.refresh(db_appointment)
     return db_appointment
 
 @app.delete("/appointments/{appointment_id}", response_model=schemas.Appointment)
@@ -322,10 +563,229 @@ def delete_my_appointment(
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
     return db_appointment
 
-@app.get("/appointments/available/", response_model=List[time])
+def load_available_times(db: Session, current_user: auth.Principal, query_date: date,
+                         service_id: Optional[int], step: int):
+    # `db` lê do primário (get_primary_read_db): o que sai daqui vai para o
+    # cache e para o snapshot do SSE/WebSocket, e não pode vir de uma réplica.
+    holds.expire_due()
+    key = availability_cache.cache_key(current_user.id, current_user.organization_id, query_date, service_id, step)
+    entry = availability_cache.get(key)
+    if entry is None:
+        available_times = crud.get_available_times(
+            db=db,
+            user_id=current_user.id,
+            query_date=query_date,
+            service_id=service_id,
+            organization_id=current_user.organization_id,
+            step=step,
+        )
+        if available_times is None:
+            raise HTTPException(status_code=404, detail=f"Serviço com id {service_id} não encontrado")
+        entry = availability_cache.store(key, available_times)
+    return entry
+
+@app.get("/appointments/available/", response_model=List[time], include_in_schema=not database.DB_ASYNC)
 def get_available_appointments(
+    request: Request,
+    response: Response,
     date: date,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    service_id: Optional[int] = None,
+    step: int = Query(slots.DEFAULT_STEP_MINUTES, ge=5, le=240),
+    db: Session = Depends(get_primary_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    entry = load_available_times(db, current_user, date, service_id, step)
+    return availability_cache.respond(request, response, entry)
+
+# --- EVENTOS DE HORÁRIOS (SSE / WEBSOCKET) ---
+# O cliente assina uma vez: recebe os horários livres do dia (snapshot) e
+# depois só as mudanças. A assinatura começa antes do snapshot para nenhum
+# evento cair no intervalo entre os dois.
+
+def slots_snapshot(query_date: date, entry) -> dict:
+    return {"type": "snapshot", "date": query_date.isoformat(), "times": entry[1]}
+
+@app.get("/appointments/available/stream")
+async def stream_available_appointments(
+    date: date,
+    service_id: Optional[int] = None,
+    step: int = Query(slots.DEFAULT_STEP_MINUTES, ge=5, le=240),
+    db: Session = Depends(get_primary_read_db),
+    auth_db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    subscription = slot_events.subscribe(current_user.id, current_user.organization_id, date)
+    try:
+        entry = await run_in_threadpool(load_available_times, db, current_user, date, service_id, step)
+    except HTTPException:
+        subscription.close()
+        raise
+    finally:
+        # As sessões só seriam fechadas no fim do stream; devolve as conexões já.
+        db.close()
+        auth_db.close()
+    return StreamingResponse(
+        slot_events.sse_stream(subscription, slots_snapshot(date, entry)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws/slots")
+async def slot_events_socket(
+    websocket: WebSocket,
+    date: date,
+    token: str,
+    service_id: Optional[int] = None,
+    step: int = Query(slots.DEFAULT_STEP_MINUTES, ge=5, le=240),
+    db: Session = Depends(get_primary_read_db),
+    auth_db: Session = Depends(get_db)
+):
+    # Navegadores não mandam cabeçalhos no WebSocket: o token vem na query string.
+    subscription = None
+    try:
+        current_user = await run_in_threadpool(auth.get_current_principal, token, auth_db)
+        subscription = slot_events.subscribe(current_user.id, current_user.organization_id, date)
+        entry = await run_in_threadpool(load_available_times, db, current_user, date, service_id, step)
+    except HTTPException as error:
+        if subscription is not None:
+            subscription.close()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(error.detail))
+        return
+    finally:
+        db.close()
+        auth_db.close()
+
+    await websocket.accept()
+    await slot_events.websocket_stream(websocket, subscription, slots_snapshot(date, entry))
+
+
+MAX_AVAILABILITY_RANGE_DAYS = 31
+
+@app.get("/appointments/available/range/", response_model=schemas.AvailabilityRange)
+def get_available_appointments_range(
+    date_from: date,
+    date_to: date,
+    barber_ids: Optional[List[int]] = Query(None),
+    service_id: Optional[int] = None,
+    step: int = Query(slots.DEFAULT_STEP_MINUTES, ge=5, le=240),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to deve ser igual ou posterior a date_from.")
+    if (date_to - date_from).days >= MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O intervalo máximo é de {MAX_AVAILABILITY_RANGE_DAYS} dias."
+        )
+
+    barbers = crud.get_available_times_range(
+        db,
+        organization_id=current_user.organization_id,
+        date_from=date_from,
+        date_to=date_to,
+        user_ids=barber_ids,
+        service_id=service_id,
+        step=step,
+    )
+    if barbers is None:
+        raise HTTPException(status_code=404, detail=f"Serviço com id {service_id} não encontrado")
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "step": step,
+        "service_id": service_id,
+        "barbers": barbers,
+    }
+
+
+@app.get("/schedule/board/", response_model=schemas.ScheduleBoard)
+def read_schedule_board(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    # Quadro da barbearia inteira: agendamentos de todos os barbeiros com
+    # serviço e preço, mais contadores e ocupação por barbeiro e dia.
+    if current_user.role not in (UserRole.OWNER, UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas donos podem ver o quadro da barbearia."
+        )
+    date_from = date_from or date.today()
+    date_to = date_to or date_from
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to deve ser igual ou posterior a date_from.")
+    if (date_to - date_from).days >= MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O intervalo máximo é de {MAX_AVAILABILITY_RANGE_DAYS} dias."
+        )
+
+    return crud.get_schedule_board(
+        db, organization_id=current_user.organization_id, date_from=date_from, date_to=date_to
+    )
+
+
+# --- RELATÓRIOS ---
+MAX_REPORT_RANGE_DAYS = 366
+
+def check_report_request(current_user: auth.Principal, date_from: date, date_to: date):
+    if current_user.role not in (UserRole.OWNER, UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas donos podem ver os relatórios."
+        )
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to deve ser igual ou posterior a date_from.")
+    if (date_to - date_from).days >= MAX_REPORT_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"O intervalo máximo é de {MAX_REPORT_RANGE_DAYS} dias.")
+
+@app.get("/reports/revenue/", response_model=schemas.RevenueReport)
+def read_revenue_report(
+    date_from: date,
+    date_to: date,
+    period: str = Query("day", pattern="^(day|month)$"),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    return crud.get_available_times(db=db, user_id=current_user.id, query_date=date)
\ No newline at end of file
+    check_report_request(current_user, date_from, date_to)
+    daily = crud.get_daily_revenue(db, current_user.organization_id, date_from, date_to)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "period": period,
+        "total_revenue": sum(row.revenue for row in daily),
+        "rows": reports.revenue_by_period(daily, period),
+    }
+
+@app.get("/reports/statuses/", response_model=schemas.StatusReport)
+def read_status_report(
+    date_from: date,
+    date_to: date,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    check_report_request(current_user, date_from, date_to)
+    counts = crud.get_status_counts(db, current_user.organization_id, date_from, date_to)
+    return {"date_from": date_from, "date_to": date_to, "statuses": dict(counts)}
+
+@app.get("/reports/occupancy/", response_model=schemas.OccupancyReport)
+def read_occupancy_report(
+    date_from: date,
+    date_to: date,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    check_report_request(current_user, date_from, date_to)
+    organization_id = current_user.organization_id
+    barbers = reports.occupancy_by_barber(
+        crud.get_organization_members(db, organization_id),
+        crud.get_barber_totals(db, organization_id, date_from, date_to),
+        db.execute(crud.organization_availability_query(organization_id)),
+        date_from,
+        date_to,
+    )
+    return {"date_from": date_from, "date_to": date_to, "barbers": barbers}
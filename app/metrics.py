@@ -0,0 +1,101 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Métricas no formato do Prometheus, expostas em /metrics.
+# Com vários workers do gunicorn, PROMETHEUS_MULTIPROC_DIR aponta para um
+# diretório compartilhado (ver gunicorn_conf.py): cada processo grava seus
+# valores em arquivos mmap e a coleta soma todos na hora do scrape.
+# Taxas (acerto de cache, conflito de agendamento) saem dos contadores, ex.:
+#   sum(rate(cache_lookups_total{result="hit"}[5m])) / sum(rate(cache_lookups_total[5m]))
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "http_requests", "Requisições HTTP por status.",
+    ["method", "route", "status"],
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requisições HTTP em andamento.",
+    multiprocess_mode="livesum",
+)
+
+BOOKINGS = Counter(
+    "appointment_bookings", "Tentativas de agendamento por resultado.",
+    ["outcome"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups", "Consultas aos caches da aplicação.",
+    ["cache", "result"],
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Conexões do pool em uso.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Espera por uma conexão livre no pool.",
+    buckets=POOL_WAIT_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts", "Checkouts que estouraram o pool_timeout.")
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência e contagem de status por rota (o template, não o caminho)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_PROGRESS.dec()
+            # O roteador do FastAPI grava a rota encontrada no próprio scope.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route).observe(time.perf_counter() - started)
+            REQUESTS.labels(scope["method"], route, str(status_code)).inc()
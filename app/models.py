@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Float, Time, ForeignKey, Date, DateTime, Boolean, Enum as PgEnum
+from sqlalchemy import Column, Integer, String, Float, Time, ForeignKey, Date, DateTime, Boolean, Index, Enum as PgEnum
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -7,7 +7,20 @@ class UserRole(str, enum.Enum):
     OWNER = "owner"
     BARBER = "barber"
     ADMIN = "admin"
-    
+
+
+CANCELLED_STATUSES = ("cancelled", "cancelado", "canceled")
+
+
+def normalized_status(status):
+    # Sem status conta como pendente; a comparação ignora maiúsculas.
+    return func.lower(func.coalesce(status, "pending"))
+
+
+def active_status(status):
+    # A mesma regra do índice uq_appointments_active_slot e do crud.
+    return normalized_status(status).notin_(CANCELLED_STATUSES)
+
 
 from app.database import Base
 
@@ -24,6 +37,16 @@ class Organization(Base):
     
     users = relationship("User", back_populates="organization")
 
+    # Índice para a busca por prefixo (LIKE 'base-%') na alocação de slugs;
+    # no Postgres o índice único de slug não atende LIKE fora da collation C.
+    __table_args__ = (
+        Index(
+            "ix_organizations_slug_pattern",
+            slug,
+            postgresql_ops={"slug": "text_pattern_ops"},
+        ),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -34,7 +57,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     hashed_password = Column(String(255))
 
-    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True, index=True)
     organization = relationship("Organization", back_populates="users")
     role = Column(PgEnum(UserRole), default=UserRole.OWNER, nullable=False, server_default='OWNER')
     
@@ -48,7 +71,7 @@ class Service(Base):
     name = Column(String(100), index=True)
     duration_minutes = Column(Integer)
     price = Column(Float)
-    organization_id = Column(Integer, ForeignKey("organizations.id"))
+    organization_id = Column(Integer, ForeignKey("organizations.id"), index=True)
 
     appointments = relationship("Appointment", back_populates="service")
 
@@ -63,6 +86,14 @@ class Availability(Base):
 
     owner = relationship("User", back_populates="availabilities")
 
+    __table_args__ = (
+        Index(
+            "ix_availabilities_user_day",
+            user_id, day_of_week,
+            postgresql_include=["start_time", "end_time"],
+        ),
+    )
+
 
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -73,9 +104,116 @@ class Appointment(Base):
     appointment_date = Column(Date)
     appointment_time = Column(Time)
     service_id = Column(Integer, ForeignKey("services.id"))
+    # Preço e duração do serviço no momento do agendamento: os resumos somam
+    # e subtraem estes valores, que não mudam quando o serviço é editado.
+    price = Column(Float, nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
     
     status = Column(String, default="pending")
 
     user_id = Column(Integer, ForeignKey("users.id"))
     barber = relationship("User", back_populates="appointments")
-    service = relationship("Service", back_populates="appointments")
\ No newline at end of file
+    service = relationship("Service", back_populates="appointments")
+
+    # Um barbeiro não pode ter dois agendamentos ativos no mesmo horário.
+    # O índice é parcial: agendamentos cancelados liberam o horário.
+    __table_args__ = (
+        Index(
+            "uq_appointments_active_slot",
+            user_id, appointment_date, appointment_time,
+            unique=True,
+            postgresql_where=active_status(status),
+            sqlite_where=active_status(status),
+        ),
+        # Caminho quente dos horários livres e da listagem por barbeiro/dia.
+        Index(
+            "ix_appointments_user_date_status",
+            user_id, appointment_date, status,
+            postgresql_include=["appointment_time", "service_id"],
+        ),
+    )
+
+class ScheduleDaySummary(Base):
+    # Resumo da agenda por barbearia, dia e barbeiro, mantido pelo crud a cada
+    # agendamento criado, removido ou com status alterado.
+    __tablename__ = "schedule_day_summaries"
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    appointments = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+
+class AppointmentStatusSummary(Base):
+    # Agendamentos por status (em minúsculas) em cada dia e barbeiro, mantido
+    # junto com schedule_day_summaries; alimenta os relatórios.
+    __tablename__ = "appointment_status_summaries"
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    status = Column(String, primary_key=True)
+
+    appointments = Column(Integer, nullable=False, default=0)
+
+class RecurringAppointment(Base):
+    # Agendamento fixo (toda semana, a cada duas...): uma linha por regra, e
+    # as ocorrências são calculadas sob demanda (app.recurrence) em vez de
+    # virarem linhas em appointments.
+    __tablename__ = "recurring_appointments"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
+    client_name = Column(String(100))
+    client_email = Column(String(100))
+    client_phone = Column(String(20), nullable=True)
+
+    # Como em availabilities: segunda=0. Sempre o dia da semana de start_date.
+    day_of_week = Column(Integer, nullable=False)
+    appointment_time = Column(Time, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True)
+    interval_weeks = Column(Integer, nullable=False, default=1)
+
+    exceptions = relationship("RecurrenceException", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_recurring_appointments_user_day", user_id, day_of_week),
+    )
+
+
+class RecurrenceException(Base):
+    # Uma ocorrência cancelada ou remarcada (nova data e/ou horário).
+    __tablename__ = "recurrence_exceptions"
+    id = Column(Integer, primary_key=True, index=True)
+    recurring_id = Column(Integer, ForeignKey("recurring_appointments.id", ondelete="CASCADE"), nullable=False)
+    original_date = Column(Date, nullable=False)
+    cancelled = Column(Boolean, nullable=False, default=False)
+    new_date = Column(Date, nullable=True)
+    new_time = Column(Time, nullable=True)
+
+    __table_args__ = (
+        Index("uq_recurrence_exceptions_occurrence", recurring_id, original_date, unique=True),
+        Index("ix_recurrence_exceptions_recurring_new_date", recurring_id, new_date),
+    )
+
+
+class SlotHold(Base):
+    # Reserva temporária de horário (app.holds.DatabaseHoldStore), visível
+    # para todos os workers. expires_at em segundos desde a época, como no
+    # store em memória.
+    __tablename__ = "slot_holds"
+    token = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    organization_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    start_time = Column(Time, nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    service_id = Column(Integer, nullable=False)
+    expires_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_slot_holds_user_day", user_id, day),
+        Index("ix_slot_holds_expires_at", expires_at),
+    )
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import date, time
+
+from fastapi import HTTPException, Response
+
+# Paginação por cursor (keyset): o cursor é a chave de ordenação da última
+# linha devolvida, codificada em base64url; a próxima página começa depois
+# dela, sem OFFSET.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+APPOINTMENT_CURSOR = (date.fromisoformat, time.fromisoformat, int)
+ID_CURSOR = (int,)
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, (date, time)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, kinds):
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(kinds):
+            raise ValueError(cursor)
+        return tuple(kind(value) for kind, value in zip(kinds, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def paginate(response: Response, rows, limit: int, key):
+    # `rows` vem com limit + 1 linhas: a sobra só indica que há próxima página.
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
@@ -0,0 +1,68 @@
+import hashlib
+import itertools
+import threading
+from contextvars import ContextVar
+
+from app.cache import CacheBackend
+
+# Roteamento das leituras entre o primário e as réplicas.
+#
+# As rotas GET (get_read_db) leem de uma réplica em rodízio. Quem acabou de
+# gravar algo volta a ler do primário por alguns segundos (read-your-writes),
+# para não ver a réplica ainda atrasada. O "quem" é o cabeçalho Authorization
+# da requisição (guardado só como hash); a gravação é detectada por qualquer
+# commit de sessão feito durante a requisição.
+
+_sticky_key: ContextVar = ContextVar("read_sticky_key", default=None)
+
+
+def sticky_key_from_headers(headers) -> str:
+    for name, value in headers:
+        if name == b"authorization":
+            return "read:sticky:" + hashlib.blake2b(value, digest_size=16).hexdigest()
+    return None
+
+
+def current_key() -> str:
+    return _sticky_key.get()
+
+
+class ReadRouter:
+    def __init__(self, primary, replicas, sticky_seconds: float, backend: CacheBackend):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.backend = backend
+        self._next_replica = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def mark_write(self, key: str):
+        if key and self.replicas:
+            self.backend.set(key, True, ttl=self.sticky_seconds)
+
+    def bind_for(self, key: str = None):
+        if not self.replicas or (key and self.backend.get(key)):
+            return self.primary
+        with self._lock:
+            return next(self._next_replica)
+
+    def current_bind(self):
+        return self.bind_for(current_key())
+
+
+class ReadRoutingMiddleware:
+    """Middleware ASGI: deixa a chave de read-your-writes da requisição num ContextVar."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _sticky_key.set(sticky_key_from_headers(scope["headers"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _sticky_key.reset(token)
+
@@ -0,0 +1,99 @@
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from math import gcd
+
+# Agendamentos recorrentes: cada regra (recurring_appointments) guarda a
+# primeira data, o intervalo em semanas e, opcionalmente, a última data. As
+# ocorrências só existem quando alguém pergunta por um período: `expand`
+# gera as datas da janela pedida e aplica as exceções (ocorrência cancelada
+# ou remarcada). O armazenamento cresce com o número de regras, não com o de
+# ocorrências.
+
+Occurrence = namedtuple("Occurrence", (
+    "recurring_id", "user_id", "original_date", "appointment_date", "appointment_time",
+    "service_id", "service_name", "price", "duration_minutes", "client_name", "client_email", "client_phone",
+    "moved",
+))
+
+
+def first_on_or_after(start: date, interval_weeks: int, day: date) -> date:
+    """Primeira data da progressão start, start + intervalo, ... que não é anterior a `day`."""
+    if day <= start:
+        return start
+    period = 7 * interval_weeks
+    steps = -(-(day - start).days // period)
+    return start + timedelta(days=steps * period)
+
+
+def is_occurrence(start: date, interval_weeks: int, end: date, day: date) -> bool:
+    return start <= day and (end is None or day <= end) and (day - start).days % (7 * interval_weeks) == 0
+
+
+def rule_dates(start: date, interval_weeks: int, end: date, date_from: date, date_to: date):
+    """Gera, em ordem, as datas da regra dentro de [date_from, date_to]."""
+    last = date_to if end is None else min(end, date_to)
+    day = first_on_or_after(start, interval_weeks, date_from)
+    step = timedelta(weeks=interval_weeks)
+    while day <= last:
+        yield day
+        day += step
+
+
+def rules_intersect(start: date, interval_weeks: int, end: date,
+                    other_start: date, other_interval_weeks: int, other_end: date) -> bool:
+    """Se duas regras no mesmo dia da semana e horário chegam a cair na mesma data."""
+    if (other_start - start).days % 7:
+        return False
+    # As coincidências se repetem a cada mmc(intervalos) semanas; basta olhar um ciclo.
+    cycle = interval_weeks * other_interval_weeks // gcd(interval_weeks, other_interval_weeks)
+    first = max(start, other_start)
+    last = first + timedelta(weeks=cycle)
+    for bound in (end, other_end):
+        if bound is not None:
+            last = min(last, bound)
+    return any(
+        is_occurrence(other_start, other_interval_weeks, other_end, day)
+        for day in rule_dates(start, interval_weeks, end, first, last)
+    )
+
+
+def expand(rules, exceptions, date_from: date, date_to: date):
+    """Ocorrências das `rules` em [date_from, date_to], com as `exceptions` aplicadas.
+
+    `rules` tem recurring_id, user_id, start_date, end_date, interval_weeks,
+    appointment_time, service_id, service_name, price, duration_minutes,
+    client_name, client_email e client_phone;
+    `exceptions` tem recurring_id, original_date, cancelled, new_date e
+    new_time, e precisa incluir toda exceção cuja data original ou nova
+    esteja na janela. A ordem de saída não é garantida.
+    """
+    rules = {rule.recurring_id: rule for rule in rules}
+    changed = {(exception.recurring_id, exception.original_date): exception for exception in exceptions}
+
+    def occurrence(rule, original_date, day, start, moved):
+        return Occurrence(rule.recurring_id, rule.user_id, original_date, day, start, rule.service_id,
+                          rule.service_name, rule.price, rule.duration_minutes,
+                          rule.client_name, rule.client_email, rule.client_phone, moved)
+
+    for rule in rules.values():
+        for day in rule_dates(rule.start_date, rule.interval_weeks, rule.end_date, date_from, date_to):
+            if (rule.recurring_id, day) not in changed:
+                yield occurrence(rule, day, day, rule.appointment_time, False)
+
+    for (recurring_id, original_date), exception in changed.items():
+        rule = rules.get(recurring_id)
+        if rule is None or exception.cancelled:
+            continue
+        if not is_occurrence(rule.start_date, rule.interval_weeks, rule.end_date, original_date):
+            continue
+        day = exception.new_date or original_date
+        if date_from <= day <= date_to:
+            yield occurrence(rule, original_date, day, exception.new_time or rule.appointment_time, True)
+
+
+def busy_by_day(occurrences):
+    """{(barbeiro, dia): [(início, duração)]}, no formato dos agendamentos do motor de horários."""
+    busy = defaultdict(list)
+    for item in occurrences:
+        busy[(item.user_id, item.appointment_date)].append((item.appointment_time, item.duration_minutes))
+    return busy
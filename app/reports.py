@@ -0,0 +1,82 @@
+"""Relatórios da barbearia sobre os resumos diários, e a reconstrução dos resumos.
+
+    python -m app.reports rebuild                    # todas as barbearias
+    python -m app.reports rebuild --organization-id 3
+"""
+import argparse
+from datetime import timedelta
+
+from app import crud, logging_config, schedule
+from app.database import SessionLocal
+
+PERIODS = ("day", "month")
+
+
+def revenue_by_period(daily_rows, period: str = "day"):
+    # As linhas diárias já vêm somadas no banco; por mês, só agrupa aqui.
+    if period == "day":
+        return [
+            {"period": row.day, "appointments": row.appointments,
+             "cancelled": row.cancelled, "revenue": row.revenue}
+            for row in daily_rows
+        ]
+    months = {}
+    for row in daily_rows:
+        entry = months.setdefault(row.day.replace(day=1), {"appointments": 0, "cancelled": 0, "revenue": 0.0})
+        entry["appointments"] += row.appointments
+        entry["cancelled"] += row.cancelled
+        entry["revenue"] += row.revenue
+    return [{"period": month, **entry} for month, entry in months.items()]
+
+
+def weekday_counts(date_from, date_to):
+    """Quantas segundas, terças... existem no intervalo (segunda=0)."""
+    counts = [0] * 7
+    total_days = (date_to - date_from).days + 1
+    for offset in range(7):
+        day = date_from + timedelta(days=offset)
+        if offset < total_days:
+            counts[day.weekday()] = (total_days - offset + 6) // 7
+    return counts
+
+
+def occupancy_by_barber(barbers, totals, availability_rows, date_from, date_to):
+    # Minutos disponíveis = minutos da grade semanal x ocorrências de cada dia da semana.
+    minutes_by_weekday = schedule.available_minutes(availability_rows)
+    counts = weekday_counts(date_from, date_to)
+    totals_by_barber = {row.user_id: row for row in totals}
+    result = []
+    for user_id, name in barbers:
+        row = totals_by_barber.get(user_id)
+        available = sum(minutes_by_weekday.get((user_id, weekday), 0) * counts[weekday] for weekday in range(7))
+        booked = row.booked_minutes if row else 0
+        result.append({
+            "user_id": user_id,
+            "name": name,
+            "appointments": row.appointments if row else 0,
+            "revenue": row.revenue if row else 0.0,
+            "booked_minutes": booked,
+            "available_minutes": available,
+            "occupancy": round(booked / available, 4) if available else None,
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="recalcula os resumos a partir dos agendamentos")
+    rebuild.add_argument("--organization-id", type=int, help="só esta barbearia")
+    args = parser.parse_args()
+    logging_config.configure_logging()
+
+    with SessionLocal() as db:
+        if not crud.summary_enabled(db):
+            parser.exit(1, "Resumos desativados (SCHEDULE_SUMMARY_ENABLED) ou banco sem suporte.\n")
+        crud.rebuild_summaries(db, organization_id=args.organization_id)
+    target = f"barbearia {args.organization_id}" if args.organization_id is not None else "todas as barbearias"
+    print(f"Resumos reconstruídos: {target}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from datetime import date, time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import auth, availability_cache, crud, crud_async, holds, schemas, slots
+from app.database import get_async_db
+
+# Rotas do caminho de agendamento servidas direto no event loop (DB_ASYNC=true).
+# Registradas antes das rotas síncronas equivalentes em app.main.
+router = APIRouter()
+
+
+@router.post("/appointments/", response_model=schemas.Appointment, status_code=status.HTTP_201_CREATED)
+async def create_new_appointment(
+    appointment: schemas.AppointmentCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    try:
+        db_appointment = await crud_async.create_appointment(db=db, appointment=appointment, user_id=current_user.id)
+    except crud.SlotUnavailableError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário indisponível para este profissional.")
+    if db_appointment is None:
+        raise HTTPException(status_code=404, detail=f"Serviço com id {appointment.service_id} não encontrado")
+    return db_appointment
+
+
+@router.get("/appointments/available/", response_model=List[time])
+async def get_available_appointments(
+    request: Request,
+    response: Response,
+    date: date,
+    service_id: Optional[int] = None,
+    step: int = Query(slots.DEFAULT_STEP_MINUTES, ge=5, le=240),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    await run_in_threadpool(holds.expire_due)
+    key = availability_cache.cache_key(current_user.id, current_user.organization_id, date, service_id, step)
+    entry = availability_cache.get(key)
+    if entry is None:
+        available_times = await crud_async.get_available_times(
+            db=db,
+            user_id=current_user.id,
+            query_date=date,
+            service_id=service_id,
+            organization_id=current_user.organization_id,
+            step=step,
+        )
+        if available_times is None:
+            raise HTTPException(status_code=404, detail=f"Serviço com id {service_id} não encontrado")
+        entry = availability_cache.store(key, available_times)
+    return availability_cache.respond(request, response, entry)
@@ -0,0 +1,111 @@
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from app import models, slots
+
+# Quadro da agenda da barbearia: junta, para cada dia e barbeiro, os
+# agendamentos (uma consulta só), as ocorrências dos agendamentos
+# recorrentes, o resumo do dia (schedule_day_summaries) e os minutos
+# disponíveis da grade semanal, de onde sai a ocupação.
+
+SUMMARY_FIELDS = ("appointments", "cancelled", "revenue", "booked_minutes")
+
+DaySummary = namedtuple("DaySummary", ("day", "user_id") + SUMMARY_FIELDS)
+
+BoardRow = namedtuple("BoardRow", (
+    "id", "recurring_id", "appointment_date", "appointment_time", "user_id", "client_name", "client_phone",
+    "status", "service_id", "service_name", "price", "duration_minutes",
+))
+
+
+def available_minutes(availability_rows):
+    """Minutos disponíveis por (barbeiro, dia da semana), com janelas sobrepostas mescladas."""
+    windows = defaultdict(list)
+    for user_id, day_of_week, start, end in availability_rows:
+        windows[(user_id, day_of_week)].append((slots.to_minutes(start), slots.to_minutes(end)))
+    return {
+        key: sum(end - start for start, end in slots.merge_intervals(intervals))
+        for key, intervals in windows.items()
+    }
+
+
+def summarize_appointments(appointments):
+    """Mesmo resultado do resumo mantido no banco, calculado a partir das linhas do quadro."""
+    totals = {}
+    for row in appointments:
+        key = (row.appointment_date, row.user_id)
+        summary = totals.setdefault(key, dict.fromkeys(SUMMARY_FIELDS, 0))
+        if (row.status or "pending").lower() in models.CANCELLED_STATUSES:
+            summary["cancelled"] += 1
+            continue
+        summary["appointments"] += 1
+        summary["revenue"] += row.price or 0
+        summary["booked_minutes"] += row.duration_minutes or 0
+    return [DaySummary(day, user_id, **values) for (day, user_id), values in totals.items()]
+
+
+def occurrence_rows(occurrences):
+    """Ocorrências recorrentes no formato das linhas do quadro: sem id e pendentes."""
+    return [
+        BoardRow(**{field: getattr(item, field, None) for field in BoardRow._fields})._replace(status="pending")
+        for item in occurrences
+    ]
+
+
+def merge_summaries(*groups):
+    """Soma, por (dia, barbeiro), resumos vindos de fontes diferentes."""
+    totals = {}
+    for group in groups:
+        for row in group:
+            summary = totals.setdefault((row.day, row.user_id), dict.fromkeys(SUMMARY_FIELDS, 0))
+            for field in SUMMARY_FIELDS:
+                summary[field] += getattr(row, field)
+    return [DaySummary(day, user_id, **values) for (day, user_id), values in totals.items()]
+
+
+def build_board(date_from, date_to, barbers, appointments, summaries, minutes_by_weekday):
+    """Monta o quadro no formato de schemas.ScheduleBoard.
+
+    `barbers` é uma sequência de (id, nome); os dias sem agendamento aparecem
+    com os contadores zerados para que a grade fique completa.
+    """
+    items = defaultdict(list)
+    for row in appointments:
+        items[(row.appointment_date, row.user_id)].append({
+            "id": row.id,
+            "recurring_id": row.recurring_id,
+            "appointment_time": row.appointment_time,
+            "client_name": row.client_name,
+            "client_phone": row.client_phone,
+            "status": row.status or "pending",
+            "service_id": row.service_id,
+            "service_name": row.service_name,
+            "price": row.price,
+            "duration_minutes": row.duration_minutes,
+        })
+    summary_by_key = {(row.day, row.user_id): row for row in summaries}
+
+    days = []
+    day = date_from
+    while day <= date_to:
+        entries = []
+        for user_id, name in barbers:
+            summary = summary_by_key.get((day, user_id))
+            counters = {field: getattr(summary, field) if summary else 0 for field in SUMMARY_FIELDS}
+            available = minutes_by_weekday.get((user_id, day.weekday()), 0)
+            entries.append({
+                "user_id": user_id,
+                "name": name,
+                **counters,
+                "available_minutes": available,
+                "occupancy": round(counters["booked_minutes"] / available, 4) if available else None,
+                "items": items.get((day, user_id), []),
+            })
+        days.append({
+            "day": day,
+            "appointments": sum(entry["appointments"] for entry in entries),
+            "revenue": sum(entry["revenue"] for entry in entries),
+            "barbers": entries,
+        })
+        day += timedelta(days=1)
+    return {"date_from": date_from, "date_to": date_to, "days": days}
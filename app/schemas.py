@@ -1,6 +1,6 @@
-from datetime import time, date
+from datetime import date, datetime, time
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from typing import Dict, List, Optional
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -113,4 +113,174 @@ class Appointment(AppointmentBase):
     class Config:
         from_attributes = True
 
+class AppointmentListItem(Appointment):
+    # Em /appointments/me/, as ocorrências de agendamentos recorrentes vêm
+    # sem id e com o recurring_id da regra.
+    id: Optional[int] = None
+    recurring_id: Optional[int] = None
 
+
+
+
+class SlotHoldCreate(BaseModel):
+    appointment_date: date
+    appointment_time: time
+    service_id: int
+
+class SlotHold(SlotHoldCreate):
+    token: str
+    duration_minutes: int
+    expires_at: datetime
+
+class SlotHoldConfirm(BaseModel):
+    client_name: str
+    client_email: EmailStr
+    client_phone: Optional[str] = None
+
+
+class RecurringAppointmentBase(BaseModel):
+    client_name: str
+    client_email: EmailStr
+    client_phone: Optional[str] = None
+    service_id: int
+    appointment_time: time
+    start_date: date
+    end_date: Optional[date] = None
+    interval_weeks: int = 1
+
+class RecurringAppointmentCreate(RecurringAppointmentBase):
+
+    @field_validator('interval_weeks')
+    @classmethod
+    def validate_interval_weeks(cls, v: int) -> int:
+        if not 1 <= v <= 8:
+            raise ValueError("interval_weeks deve estar entre 1 e 8")
+        return v
+
+    @field_validator('end_date')
+    @classmethod
+    def validate_end_date(cls, v: Optional[date], info) -> Optional[date]:
+        if v is not None and v < info.data.get("start_date", v):
+            raise ValueError("end_date não pode ser anterior a start_date")
+        return v
+
+class RecurringAppointment(RecurringAppointmentBase):
+    id: int
+    user_id: int
+
+    class Config:
+        from_attributes = True
+
+class RecurrenceExceptionUpdate(BaseModel):
+    # cancelled=True cancela a ocorrência; senão, data e/ou horário novos.
+    cancelled: bool = False
+    appointment_date: Optional[date] = None
+    appointment_time: Optional[time] = None
+
+class RecurrenceException(BaseModel):
+    recurring_id: int
+    original_date: date
+    cancelled: bool
+    new_date: Optional[date] = None
+    new_time: Optional[time] = None
+
+    class Config:
+        from_attributes = True
+
+class RecurringOccurrence(BaseModel):
+    recurring_id: int
+    user_id: int
+    original_date: date
+    appointment_date: date
+    appointment_time: time
+    service_id: int
+    duration_minutes: Optional[int] = None
+    client_name: str
+    client_phone: Optional[str] = None
+    moved: bool
+
+
+class AppointmentImportError(BaseModel):
+    line: int
+    detail: str
+
+class AppointmentImportResult(BaseModel):
+    imported: int
+    errors: List[AppointmentImportError]
+
+
+class AvailabilityRange(BaseModel):
+    date_from: date
+    date_to: date
+    step: int
+    service_id: Optional[int] = None
+    barbers: Dict[int, Dict[date, List[time]]]
+
+
+class ScheduleBoardAppointment(BaseModel):
+    # Ocorrências de agendamentos recorrentes vêm sem id e com o da regra.
+    id: Optional[int] = None
+    recurring_id: Optional[int] = None
+    appointment_time: time
+    client_name: str
+    client_phone: Optional[str] = None
+    status: str
+    service_id: Optional[int] = None
+    service_name: Optional[str] = None
+    price: Optional[float] = None
+    duration_minutes: Optional[int] = None
+
+class ScheduleBarberDay(BaseModel):
+    user_id: int
+    name: Optional[str] = None
+    appointments: int
+    cancelled: int
+    revenue: float
+    booked_minutes: int
+    available_minutes: int
+    occupancy: Optional[float] = None
+    items: List[ScheduleBoardAppointment]
+
+class ScheduleDay(BaseModel):
+    day: date
+    appointments: int
+    revenue: float
+    barbers: List[ScheduleBarberDay]
+
+class ScheduleBoard(BaseModel):
+    date_from: date
+    date_to: date
+    days: List[ScheduleDay]
+
+
+class RevenueRow(BaseModel):
+    period: date
+    appointments: int
+    cancelled: int
+    revenue: float
+
+class RevenueReport(BaseModel):
+    date_from: date
+    date_to: date
+    period: str
+    total_revenue: float
+    rows: List[RevenueRow]
+
+class StatusReport(BaseModel):
+    date_from: date
+    date_to: date
+    statuses: Dict[str, int]
+
+class BarberOccupancy(BaseModel):
+    user_id: int
+    name: Optional[str] = None
+    appointments: int
+    revenue: float
+    booked_minutes: int
+    available_minutes: int
+    occupancy: Optional[float] = None
+
+class OccupancyReport(BaseModel):
+    date_from: date
+    date_to: date
+    barbers: List[BarberOccupancy]
@@ -0,0 +1,43 @@
+import os
+
+from fastapi import Response
+from pydantic_core import to_json
+
+from app import crud, models, schemas
+
+# Caminho rápido (opcional) das listagens: em vez de validar cada linha no
+# response_model e passar pelo jsonable_encoder, as linhas projetadas do crud
+# (só as colunas do schema, com o nome e na ordem dos campos) são
+# serializadas direto para bytes pelo pydantic-core. O JSON sai igual ao do
+# caminho normal.
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+# Sem o response_model, a conversão do validador de schemas.Availability
+# (no banco segunda=0, na API domingo=0) é feita no próprio SELECT.
+AVAILABILITY_JSON_COLUMNS = crud.schema_columns(
+    schemas.Availability, models.Availability,
+    day_of_week=(models.Availability.day_of_week + 1) % 7,
+)
+
+
+def list_columns(columns, json_columns=None):
+    # Projeção da listagem; no caminho rápido, a variante pronta para o JSON.
+    if FAST_JSON_RESPONSES and json_columns is not None:
+        return json_columns
+    return columns
+
+
+def json_rows(rows, response: Response = None) -> Response:
+    # Cabeçalhos definidos no `response` injetado (ex.: X-Next-Cursor) não são
+    # aplicados quando a rota devolve um Response próprio; por isso são copiados.
+    return Response(
+        content=to_json([row._asdict() for row in rows]),
+        media_type="application/json",
+        headers=dict(response.headers) if response is not None else None,
+    )
+
+
+def list_response(rows, response: Response):
+    return json_rows(rows, response) if FAST_JSON_RESPONSES else rows
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time as clock
+from datetime import date, time
+
+from starlette.websockets import WebSocketDisconnect
+
+from app.cache import load_backend
+
+# Eventos de mudança de horários, para o front assinar uma vez em vez de
+# consultar /appointments/available/ a cada poucos segundos.
+#
+# Cada assinatura acompanha um barbeiro num dia e recebe os eventos de três
+# canais, os mesmos escopos das gerações do availability_cache:
+#   slots:{barbeiro}:{dia}  slot_taken / slot_freed (agendamentos)
+#   slots:{barbeiro}        availability_changed (grade semanal)
+#   slots:org:{barbearia}   services_changed (duração dos serviços)
+# Nos dois últimos o cliente busca os horários de novo.
+#
+# O broker padrão entrega só dentro do worker. Com vários workers, aponte
+# SLOT_EVENTS_BROKER para um broker compartilhado (subclasse de
+# SlotEventBroker), por exemplo app.slot_events:PostgresNotifyBroker.
+
+SLOT_EVENTS_BROKER = os.getenv("SLOT_EVENTS_BROKER")
+SLOT_EVENTS_QUEUE_SIZE = int(os.getenv("SLOT_EVENTS_QUEUE_SIZE", "100"))
+SLOT_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("SLOT_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+logger = logging.getLogger(__name__)
+
+
+def day_channel(user_id: int, day: date) -> str:
+    return f"slots:{user_id}:{day.isoformat()}"
+
+
+def user_channel(user_id: int) -> str:
+    return f"slots:{user_id}"
+
+
+def organization_channel(organization_id: int) -> str:
+    return f"slots:org:{organization_id}"
+
+
+class Subscription:
+    """Fila de eventos de uma conexão, ligada ao event loop que a criou.
+
+    `deliver` pode ser chamado de qualquer thread (o crud síncrono roda no
+    threadpool). Se o cliente não der conta e a fila encher, os eventos
+    pendentes viram um único `resync`: o cliente busca os horários de novo.
+    """
+
+    def __init__(self, broker, channels, maxsize: int):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event: dict):
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop já encerrado: a conexão caiu junto com ele.
+            self.close()
+
+    def _put(self, event: dict):
+        if self._queue.full():
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            event = {"type": "resync"}
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: float = None):
+        # None quando passa `timeout` sem eventos (hora do heartbeat).
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class SlotEventBroker:
+    """Interface do broker: publica eventos num canal e entrega aos assinantes."""
+
+    def publish(self, channel: str, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self, channels) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription):
+        raise NotImplementedError
+
+
+class InProcessBroker(SlotEventBroker):
+    """Entrega só aos assinantes deste processo (padrão e testes)."""
+
+    def __init__(self, queue_size: int = SLOT_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, channels) -> Subscription:
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(set().union(*self._subscribers.values()))
+
+
+class PostgresNotifyBroker(InProcessBroker):
+    """Espalha os eventos entre workers com LISTEN/NOTIFY do Postgres.
+
+    Cada worker publica com NOTIFY e mantém uma thread em LISTEN que repassa
+    o que chega (inclusive o que ele mesmo publicou) aos assinantes locais.
+    """
+
+    PG_CHANNEL = "slot_events"
+
+    def __init__(self, dsn: str = None, queue_size: int = SLOT_EVENTS_QUEUE_SIZE):
+        super().__init__(queue_size=queue_size)
+        # DATABASE_URL no formato do SQLAlchemy; o psycopg2 quer só o DSN.
+        url = dsn or os.environ["DATABASE_URL"]
+        self.dsn = url.replace("postgresql+psycopg2://", "postgresql://", 1)
+        self._publish_connection = None
+        self._publish_lock = threading.Lock()
+        threading.Thread(target=self._listen, name="slot-events-listener", daemon=True).start()
+
+    def _connect(self):
+        import psycopg2
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    def publish(self, channel: str, event: dict):
+        payload = json.dumps({"channel": channel, "event": event}, separators=(",", ":"))
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_connection is None or self._publish_connection.closed:
+                        self._publish_connection = self._connect()
+                    with self._publish_connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.PG_CHANNEL, payload))
+                    return
+                except Exception:
+                    self._publish_connection = None
+                    if attempt:
+                        logger.exception("slot_event_publish_failed channel=%s", channel)
+
+    def _listen(self):
+        while True:
+            try:
+                connection = self._connect()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.PG_CHANNEL}")
+                while True:
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        message = json.loads(connection.notifies.pop(0).payload)
+                        super().publish(message["channel"], message["event"])
+            except Exception:
+                logger.exception("slot_event_listener_failed")
+                clock.sleep(1)
+
+
+broker = load_backend(SLOT_EVENTS_BROKER) if SLOT_EVENTS_BROKER else InProcessBroker()
+
+
+def subscribe(user_id: int, organization_id: int, day: date) -> Subscription:
+    return broker.subscribe((day_channel(user_id, day), user_channel(user_id), organization_channel(organization_id)))
+
+
+# --- PUBLICAÇÃO (chamada pelo crud depois do commit) ---
+
+def slot_changed(user_id: int, day: date, start: time, service_id: int, taken: bool):
+    broker.publish(day_channel(user_id, day), {
+        "type": "slot_taken" if taken else "slot_freed",
+        "user_id": user_id,
+        "date": day.isoformat(),
+        "time": start.isoformat() if start is not None else None,
+        "service_id": service_id,
+    })
+
+
+def availability_changed(user_id: int):
+    broker.publish(user_channel(user_id), {"type": "availability_changed", "user_id": user_id})
+
+
+def services_changed(organization_id: int):
+    broker.publish(organization_channel(organization_id), {"type": "services_changed"})
+
+
+# --- SERVER-SENT EVENTS ---
+
+def sse_message(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def sse_stream(subscription: Subscription, first_event: dict = None,
+                     heartbeat: float = SLOT_EVENTS_HEARTBEAT_SECONDS):
+    # Um comentário a cada `heartbeat` segundos mantém proxies com a conexão aberta.
+    try:
+        if first_event is not None:
+            yield sse_message(first_event)
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            yield sse_message(event) if event is not None else ": ping\n\n"
+    finally:
+        subscription.close()
+
+
+# --- WEBSOCKET ---
+
+async def websocket_stream(websocket, subscription: Subscription, first_event: dict = None,
+                           heartbeat: float = SLOT_EVENTS_HEARTBEAT_SECONDS):
+    # O ping periódico também é o que descobre um cliente que já desconectou.
+    try:
+        if first_event is not None:
+            await websocket.send_json(first_event)
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            await websocket.send_json(event if event is not None else {"type": "ping"})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subscription.close()
@@ -0,0 +1,87 @@
+from datetime import time
+
+# Motor de horários livres: tudo em minutos desde a meia-noite (inteiros),
+# sem datetime no laço principal.
+
+DEFAULT_STEP_MINUTES = 30
+DEFAULT_DURATION_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(free, busy):
+    """Remove de `free` os trechos de `busy` (ambas listas ordenadas e mescladas)."""
+    result = []
+    i = 0
+    for start, end in free:
+        cursor = start
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                result.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+
+def busy_intervals(appointments):
+    """`appointments` é uma sequência de (minuto_inicial, duração_ou_None)."""
+    return merge_intervals(
+        (start, start + (duration or DEFAULT_DURATION_MINUTES))
+        for start, duration in appointments
+    )
+
+
+def free_slots(windows, busy, duration: int, step: int = DEFAULT_STEP_MINUTES):
+    """Inícios possíveis (em minutos) para um atendimento de `duration` minutos.
+
+    Os candidatos seguem uma grade de `step` minutos ancorada no início de
+    cada janela de disponibilidade, e só entram se o atendimento inteiro
+    couber num trecho livre.
+    """
+    starts = []
+    busy = merge_intervals(busy)
+    for window_start, window_end in merge_intervals(windows):
+        for free_start, free_end in subtract_intervals([(window_start, window_end)], busy):
+            offset = (free_start - window_start) % step
+            candidate = free_start if offset == 0 else free_start + step - offset
+            last_start = free_end - duration
+            while candidate <= last_start:
+                starts.append(candidate)
+                candidate += step
+    return starts
+
+
+def fits(windows, busy, start: int, duration: int) -> bool:
+    """Se um atendimento de `duration` minutos cabe inteiro num trecho livre a partir de `start`."""
+    free = subtract_intervals(merge_intervals(windows), merge_intervals(busy))
+    return any(free_start <= start and start + duration <= free_end for free_start, free_end in free)
+
+
+def overlaps(busy, start: int, duration: int) -> bool:
+    """Se um atendimento de `duration` minutos a partir de `start` esbarra em algum trecho de `busy`."""
+    return any(busy_start < start + duration and start < busy_end for busy_start, busy_end in busy)
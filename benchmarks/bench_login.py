@@ -0,0 +1,75 @@
+"""Vazão de POST /token com logins concorrentes (in-process, via ASGI).
+
+    python -m benchmarks.bench_login --requests 200 --concurrency 32
+    PASSWORD_HASH_WORKERS=4 BCRYPT_ROUNDS=10 python -m benchmarks.bench_login
+
+Mostra logins/s, percentis de latência e quantas respostas 503 o limite
+da fila de hashing devolveu.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time as clock
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import httpx
+
+from benchmarks.seed import seed
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def login_burst(app, emails, password, total, concurrency):
+    latencies, statuses = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(index):
+            async with semaphore:
+                started = clock.perf_counter()
+                response = await client.post(
+                    "/token", data={"username": emails[index % len(emails)], "password": password}
+                )
+                latencies.append((clock.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = clock.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        elapsed = clock.perf_counter() - started
+
+    return elapsed, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    from app import auth
+    from app.database import engine
+    from app.main import app
+
+    summary = seed(engine, orgs=2, barbers_per_org=5, months=1, appointments_per_day=1)
+    emails = [f"barber{user_id}@bench.example.com" for user_id in range(1, summary["users"] + 1)]
+
+    elapsed, latencies, statuses = asyncio.run(
+        login_burst(app, emails, summary["password"], args.requests, args.concurrency)
+    )
+    print(f"bcrypt rounds={auth.BCRYPT_ROUNDS} workers={auth.PASSWORD_HASH_WORKERS} "
+          f"fila={auth.PASSWORD_HASH_QUEUE} concorrência={args.concurrency}")
+    print(f"{args.requests} logins em {elapsed:.2f}s -> {args.requests / elapsed:.1f} logins/s")
+    print(f"latência p50={statistics.median(latencies):.1f}ms p95={percentile(latencies, 0.95):.1f}ms "
+          f"p99={percentile(latencies, 0.99):.1f}ms")
+    print(f"status: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Leituras das listagens: entidades ORM completas contra linhas projetadas
+(só as colunas do schema), em tempo e em memória alocada.
+
+    python -m benchmarks.bench_reads --months 12 --per-day 16 --repeat 20
+"""
+import argparse
+import statistics
+import time as clock
+import tracemalloc
+
+from sqlalchemy.orm import Session
+
+from benchmarks.seed import make_engine, seed
+from app import crud
+from app.database import make_read_only
+
+READS = {
+    "get_appointments_by_user": (
+        lambda db, ids, columns: crud.get_appointments_by_user(
+            db, user_id=ids["user_id"], limit=ids["limit"], columns=columns),
+        crud.APPOINTMENT_READ_COLUMNS,
+    ),
+    "get_availabilities_by_user": (
+        lambda db, ids, columns: crud.get_availabilities_by_user(
+            db, user_id=ids["user_id"], limit=ids["limit"], columns=columns),
+        crud.AVAILABILITY_READ_COLUMNS,
+    ),
+    "get_services_by_organization": (
+        lambda db, ids, columns: crud.get_services_by_organization(
+            db, organization_id=ids["organization_id"], limit=ids["limit"], columns=columns),
+        crud.SERVICE_READ_COLUMNS,
+    ),
+}
+
+
+def measure(engine, read, ids, columns, repeat):
+    samples = []
+    for _ in range(repeat):
+        with make_read_only(Session(engine, autoflush=False)) as db:
+            started = clock.perf_counter()
+            rows = read(db, ids, columns)
+            samples.append((clock.perf_counter() - started) * 1000)
+
+    with make_read_only(Session(engine, autoflush=False)) as db:
+        tracemalloc.start()
+        read(db, ids, columns)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(samples), peak, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--orgs", type=int, default=2)
+    parser.add_argument("--barbers", type=int, default=3)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--per-day", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    summary = seed(engine, orgs=args.orgs, barbers_per_org=args.barbers, services_per_org=args.services,
+                   months=args.months, appointments_per_day=args.per_day, password_hash="x")
+    ids = {"user_id": summary["barber_ids_by_org"][1][0], "organization_id": 1, "limit": args.limit}
+
+    for name, (read, columns) in READS.items():
+        orm_ms, orm_peak, count = measure(engine, read, ids, None, args.repeat)
+        row_ms, row_peak, _ = measure(engine, read, ids, columns, args.repeat)
+        print(f"{name} ({count} linhas)")
+        print(f"  ORM:        {orm_ms:8.2f} ms  pico {orm_peak / 1024:8.0f} KiB")
+        print(f"  projeção:   {row_ms:8.2f} ms  pico {row_peak / 1024:8.0f} KiB  ({orm_ms / row_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
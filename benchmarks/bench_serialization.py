@@ -0,0 +1,76 @@
+"""Serialização de uma listagem grande: caminho padrão do FastAPI (response_model
++ json.dumps) contra o caminho rápido (pydantic-core direto nas linhas).
+
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 20
+
+Os dois caminhos precisam gerar exatamente os mesmos bytes; o script confere.
+"""
+import argparse
+import json
+import statistics
+import time as clock
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.seed import make_engine, seed
+from app import crud, models, schemas, serialization
+
+
+def default_path(db: Session, user_id: int, rows: int) -> bytes:
+    # O que o FastAPI faz com response_model=List[schemas.Appointment]:
+    # valida cada linha, gera o dicionário "json" e usa json.dumps.
+    adapter = TypeAdapter(List[schemas.Appointment])
+    appointments = crud.get_appointments_by_user(
+        db, user_id=user_id, limit=rows, columns=crud.APPOINTMENT_READ_COLUMNS
+    )
+    value = adapter.validate_python(appointments, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(db: Session, user_id: int, rows: int) -> bytes:
+    appointments = crud.get_appointments_by_user(
+        db, user_id=user_id, limit=rows, columns=crud.APPOINTMENT_READ_COLUMNS
+    )
+    return serialization.json_rows(appointments).body
+
+
+def measure(engine, path, user_id, rows, repeat):
+    samples = []
+    for _ in range(repeat):
+        with Session(engine) as db:
+            started = clock.perf_counter()
+            body = path(db, user_id, rows)
+            samples.append((clock.perf_counter() - started) * 1000)
+    return statistics.median(samples), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    # Um barbeiro, 20 agendamentos por dia: ~10k linhas em 18 meses.
+    seed(engine, orgs=1, barbers_per_org=1, months=max(1, args.rows // (20 * 26) + 1),
+         appointments_per_day=20, password_hash="x")
+    with engine.connect() as connection:
+        total = connection.execute(select(func.count()).select_from(models.Appointment)).scalar_one()
+    rows = min(args.rows, total)
+
+    default_ms, default_body = measure(engine, default_path, 1, rows, args.repeat)
+    fast_ms, fast_body = measure(engine, fast_path, 1, rows, args.repeat)
+    assert default_body == fast_body, "os dois caminhos geraram JSON diferente"
+
+    print(f"{rows} linhas, {len(fast_body) / 1024:.0f} KiB de JSON")
+    print(f"padrão (response_model): {default_ms:8.1f} ms")
+    print(f"rápido (to_json):        {fast_ms:8.1f} ms  ({default_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Gera um conjunto de dados sintético (barbearias, barbeiros, serviços e
+meses de agendamentos) para os benchmarks.
+
+Usa INSERTs em lote direto nas tabelas, sem passar pela API.
+"""
+import os
+import random
+from datetime import date, time, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+from sqlalchemy import create_engine, insert
+
+from app import models
+from app.database import Base
+
+BENCH_PASSWORD = "benchmark123"
+BATCH_SIZE = 5000
+
+
+def make_engine(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args)
+
+
+def _insert_batches(connection, table, rows):
+    for offset in range(0, len(rows), BATCH_SIZE):
+        connection.execute(insert(table), rows[offset:offset + BATCH_SIZE])
+
+
+def seed(engine, orgs: int = 5, barbers_per_org: int = 5, services_per_org: int = 6,
+         months: int = 6, appointments_per_day: int = 12, random_seed: int = 42,
+         password_hash: str = None):
+    """Recria as tabelas e popula o banco. Devolve um resumo com ids úteis."""
+    rng = random.Random(random_seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    if password_hash is None:
+        from app import auth
+        password_hash = auth.pwd_context.hash(BENCH_PASSWORD)
+
+    today = date.today()
+    start_day = today - timedelta(days=30 * months // 2)
+    days = [start_day + timedelta(days=offset) for offset in range(30 * months)]
+
+    organizations, users, services, availabilities, appointments = [], [], [], [], []
+    barber_ids_by_org, service_ids_by_org = {}, {}
+    user_id = service_id = 0
+
+    for org_id in range(1, orgs + 1):
+        organizations.append({
+            "id": org_id, "name": f"Barbearia {org_id}", "slug": f"barbearia-{org_id}",
+            "plan_type": "free", "is_active": True,
+        })
+        barber_ids_by_org[org_id] = []
+        for index in range(barbers_per_org):
+            user_id += 1
+            users.append({
+                "id": user_id, "name": f"Barbeiro {user_id}", "email": f"barber{user_id}@bench.example.com",
+                "hashed_password": password_hash, "organization_id": org_id, "is_active": True,
+                "role": models.UserRole.OWNER if index == 0 else models.UserRole.BARBER,
+            })
+            barber_ids_by_org[org_id].append(user_id)
+            for day_of_week in range(6):
+                availabilities.append({
+                    "user_id": user_id, "day_of_week": day_of_week,
+                    "start_time": time(9, 0), "end_time": time(19, 0),
+                })
+
+        service_ids_by_org[org_id] = []
+        for index in range(services_per_org):
+            service_id += 1
+            services.append({
+                "id": service_id, "name": f"Serviço {service_id}", "organization_id": org_id,
+                "duration_minutes": rng.choice((30, 30, 45, 60)), "price": float(rng.choice((35, 50, 80, 120))),
+            })
+            service_ids_by_org[org_id].append(service_id)
+
+    slot_times = [time(9 + minutes // 60, minutes % 60) for minutes in range(0, 600, 30)]
+    for org_id, barber_ids in barber_ids_by_org.items():
+        for barber_id in barber_ids:
+            for day in days:
+                if day.weekday() == 6:
+                    continue
+                for slot in rng.sample(slot_times, min(appointments_per_day, len(slot_times))):
+                    appointments.append({
+                        "client_name": "Cliente", "client_email": "cliente@bench.example.com",
+                        "appointment_date": day, "appointment_time": slot,
+                        "service_id": rng.choice(service_ids_by_org[org_id]), "user_id": barber_id,
+                        "status": "cancelled" if rng.random() < 0.1 else "pending",
+                    })
+
+    with engine.begin() as connection:
+        _insert_batches(connection, models.Organization.__table__, organizations)
+        _insert_batches(connection, models.User.__table__, users)
+        _insert_batches(connection, models.Service.__table__, services)
+        _insert_batches(connection, models.Availability.__table__, availabilities)
+        _insert_batches(connection, models.Appointment.__table__, appointments)
+
+    return {
+        "organizations": len(organizations),
+        "users": len(users),
+        "services": len(services),
+        "availabilities": len(availabilities),
+        "appointments": len(appointments),
+        "barber_ids_by_org": barber_ids_by_org,
+        "service_ids_by_org": service_ids_by_org,
+        "today": today,
+        "password": BENCH_PASSWORD,
+    }
@@ -1,10 +1,32 @@
 import multiprocessing
 import os
+import shutil
+import tempfile
 
 bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
 
 workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1 ))
 
+# Os workers herdam o ambiente do master: app/database.py divide o
+# orçamento de conexões (DB_MAX_CONNECTIONS) por este número.
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+
+# Métricas do Prometheus somadas entre os workers: cada processo grava num
+# diretório compartilhado, limpo a cada start do master (ver app/metrics.py).
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'barberapi-metrics'))
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
 worker_class = "uvicorn.workers.UvicornWorker"
 
 loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1 +1 @@
-gunicorn -w 2 -k uvicorn.workers.UvicornWorker app.main:app --bind=0.0.0.0:8000
\ No newline at end of file
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-2} gunicorn -c gunicorn_conf.py app.main:app --bind=0.0.0.0:8000 --timeout=30
\ No newline at end of file
@@ -1,16 +1,17 @@
 
 import pytest
+from contextlib import contextmanager
 from typing import Generator
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base, get_db 
+from app.database import Base, get_db, get_primary_read_db, get_read_db, make_read_only
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db" 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # --- Criação/Destruição das Tabelas de Teste ---
 @pytest.fixture(scope="session", autouse=True)
@@ -24,9 +25,36 @@ def override_get_db():
     finally:
         db.close()
 
+def override_get_read_db():
+    try:
+        db = make_read_only(TestingSessionLocal())
+        yield db
+    finally:
+        db.close()
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_read_db
+app.dependency_overrides[get_primary_read_db] = override_get_read_db
 
 @pytest.fixture(scope="module")
 def client() -> Generator:
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+# --- Contagem de comandos SQL ---
+@pytest.fixture
+def count_queries():
+    """Uso: `with count_queries() as statements:`; cada SQL enviado ao banco entra na lista."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return counter
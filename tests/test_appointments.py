@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app 
 from datetime import date, time
+from prometheus_client import REGISTRY
 
 # --- Dados de Teste ---
 test_appt_user_email = "appt_test@example.com"
@@ -139,4 +140,158 @@ def test_delete_appointment_not_found(client: TestClient):
     """Testa a remoção de um agendamento que não existe."""
     headers = get_auth_headers(client)
     response = client.delete("/appointments/99999", headers=headers)
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+# --- Testes de conflito de horário ---
+
+booking_user_email = "booking_test@example.com"
+
+def get_booking_headers(client: TestClient) -> dict:
+    client.post(
+        "/users/",
+        json={"email": booking_user_email, "password": test_appt_user_password,
+              "name": "Booking", "organization_name": "Barbearia Booking"}
+    )
+    login_response = client.post(
+        "/token",
+        data={"username": booking_user_email, "password": test_appt_user_password}
+    )
+    assert login_response.status_code == 200
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+def test_create_appointment_slot_conflict(client: TestClient):
+    """O segundo agendamento no mesmo horário é recusado pelo índice único."""
+    headers = get_booking_headers(client)
+    service = client.post(
+        "/services/", headers=headers,
+        json={"name": "Barba", "duration_minutes": 30, "price": 40.0},
+    ).json()
+    payload = {
+        "client_name": "Cliente Conflito",
+        "client_email": "conflito@appt.com",
+        "appointment_date": date.today().isoformat(),
+        "appointment_time": "09:00:00",
+        "service_id": service["id"],
+    }
+
+    conflicts_before = REGISTRY.get_sample_value("appointment_bookings_total", {"outcome": "conflict"}) or 0
+
+    first = client.post("/appointments/", headers=headers, json=payload)
+    assert first.status_code == 201
+    assert first.json()["status"] == "pending"
+
+    second = client.post("/appointments/", headers=headers, json=payload)
+    assert second.status_code == 409
+    assert REGISTRY.get_sample_value("appointment_bookings_total", {"outcome": "conflict"}) == conflicts_before + 1
+
+    cancel = client.patch(f"/appointments/{first.json()['id']}/status", headers=headers, json={"status": "cancelled"})
+    assert cancel.status_code == 200
+
+    rebooked = client.post("/appointments/", headers=headers, json=payload)
+    assert rebooked.status_code == 201
+
+    # Reativar o cancelado com o horário já ocupado também é conflito, não erro 500.
+    reactivate = client.patch(f"/appointments/{first.json()['id']}/status", headers=headers,
+                              json={"status": "pending"})
+    assert reactivate.status_code == 409
+    appointments = client.get("/appointments/me/", headers=headers).json()
+    assert {item["id"]: item["status"] for item in appointments}[first.json()["id"]] == "cancelled"
+
+def test_integrity_error_conflict_is_logged(client: TestClient, monkeypatch, caplog):
+    """Sem ON CONFLICT (outros bancos), o conflito vem do IntegrityError e também é registrado."""
+    from sqlalchemy import insert
+    from app import crud
+    headers = get_booking_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    payload = {
+        "client_name": "Cliente Integridade", "client_email": "integridade@appt.com",
+        "appointment_date": "2031-03-18", "appointment_time": "09:00:00", "service_id": service_id,
+    }
+    assert client.post("/appointments/", headers=headers, json=payload).status_code == 201
+
+    monkeypatch.setattr(crud, "_insert_ignoring_conflicts", lambda db, model: insert(model))
+    with caplog.at_level("INFO", logger="app"):
+        assert client.post("/appointments/", headers=headers, json=payload).status_code == 409
+    conflicts = [record for record in caplog.records if record.getMessage().startswith("booking_conflict")]
+    assert conflicts and conflicts[-1].appointment_date == date(2031, 3, 18)
+
+def test_cancelled_status_is_case_insensitive(client: TestClient):
+    """"CANCELLED" libera o horário nos horários livres, como no índice único."""
+    headers = get_booking_headers(client)
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Pezinho", "duration_minutes": 30, "price": 20.0}).json()["id"]
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 2, "start_time": "09:00:00", "end_time": "09:30:00"})
+    payload = {
+        "client_name": "Cliente Maiúsculo", "client_email": "maiusculo@appt.com",
+        "appointment_date": "2031-03-11", "appointment_time": "09:00:00", "service_id": service_id,
+    }
+    appointment_id = client.post("/appointments/", headers=headers, json=payload).json()["id"]
+    client.patch(f"/appointments/{appointment_id}/status", headers=headers, json={"status": "CANCELLED"})
+
+    available = client.get("/appointments/available/", headers=headers,
+                           params={"date": "2031-03-11", "service_id": service_id})
+    assert available.json() == ["09:00:00"]
+
+def test_create_appointment_service_from_other_organization(client: TestClient):
+    """Serviços de outra barbearia não podem ser agendados."""
+    headers = get_booking_headers(client)
+
+    client.post(
+        "/users/",
+        json={"email": "other_org@example.com", "password": test_appt_user_password,
+              "name": "Outra", "organization_name": "Outra Barbearia"}
+    )
+    other_token = client.post(
+        "/token", data={"username": "other_org@example.com", "password": test_appt_user_password}
+    ).json()["access_token"]
+    other_service = client.post(
+        "/services/", headers={"Authorization": f"Bearer {other_token}"},
+        json={"name": "Corte Alheio", "duration_minutes": 30, "price": 40.0},
+    ).json()
+
+    response = client.post(
+        "/appointments/",
+        headers=headers,
+        json={
+            "client_name": "Cliente Intruso",
+            "client_email": "intruso@appt.com",
+            "appointment_date": date.today().isoformat(),
+            "appointment_time": "10:00:00",
+            "service_id": other_service["id"],
+        },
+    )
+    assert response.status_code == 404
+
+def test_read_my_appointments_cursor_pagination(client: TestClient):
+    """A listagem pagina por cursor na ordem (data, hora, id)."""
+    headers = get_booking_headers(client)
+    service = client.post(
+        "/services/", headers=headers,
+        json={"name": "Pezinho", "duration_minutes": 15, "price": 15.0},
+    ).json()
+    page_date = date(2031, 3, 4)
+    for appointment_time in ("11:00:00", "09:00:00", "10:00:00"):
+        response = client.post(
+            "/appointments/",
+            headers=headers,
+            json={"client_name": "Cliente Página", "client_email": "pagina@appt.com",
+                  "appointment_date": page_date.isoformat(), "appointment_time": appointment_time,
+                  "service_id": service["id"]},
+        )
+        assert response.status_code == 201
+
+    params = {"limit": 2, "date_from": page_date.isoformat(), "date_to": page_date.isoformat()}
+    first_page = client.get("/appointments/me/", headers=headers, params=params)
+    assert first_page.status_code == 200
+    assert [appt["appointment_time"] for appt in first_page.json()] == ["09:00:00", "10:00:00"]
+    next_cursor = first_page.headers["x-next-cursor"]
+
+    second_page = client.get("/appointments/me/", headers=headers, params={**params, "cursor": next_cursor})
+    assert second_page.status_code == 200
+    assert [appt["appointment_time"] for appt in second_page.json()] == ["11:00:00"]
+    assert "x-next-cursor" not in second_page.headers
+
+def test_read_my_appointments_invalid_cursor(client: TestClient):
+    headers = get_booking_headers(client)
+    response = client.get("/appointments/me/", headers=headers, params={"cursor": "nao-e-um-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import date, time, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud, crud_async, models, schemas
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal
+from app.database import async_database_url
+
+test_async_user_email = "async_test@example.com"
+test_async_user_password = "password123"
+
+
+def setup_barber(client: TestClient):
+    client.post(
+        "/users/",
+        json={"email": test_async_user_email, "password": test_async_user_password,
+              "name": "Async", "organization_name": "Barbearia Async"}
+    )
+    token = client.post(
+        "/token", data={"username": test_async_user_email, "password": test_async_user_password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    me = client.get("/users/me/", headers=headers).json()
+    service = client.post(
+        "/services/", headers=headers, json={"name": "Corte Async", "duration_minutes": 45, "price": 60.0}
+    ).json()
+    return me["id"], service["id"], headers
+
+
+def run_async(coroutine_factory):
+    async def runner():
+        engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL))
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                return await coroutine_factory(db)
+        finally:
+            await engine.dispose()
+    return asyncio.run(runner())
+
+
+def test_async_booking_and_slots_match_sync_crud(client: TestClient):
+    """O caminho assíncrono reserva e calcula horários como o síncrono."""
+    user_id, service_id, headers = setup_barber(client)
+    query_date = date.today() + timedelta(days=60)
+    client.post(
+        "/availability/", headers=headers,
+        json={"day_of_week": (query_date.weekday() + 1) % 7, "start_time": "08:00:00", "end_time": "12:00:00"},
+    )
+    db = TestingSessionLocal()
+    try:
+        organization_id = db.get(models.User, user_id).organization_id
+    finally:
+        db.close()
+
+    appointment = schemas.AppointmentCreate(
+        client_name="Cliente Async", client_email="async@cliente.com",
+        appointment_date=query_date, appointment_time=time(9, 0), service_id=service_id,
+    )
+    created = run_async(lambda db: crud_async.create_appointment(db, appointment, user_id))
+    assert created.id is not None and created.status == "pending"
+
+    with pytest.raises(crud.SlotUnavailableError):
+        run_async(lambda db: crud_async.create_appointment(db, appointment, user_id))
+
+    async_slots = run_async(lambda db: crud_async.get_available_times(
+        db, user_id, query_date, service_id=service_id, organization_id=organization_id
+    ))
+    db = TestingSessionLocal()
+    try:
+        sync_slots = crud.get_available_times(
+            db, user_id, query_date, service_id=service_id, organization_id=organization_id
+        )
+    finally:
+        db.close()
+    assert async_slots == sync_slots
+    assert time(9, 0) not in async_slots
+
+
+def test_async_booking_keeps_blocking_calls_off_the_event_loop(client: TestClient, monkeypatch):
+    """Reservas e eventos podem ir ao banco: o caminho assíncrono os chama pelo threadpool."""
+    import threading
+    from app import holds, slot_events
+
+    user_id, service_id, _ = setup_barber(client)
+    calls = []
+
+    class RecordingStore(holds.InMemoryHoldStore):
+        def busy(self, *args, **kwargs):
+            calls.append(("busy", threading.current_thread()))
+            return super().busy(*args, **kwargs)
+
+    monkeypatch.setattr(holds, "store", RecordingStore())
+    monkeypatch.setattr(slot_events, "slot_changed",
+                        lambda *args, **kwargs: calls.append(("slot_changed", threading.current_thread())))
+
+    appointment = schemas.AppointmentCreate(
+        client_name="Cliente Async", client_email="async@cliente.com",
+        appointment_date=date.today() + timedelta(days=61), appointment_time=time(9, 0), service_id=service_id,
+    )
+
+    async def book(db):
+        loop_thread = threading.current_thread()
+        await crud_async.create_appointment(db, appointment, user_id)
+        return loop_thread
+
+    loop_thread = run_async(book)
+    assert [name for name, _ in calls] == ["busy", "slot_changed"]
+    assert all(thread is not loop_thread for _, thread in calls)
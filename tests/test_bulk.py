@@ -0,0 +1,129 @@
+import json
+
+from fastapi.testclient import TestClient
+
+test_bulk_user_email = "bulk_test@example.com"
+test_bulk_user_password = "password123"
+
+# --- Função Auxiliar para Autenticação ---
+
+def get_auth_headers(client: TestClient) -> dict:
+    client.post(
+        "/users/",
+        json={"email": test_bulk_user_email, "password": test_bulk_user_password,
+              "name": "Bulk", "organization_name": "Barbearia Bulk"}
+    )
+    response = client.post("/token", data={"username": test_bulk_user_email, "password": test_bulk_user_password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def get_service_id(client: TestClient, headers: dict) -> int:
+    services = client.get("/services/", headers=headers).json()
+    if services:
+        return services[0]["id"]
+    return client.post(
+        "/services/", headers=headers, json={"name": "Corte Bulk", "duration_minutes": 30, "price": 45.0}
+    ).json()["id"]
+
+# --- Testes de importação/exportação ---
+
+def test_import_appointments_csv_with_error_report(client: TestClient):
+    """Importa um CSV e relata por linha os registros inválidos ou em conflito."""
+    headers = get_auth_headers(client)
+    service_id = get_service_id(client, headers)
+    csv_body = "\n".join([
+        "client_name,client_email,appointment_date,appointment_time,service_id",
+        f"Ana,ana@bulk.com,2032-05-03,09:00:00,{service_id}",
+        f"Bia,bia@bulk.com,2032-05-03,09:30:00,{service_id}",
+        f"Caio,caio@bulk.com,2032-05-03,09:00:00,{service_id}",
+        f"Duda,email-invalido,2032-05-03,10:00:00,{service_id}",
+        "Edu,edu@bulk.com,2032-05-03,10:30:00,99999",
+    ])
+
+    response = client.post(
+        "/appointments/import", headers={**headers, "Content-Type": "text/csv"}, content=csv_body
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert [error["line"] for error in data["errors"]] == [4, 5, 6]
+
+def test_import_appointments_ndjson_detects_existing_conflicts(client: TestClient):
+    headers = get_auth_headers(client)
+    service_id = get_service_id(client, headers)
+    rows = [
+        {"client_name": "Fábio", "client_email": "fabio@bulk.com", "appointment_date": "2032-05-03",
+         "appointment_time": "09:30:00", "service_id": service_id},
+        {"client_name": "Gil", "client_email": "gil@bulk.com", "appointment_date": "2032-05-04",
+         "appointment_time": "09:30:00", "service_id": service_id, "status": "cancelled"},
+    ]
+    response = client.post(
+        "/appointments/import",
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+        content="\n".join(json.dumps(row) for row in rows),
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert response.json()["errors"][0]["line"] == 1
+
+def test_export_appointments_streams_csv_and_ndjson(client: TestClient):
+    headers = get_auth_headers(client)
+    params = {"date_from": "2032-05-01", "date_to": "2032-05-31"}
+
+    csv_response = client.get("/appointments/export", headers=headers, params=params)
+    assert csv_response.status_code == 200
+    lines = csv_response.text.strip().splitlines()
+    assert lines[0].startswith("id,user_id,client_name")
+    assert len(lines) == 4
+
+    ndjson_response = client.get("/appointments/export", headers=headers, params={**params, "format": "ndjson"})
+    assert ndjson_response.status_code == 200
+    records = [json.loads(line) for line in ndjson_response.text.splitlines()]
+    assert [record["client_name"] for record in records] == ["Ana", "Bia", "Gil"]
+
+def test_import_reports_lines_that_are_not_utf8(client: TestClient):
+    """Um BOM no início é ignorado; uma linha fora de UTF-8 vira erro daquela linha, não um 500."""
+    headers = get_auth_headers(client)
+    service_id = get_service_id(client, headers)
+    body = b"\n".join([
+        b"\xef\xbb\xbfclient_name,client_email,appointment_date,appointment_time,service_id",
+        f"Ivo,ivo@bulk.com,2032-06-07,09:00:00,{service_id}".encode(),
+        f"J\xe3o,jao@bulk.com,2032-06-07,10:00:00,{service_id}".encode("latin-1"),
+    ])
+    response = client.post(
+        "/appointments/import", headers={**headers, "Content-Type": "text/csv"}, content=body
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert [error["line"] for error in response.json()["errors"]] == [3]
+
+def test_import_rejects_overlaps_with_bookings_and_holds(client: TestClient):
+    """Como no agendamento avulso, vale a sobreposição com agendamentos, reservas e o próprio lote."""
+    headers = get_auth_headers(client)
+    service_id = get_service_id(client, headers)
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 1, "start_time": "08:00:00", "end_time": "18:00:00"})
+    day = "2032-06-14"  # segunda-feira
+    client.post("/appointments/", headers=headers, json={
+        "client_name": "Lia", "client_email": "lia@bulk.com", "appointment_date": day,
+        "appointment_time": "09:00:00", "service_id": service_id,
+    })
+    hold = client.post("/appointments/holds/", headers=headers, json={
+        "appointment_date": day, "appointment_time": "11:00:00", "service_id": service_id,
+    })
+    assert hold.status_code == 201
+
+    rows = [
+        {"client_name": "Mel", "client_email": "mel@bulk.com", "appointment_date": day,
+         "appointment_time": time, "service_id": service_id}
+        for time in ("09:15:00", "10:00:00", "10:15:00", "11:10:00")
+    ]
+    response = client.post(
+        "/appointments/import",
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+        content="\n".join(json.dumps(row) for row in rows),
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert [error["line"] for error in response.json()["errors"]] == [1, 3, 4]
+    client.delete(f"/appointments/holds/{hold.json()['token']}", headers=headers)
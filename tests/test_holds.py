@@ -0,0 +1,201 @@
+from datetime import date, time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, database, holds
+from tests.conftest import TestingSessionLocal
+
+# --- Dados de Teste ---
+owner_email = "holds_owner@example.com"
+password = "password123"
+hold_day = "2031-01-14"  # terça-feira
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(holds, "store", holds.InMemoryHoldStore(clock_fn=clock))
+    return clock
+
+# --- Função Auxiliar para Autenticação ---
+
+def get_auth_headers(client: TestClient) -> dict:
+    client.post("/users/", json={"email": owner_email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Reservas"})
+    token = client.post("/token", data={"username": owner_email, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def setup_day(client: TestClient, headers: dict) -> int:
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 2, "start_time": "09:00:00", "end_time": "10:00:00"})
+    return service_id
+
+def available(client: TestClient, headers: dict, service_id: int) -> list:
+    return client.get("/appointments/available/", headers=headers,
+                      params={"date": hold_day, "service_id": service_id}).json()
+
+# --- Testes do Store ---
+
+def test_store_rejects_overlaps_and_expires_through_heap():
+    """Reservas sobrepostas são recusadas e as vencidas saem pelo heap, na ordem de vencimento."""
+    clock = FakeClock()
+    store = holds.InMemoryHoldStore(clock_fn=clock)
+    day = date(2031, 1, 14)
+
+    first = store.acquire(1, 1, day, time(9, 0), 30, 1, ttl=60)
+    assert store.acquire(1, 1, day, time(9, 15), 30, 1, ttl=60) is None
+    second = store.acquire(1, 1, day, time(9, 30), 30, 1, ttl=120)
+    assert store.acquire(2, 1, day, time(9, 0), 30, 1, ttl=60) is not None
+    assert store.busy(1, day) == [(time(9, 0), 30), (time(9, 30), 30)]
+    assert store.busy(1, day, exclude_token=first.token) == [(time(9, 30), 30)]
+
+    clock.now += 61
+    assert store.get(first.token) is None
+    assert [hold.token for hold in store.expire_due() if hold.user_id == 1] == [first.token]
+    assert store.release(second.token) == second
+    assert store.busy(1, day) == []
+    clock.now += 60
+    assert len(store.expire_due()) == 0
+    assert len(store) == 0
+
+def test_store_limits_open_holds():
+    """Acima do limite de reservas abertas o store recusa novas."""
+    store = holds.InMemoryHoldStore(maxsize=1)
+    store.acquire(1, 1, date(2031, 1, 14), time(9, 0), 30, 1, ttl=60)
+    with pytest.raises(holds.HoldLimitError):
+        store.acquire(1, 1, date(2031, 1, 14), time(10, 0), 30, 1, ttl=60)
+
+def test_database_store_is_shared_between_workers():
+    """Dois stores sobre a mesma tabela (dois workers) veem, recusam e expiram as mesmas reservas."""
+    clock = FakeClock()
+    first_worker = holds.DatabaseHoldStore(clock_fn=clock, session_factory=TestingSessionLocal)
+    second_worker = holds.DatabaseHoldStore(clock_fn=clock, session_factory=TestingSessionLocal)
+    day = date(2031, 6, 3)
+
+    hold = first_worker.acquire(1, 1, day, time(9, 0), 30, 1, ttl=60)
+    assert second_worker.acquire(1, 1, day, time(9, 15), 30, 1, ttl=60) is None
+    assert second_worker.get(hold.token) == hold
+    assert second_worker.busy(1, day) == [(time(9, 0), 30)]
+    assert second_worker.busy(1, day, exclude_token=hold.token) == []
+    other = second_worker.acquire(1, 1, day, time(9, 30), 30, 1, ttl=120)
+
+    clock.now += 61
+    assert first_worker.get(hold.token) is None
+    assert [expired.token for expired in second_worker.expire_due()] == [hold.token]
+    assert first_worker.expire_due() == []
+    assert first_worker.release(other.token) == other
+    assert second_worker.busy(1, day) == []
+
+def test_expiry_sweep_does_not_pin_the_reader_to_the_primary(monkeypatch):
+    """A limpeza das reservas vencidas grava dentro de um GET sem contar como escrita do cliente."""
+    from app import read_routing
+    from app.cache import TTLCache
+    from tests.conftest import engine
+
+    backend = TTLCache()
+    monkeypatch.setattr(database, "read_router",
+                        read_routing.ReadRouter(engine, [engine], sticky_seconds=60, backend=backend))
+    token = read_routing._sticky_key.set("read:sticky:leitor")
+    try:
+        clock = FakeClock()
+        store = holds.DatabaseHoldStore(clock_fn=clock, session_factory=TestingSessionLocal)
+        store.acquire(1, 1, date(2031, 6, 10), time(9, 0), 30, 1, ttl=60)
+        backend.delete("read:sticky:leitor")
+        clock.now += 61
+        assert len(store.expire_due()) == 1
+        assert backend.get("read:sticky:leitor") is None
+    finally:
+        read_routing._sticky_key.reset(token)
+
+def test_default_store_is_shared_with_several_workers(monkeypatch):
+    """Com WEB_CONCURRENCY > 1 e sem SLOT_HOLDS_BACKEND, as reservas vão para o banco."""
+    monkeypatch.setattr(holds, "SLOT_HOLDS_BACKEND", None)
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 3)
+    assert isinstance(holds._default_store(), holds.DatabaseHoldStore)
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 1)
+    assert isinstance(holds._default_store(), holds.InMemoryHoldStore)
+
+# --- Testes da API ---
+
+def test_hold_blocks_slot_until_confirmed(client: TestClient, fake_clock):
+    """O horário reservado some dos horários livres, recusa outros agendamentos e é confirmado com o token."""
+    headers = get_auth_headers(client)
+    service_id = setup_day(client, headers)
+    slot = {"appointment_date": hold_day, "appointment_time": "09:00:00", "service_id": service_id}
+
+    response = client.post("/appointments/holds/", headers=headers, json=slot)
+    assert response.status_code == 201
+    hold = response.json()
+    assert hold["duration_minutes"] == 30
+
+    assert available(client, headers, service_id) == ["09:30:00"]
+    assert client.post("/appointments/holds/", headers=headers, json=slot).status_code == 409
+    direct = client.post("/appointments/", headers=headers, json={
+        **slot, "client_name": "Outro", "client_email": "outro@example.com",
+    })
+    assert direct.status_code == 409
+
+    confirm = client.post(f"/appointments/holds/{hold['token']}/confirm", headers=headers,
+                          json={"client_name": "Cliente", "client_email": "cliente@example.com"})
+    assert confirm.status_code == 201
+    assert (confirm.json()["appointment_date"], confirm.json()["appointment_time"]) == (hold_day, "09:00:00")
+    assert available(client, headers, service_id) == ["09:30:00"]
+    assert client.post(f"/appointments/holds/{hold['token']}/confirm", headers=headers,
+                       json={"client_name": "Cliente", "client_email": "cliente@example.com"}).status_code == 404
+
+def test_expired_or_released_hold_frees_slot(client: TestClient, fake_clock):
+    """Ao vencer ou ser liberada, a reserva devolve o horário (inclusive no cache)."""
+    headers = get_auth_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    slot = {"appointment_date": hold_day, "appointment_time": "09:30:00", "service_id": service_id}
+
+    token = client.post("/appointments/holds/", headers=headers, json=slot).json()["token"]
+    assert available(client, headers, service_id) == []
+    fake_clock.now += holds.SLOT_HOLD_TTL_SECONDS + 1
+    assert available(client, headers, service_id) == ["09:30:00"]
+    assert client.post(f"/appointments/holds/{token}/confirm", headers=headers,
+                       json={"client_name": "Cliente", "client_email": "cliente@example.com"}).status_code == 404
+
+    token = client.post("/appointments/holds/", headers=headers, json=slot).json()["token"]
+    assert client.delete(f"/appointments/holds/{token}", headers=headers).status_code == 204
+    assert available(client, headers, service_id) == ["09:30:00"]
+
+def test_failed_confirmation_frees_the_slot(client: TestClient, fake_clock, monkeypatch):
+    """Se a confirmação falhar, a reserva sai e o horário volta aos horários livres (e ao cache)."""
+    headers = get_auth_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    slot = {"appointment_date": hold_day, "appointment_time": "09:30:00", "service_id": service_id}
+
+    token = client.post("/appointments/holds/", headers=headers, json=slot).json()["token"]
+    assert available(client, headers, service_id) == []
+
+    def refuse(*args, **kwargs):
+        raise crud.SlotUnavailableError()
+
+    monkeypatch.setattr(crud, "create_appointment", refuse)
+    confirm = client.post(f"/appointments/holds/{token}/confirm", headers=headers,
+                          json={"client_name": "Cliente", "client_email": "cliente@example.com"})
+    assert confirm.status_code == 409
+    assert available(client, headers, service_id) == ["09:30:00"]
+
+def test_recurring_rule_cannot_take_held_slot(client: TestClient, fake_clock):
+    """Uma regra recorrente que cairia sobre uma reserva ativa é recusada."""
+    headers = get_auth_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    slot = {"appointment_date": "2031-02-11", "appointment_time": "09:00:00", "service_id": service_id}
+    assert client.post("/appointments/holds/", headers=headers, json=slot).status_code == 201
+
+    rule = {"client_name": "Fixo", "client_email": "fixo@example.com", "service_id": service_id,
+            "appointment_time": "09:15:00", "start_date": "2031-02-04"}
+    assert client.post("/appointments/recurring/", headers=headers, json=rule).status_code == 409
+    assert client.post("/appointments/recurring/", headers=headers,
+                       json={**rule, "interval_weeks": 2}).status_code == 201
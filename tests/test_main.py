@@ -1,6 +1,348 @@
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
 
 def test_read_root(client: TestClient):
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok", "message": "Boas vindas ao BarberAPI!"}
\ No newline at end of file
+    assert response.json() == {"status": "ok", "message": "Boas vindas ao BarberAPI!"}
+
+def test_read_pool_status(client: TestClient):
+    response = client.get("/health/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["workers"] >= 1
+    assert data["stats"]["checkouts"] >= 0
+
+def test_pool_options_split_connection_budget_between_workers(monkeypatch):
+    from app import database
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 9)
+    monkeypatch.setattr(database, "DB_MAX_CONNECTIONS", 90)
+    options = database.pool_options("postgresql://barber@localhost/barberapi")
+    assert options["pool_size"] + options["max_overflow"] == 10
+    assert database.pool_options("sqlite:///./test.db") == {}
+
+def test_pool_options_split_worker_budget_with_async_engine(monkeypatch):
+    """Com DB_ASYNC, os engines síncrono e assíncrono somados não passam da fatia do worker."""
+    from app import database
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(database, "DB_MAX_CONNECTIONS", 80)
+    monkeypatch.setattr(database, "ENGINES_PER_WORKER", 2)
+    options = database.pool_options("postgresql://barber@localhost/barberapi")
+    assert 2 * (options["pool_size"] + options["max_overflow"]) == 20
+    replica = database.pool_options("postgresql://barber@replica/barberapi", engines=1)
+    assert replica["pool_size"] + replica["max_overflow"] == 20
+
+def test_instrumented_pool_counts_only_real_waits(tmp_path):
+    """Checkouts com conexão livre não contam como espera; o pool esgotado conta, inclusive no timeout."""
+    from app import database
+    pool_engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=database.InstrumentedQueuePool,
+                                pool_size=1, max_overflow=0, pool_timeout=0.05)
+    before = database.pool_stats.snapshot()
+
+    for _ in range(3):
+        with pool_engine.connect():
+            pass
+    assert database.pool_stats.snapshot()["waits"] == before["waits"]
+
+    with pool_engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            pool_engine.connect()
+    after = database.pool_stats.snapshot()
+    assert (after["waits"], after["timeouts"]) == (before["waits"] + 1, before["timeouts"] + 1)
+    pool_engine.dispose()
+
+# --- Orçamento de comandos SQL por endpoint ---
+# Cada valor é o máximo de comandos SQL que o endpoint pode emitir; se uma
+# mudança fizer o número subir (N+1, refresh depois do commit...), o teste falha.
+QUERY_BUDGETS = {
+    "POST /token": 1,
+    "GET /users/me/": 1,
+    "POST /services/": 2,
+    "GET /services/": 2,
+    "PUT /services/{id}": 3,
+    "POST /team/": 3,
+    "POST /availability/": 2,
+    "POST /appointments/": 4,
+    "PATCH /appointments/{id}/status": 6,
+    "GET /appointments/me/": 1,
+}
+
+def test_endpoints_stay_within_query_budget(client: TestClient, count_queries):
+    """Falha se algum endpoint passar a emitir mais SQL do que o orçamento."""
+    email = "budget_owner@example.com"
+    password = "password123"
+    client.post("/users/", json={"email": email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Orçamento"})
+    used = {}
+
+    def measure(name, method, url, **kwargs):
+        with count_queries() as statements:
+            response = getattr(client, method)(url, **kwargs)
+        assert response.status_code < 300, (name, response.text)
+        used[name] = len(statements)
+        return response
+
+    token = measure("POST /token", "post", "/token",
+                    data={"username": email, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    measure("GET /users/me/", "get", "/users/me/", headers=headers)
+    service_id = measure("POST /services/", "post", "/services/", headers=headers,
+                         json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    measure("GET /services/", "get", "/services/", headers=headers)
+    measure("PUT /services/{id}", "put", f"/services/{service_id}", headers=headers, json={"price": 45.0})
+    measure("POST /team/", "post", "/team/", headers=headers,
+            json={"email": "budget_barber@example.com", "password": password, "name": "Barbeiro"})
+    measure("POST /availability/", "post", "/availability/", headers=headers,
+            json={"day_of_week": 1, "start_time": "09:00:00", "end_time": "18:00:00"})
+    appointment_id = measure("POST /appointments/", "post", "/appointments/", headers=headers, json={
+        "client_name": "Cliente", "client_email": "cliente@example.com",
+        "appointment_date": "2031-01-06", "appointment_time": "10:00:00", "service_id": service_id,
+    }).json()["id"]
+    measure("PATCH /appointments/{id}/status", "patch", f"/appointments/{appointment_id}/status",
+            headers=headers, json={"status": "confirmed"})
+    measure("GET /appointments/me/", "get", "/appointments/me/", headers=headers)
+
+    over_budget = {name: count for name, count in used.items() if count > QUERY_BUDGETS[name]}
+    assert not over_budget, f"orçamento de SQL excedido: {over_budget} (usado: {used})"
+
+def test_server_timing_reports_database_time(client: TestClient):
+    """Toda resposta traz o tempo de banco e o número de consultas no Server-Timing."""
+    client.post("/users/", json={"email": "timing@example.com", "password": "password123",
+                                 "name": "Dono", "organization_name": "Barbearia Timing"})
+    response = client.post("/token", data={"username": "timing@example.com", "password": "password123"})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert 'db;dur=' in timing
+    assert 'desc="1 queries"' in timing
+    assert "app;dur=" in timing
+
+def test_slow_queries_are_logged_without_parameter_values(client: TestClient, monkeypatch, caplog):
+    """Acima do limite configurado, a consulta é registrada com o SQL e só a quantidade de parâmetros."""
+    from app import instrumentation
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level("INFO", logger="app"):
+        client.post("/token", data={"username": "ninguem@example.com", "password": "x"})
+    slow = [record for record in caplog.records if record.name == "app.sql"]
+    assert slow and slow[0].params.endswith(" redacted>")
+    assert not any("ninguem@example.com" in record.getMessage() for record in slow)
+    request_line = [record for record in caplog.records if record.name == "app.requests"][-1]
+    assert request_line.path == "/token"
+    assert request_line.status == 401
+    assert request_line.queries == 1
+
+def test_slow_query_parameters_are_logged_when_opted_in(client: TestClient, monkeypatch, caplog):
+    """SLOW_QUERY_LOG_PARAMS=true volta a registrar os valores, para depuração."""
+    from app import instrumentation
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_LOG_PARAMS", True)
+    with caplog.at_level("INFO", logger="app"):
+        client.post("/token", data={"username": "ninguem@example.com", "password": "x"})
+    slow = [record for record in caplog.records if record.name == "app.sql"]
+    assert slow and "ninguem@example.com" in slow[0].params
+
+def test_failed_queries_leave_no_start_time_on_the_connection():
+    """Uma consulta que falha não deixa o início na conexão para ser pareado com a próxima."""
+    from sqlalchemy import text
+    from app import instrumentation
+    engine = create_engine("sqlite://")
+    stats = instrumentation.QueryStats()
+    token = instrumentation._current_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(exc.OperationalError):
+                    conn.execute(text("SELECT * FROM tabela_que_nao_existe"))
+            conn.execute(text("SELECT 1"))
+            assert not conn.info.get("query_started_at")
+    finally:
+        instrumentation._current_stats.reset(token)
+    assert stats.count == 1
+
+def test_metrics_endpoint_exposes_route_latency_and_status(client: TestClient):
+    """/metrics expõe latência e status por template de rota, além das métricas do pool."""
+    client.get("/")
+    client.delete("/services/999999")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/"}' in body
+    assert 'http_requests_total{method="DELETE",route="/services/{service_id}",status="401"}' in body
+    assert "http_requests_in_progress" in body
+    assert "db_pool_checked_out_connections" in body
+
+def test_request_id_is_echoed_and_attached_to_logs(client: TestClient, caplog):
+    """O X-Request-ID recebido volta na resposta e aparece nos logs da requisição."""
+    from app.logging_config import RequestIdFilter
+    caplog.handler.addFilter(RequestIdFilter())
+    with caplog.at_level("INFO", logger="app"):
+        response = client.get("/", headers={"X-Request-ID": "req-123"})
+    assert response.headers["X-Request-ID"] == "req-123"
+    request_line = [record for record in caplog.records if record.name == "app.requests"][-1]
+    assert request_line.request_id == "req-123"
+
+    generated = client.get("/").headers["X-Request-ID"]
+    assert generated and generated != "req-123"
+
+def test_logging_is_configured_once_at_startup(client: TestClient):
+    """O startup da aplicação configura o logging; chamar de novo não duplica o handler."""
+    import logging
+    from app import logging_config
+    assert logging_config._listener is not None
+    handlers = list(logging.getLogger().handlers)
+    logging_config.configure_logging()
+    assert logging.getLogger().handlers == handlers
+
+def test_json_formatter_includes_extras_and_request_id():
+    import json
+    import logging
+    from app.logging_config import JsonFormatter, request_id_var
+    record = logging.LogRecord("app.crud", logging.INFO, __file__, 1, "booking_conflict user_id=%s", (7,), None)
+    record.user_id = 7
+    record.request_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "booking_conflict user_id=7"
+    assert entry["level"] == "info"
+    assert entry["logger"] == "app.crud"
+    assert entry["user_id"] == 7
+    assert entry["request_id"] == "abc"
+    assert request_id_var.get() is None
+
+def test_debug_sampling_filter_only_drops_debug_events():
+    import logging
+    from app.logging_config import DebugSamplingFilter
+    never = DebugSamplingFilter(0.0)
+    always = DebugSamplingFilter(1.0)
+    debug = logging.LogRecord("app", logging.DEBUG, __file__, 1, "x", None, None)
+    info = logging.LogRecord("app", logging.INFO, __file__, 1, "x", None, None)
+    assert not never.filter(debug)
+    assert never.filter(info)
+    assert always.filter(debug)
+
+def test_fast_json_lists_match_default_wire_format(client: TestClient, monkeypatch):
+    """Com FAST_JSON_RESPONSES as listagens devolvem exatamente os mesmos bytes e cursores."""
+    from app import serialization
+    email = "fastjson_owner@example.com"
+    client.post("/users/", json={"email": email, "password": "password123",
+                                 "name": "Dono", "organization_name": "Barbearia JSON"})
+    token = client.post("/token", data={"username": email, "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    client.post("/services/", headers=headers, json={"name": "Barba", "duration_minutes": 20, "price": 25.5})
+    client.post("/team/", headers=headers,
+                json={"email": "fastjson_barber@example.com", "password": "password123", "name": "Zé"})
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 0, "start_time": "09:00:00", "end_time": "12:00:00"})
+    for hour in ("09:00:00", "10:00:00"):
+        client.post("/appointments/", headers=headers, json={
+            "client_name": "Cliente", "client_email": "cliente@example.com",
+            "appointment_date": "2031-03-03", "appointment_time": hour, "service_id": service_id,
+        })
+
+    urls = ["/services/?limit=1", "/team/", "/availability/me/", "/appointments/me/", "/appointments/me/?limit=1"]
+    monkeypatch.setattr(serialization, "FAST_JSON_RESPONSES", False)
+    default = [client.get(url, headers=headers) for url in urls]
+    monkeypatch.setattr(serialization, "FAST_JSON_RESPONSES", True)
+    fast = [client.get(url, headers=headers) for url in urls]
+
+    for url, expected, response in zip(urls, default, fast):
+        assert response.status_code == expected.status_code == 200, url
+        assert response.content == expected.content, url
+        assert response.headers["content-type"] == expected.headers["content-type"]
+        assert response.headers.get("X-Next-Cursor") == expected.headers.get("X-Next-Cursor"), url
+    assert "X-Next-Cursor" in fast[0].headers
+
+def test_read_only_session_rejects_writes():
+    """As sessões das rotas GET não deixam gravar nada por engano."""
+    import pytest
+    from app import models
+    from app.database import make_read_only
+    from tests.conftest import TestingSessionLocal
+    db = make_read_only(TestingSessionLocal())
+    try:
+        db.add(models.Service(name="Intruso", duration_minutes=10, price=1.0))
+        with pytest.raises(RuntimeError):
+            db.flush()
+    finally:
+        db.close()
+
+def test_reads_use_replica_until_the_client_writes(client: TestClient, monkeypatch, tmp_path):
+    """GETs leem da réplica; depois de gravar, o mesmo cliente lê do primário por um tempo."""
+    from sqlalchemy import create_engine
+    from app import database, models
+    from app.cache import TTLCache
+    from app.database import Base, get_read_db
+    from app.main import app
+    from app.read_routing import ReadRouter
+    from tests.conftest import TestingSessionLocal, engine as primary
+
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=replica)
+    router = ReadRouter(primary, [replica], sticky_seconds=60, backend=TTLCache())
+    monkeypatch.setattr(database, "read_router", router)
+    monkeypatch.delitem(app.dependency_overrides, get_read_db)
+
+    def login(email):
+        client.post("/users/", json={"email": email, "password": "password123",
+                                     "name": "Dono", "organization_name": f"Barbearia {email}"})
+        token = client.post("/token", data={"username": email, "password": "password123"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    writer = login("replica_writer@example.com")
+    reader = login("replica_reader@example.com")
+
+    # A réplica está vazia: enquanto o cliente não grava nada, a listagem vem de lá.
+    assert client.get("/services/", headers=writer).json() == []
+
+    created = client.post("/services/", headers=writer,
+                          json={"name": "Corte", "duration_minutes": 30, "price": 40.0})
+    assert created.status_code == 201
+    assert [service["id"] for service in client.get("/services/", headers=writer).json()] == [created.json()["id"]]
+
+    # Outro cliente, sem gravação recente, continua na réplica mesmo com dados novos no primário.
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.email == "replica_reader@example.com").first()
+        db.add(models.Service(name="Barba", duration_minutes=20, price=25.0, organization_id=owner.organization_id))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/services/", headers=reader).json() == []
+    replica.dispose()
+
+def test_available_times_are_computed_on_the_primary(client: TestClient, monkeypatch, tmp_path):
+    """Horários livres vão para o cache: mesmo sem gravação recente, são lidos do primário."""
+    from datetime import time
+    from sqlalchemy import create_engine
+    from app import database, models
+    from app.cache import TTLCache
+    from app.database import Base, get_primary_read_db
+    from app.main import app
+    from app.read_routing import ReadRouter
+    from tests.conftest import TestingSessionLocal, engine as primary
+
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=replica)
+    monkeypatch.setattr(database, "read_router", ReadRouter(primary, [replica], sticky_seconds=60, backend=TTLCache()))
+    monkeypatch.delitem(app.dependency_overrides, get_primary_read_db)
+
+    email = "replica_slots@example.com"
+    client.post("/users/", json={"email": email, "password": "password123",
+                                 "name": "Dono", "organization_name": "Barbearia Primário"})
+    token = client.post("/token", data={"username": email, "password": "password123"}).json()["access_token"]
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.email == email).first()
+        db.add(models.Availability(user_id=owner.id, day_of_week=0, start_time=time(9), end_time=time(10)))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/appointments/available/", headers={"Authorization": f"Bearer {token}"},
+                          params={"date": "2033-01-03"})
+    assert response.json() == ["09:00:00", "09:30:00"]
+    replica.dispose()
@@ -0,0 +1,207 @@
+from collections import namedtuple
+from datetime import date, time
+
+from fastapi.testclient import TestClient
+
+from app import recurrence
+
+# --- Dados de Teste ---
+owner_email = "recurring_owner@example.com"
+password = "password123"
+first_day = "2032-01-06"  # terça-feira
+
+Rule = namedtuple("Rule", (
+    "recurring_id", "user_id", "start_date", "end_date", "interval_weeks", "appointment_time",
+    "service_id", "service_name", "price", "duration_minutes", "client_name", "client_email", "client_phone",
+))
+Exception_ = namedtuple("Exception_", ("recurring_id", "original_date", "cancelled", "new_date", "new_time"))
+
+# --- Testes da Expansão ---
+
+def test_rule_dates_follow_interval_and_end_date():
+    """As datas respeitam o intervalo em semanas, a janela e a data final."""
+    start = date(2032, 1, 6)
+    assert list(recurrence.rule_dates(start, 2, None, date(2032, 1, 7), date(2032, 2, 10))) == [
+        date(2032, 1, 20), date(2032, 2, 3),
+    ]
+    assert list(recurrence.rule_dates(start, 1, date(2032, 1, 13), date(2032, 1, 1), date(2032, 3, 1))) == [
+        date(2032, 1, 6), date(2032, 1, 13),
+    ]
+    assert recurrence.is_occurrence(start, 2, None, date(2032, 1, 20))
+    assert not recurrence.is_occurrence(start, 2, None, date(2032, 1, 13))
+
+def test_rules_intersect_only_when_dates_meet():
+    """Quinzenais alternadas não colidem; semanal e quinzenal no mesmo dia, sim."""
+    start = date(2032, 1, 6)
+    assert not recurrence.rules_intersect(start, 2, None, date(2032, 1, 13), 2, None)
+    assert recurrence.rules_intersect(start, 1, None, date(2032, 1, 13), 2, None)
+    assert not recurrence.rules_intersect(start, 1, date(2032, 1, 6), date(2032, 1, 13), 1, None)
+    assert not recurrence.rules_intersect(start, 1, None, date(2032, 1, 7), 1, None)
+
+def test_expand_applies_cancellations_and_moves():
+    """Exceções cancelam ou remarcam uma ocorrência, inclusive para dentro da janela."""
+    rule = Rule(1, 7, date(2032, 1, 6), None, 1, time(9, 0), 3, "Corte", 40.0, 30,
+                "Cliente", "cliente@example.com", None)
+    exceptions = [
+        Exception_(1, date(2032, 1, 13), True, None, None),
+        Exception_(1, date(2032, 1, 27), False, date(2032, 1, 19), time(10, 0)),
+    ]
+    occurrences = sorted(recurrence.expand([rule], exceptions, date(2032, 1, 10), date(2032, 1, 20)),
+                         key=lambda item: item.appointment_date)
+    assert [(item.original_date, item.appointment_date, item.appointment_time, item.moved)
+            for item in occurrences] == [
+        (date(2032, 1, 27), date(2032, 1, 19), time(10, 0), True),
+        (date(2032, 1, 20), date(2032, 1, 20), time(9, 0), False),
+    ]
+    assert recurrence.busy_by_day(occurrences)[(7, date(2032, 1, 20))] == [(time(9, 0), 30)]
+
+# --- Função Auxiliar para Autenticação ---
+
+def get_auth_headers(client: TestClient) -> dict:
+    client.post("/users/", json={"email": owner_email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Recorrente"})
+    token = client.post("/token", data={"username": owner_email, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def available(client: TestClient, headers: dict, day: str, service_id: int) -> list:
+    return client.get("/appointments/available/", headers=headers,
+                      params={"date": day, "service_id": service_id}).json()
+
+# --- Testes da API ---
+
+def test_recurring_rule_blocks_matching_weeks_only(client: TestClient):
+    """Uma regra quinzenal ocupa o horário só nas semanas dela, sem gravar ocorrências."""
+    headers = get_auth_headers(client)
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 2, "start_time": "09:00:00", "end_time": "10:00:00"})
+
+    response = client.post("/appointments/recurring/", headers=headers, json={
+        "client_name": "Fixo", "client_email": "fixo@example.com", "service_id": service_id,
+        "appointment_time": "09:00:00", "start_date": first_day, "interval_weeks": 2,
+    })
+    assert response.status_code == 201
+    assert response.json()["interval_weeks"] == 2
+
+    assert available(client, headers, first_day, service_id) == ["09:30:00"]
+    assert available(client, headers, "2032-01-13", service_id) == ["09:00:00", "09:30:00"]
+    assert available(client, headers, "2032-01-20", service_id) == ["09:30:00"]
+
+    direct = client.post("/appointments/", headers=headers, json={
+        "client_name": "Outro", "client_email": "outro@example.com",
+        "appointment_date": "2032-01-20", "appointment_time": "09:00:00", "service_id": service_id,
+    })
+    assert direct.status_code == 409
+    # Outra regra que cairia nas mesmas terças é recusada; a das semanas alternadas, não.
+    overlapping = {"client_name": "Outro", "client_email": "outro@example.com", "service_id": service_id,
+                   "appointment_time": "09:00:00", "start_date": "2032-02-03"}
+    assert client.post("/appointments/recurring/", headers=headers, json=overlapping).status_code == 409
+    alternate = {**overlapping, "start_date": "2032-01-13", "interval_weeks": 2}
+    assert client.post("/appointments/recurring/", headers=headers, json=alternate).status_code == 201
+    assert client.post("/appointments/recurring/", headers=headers,
+                       json={**alternate, "interval_weeks": 9}).status_code == 422
+
+    occurrences = client.get("/appointments/recurring/occurrences/", headers=headers,
+                              params={"date_from": first_day, "date_to": "2032-01-20"}).json()
+    assert [(item["appointment_date"], item["client_name"]) for item in occurrences] == [
+        (first_day, "Fixo"), ("2032-01-13", "Outro"), ("2032-01-20", "Fixo"),
+    ]
+
+def test_occurrence_exceptions_cancel_and_move(client: TestClient):
+    """Cancelar libera só aquela data; remarcar ocupa o novo horário e respeita conflitos."""
+    headers = get_auth_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    rule_id = client.get("/appointments/recurring/", headers=headers).json()[0]["id"]
+    base = f"/appointments/recurring/{rule_id}/occurrences"
+
+    assert client.put(f"{base}/{first_day}", headers=headers, json={"cancelled": True}).status_code == 200
+    assert available(client, headers, first_day, service_id) == ["09:00:00", "09:30:00"]
+    assert available(client, headers, "2032-01-20", service_id) == ["09:30:00"]
+
+    moved = client.put(f"{base}/2032-01-20", headers=headers, json={"appointment_time": "09:30:00"})
+    assert moved.status_code == 200
+    assert available(client, headers, "2032-01-20", service_id) == ["09:00:00"]
+
+    # Domingo não é ocorrência; 13/01 é da outra regra; 30/12 é antes do início.
+    assert client.put(f"{base}/2032-01-03", headers=headers,
+                      json={"cancelled": True}).status_code == 404
+    assert client.put(f"{base}/2032-02-03", headers=headers,
+                      json={"appointment_date": "2032-01-13"}).status_code == 409
+    assert client.put(f"{base}/2032-02-03", headers=headers,
+                      json={"appointment_date": "2031-12-30"}).status_code == 400
+
+    assert client.delete(f"/appointments/recurring/{rule_id}", headers=headers).status_code == 200
+    assert available(client, headers, "2032-01-20", service_id) == ["09:00:00", "09:30:00"]
+
+def test_occurrences_count_as_bookings_everywhere(client: TestClient):
+    """Ocorrências ocupam o intervalo inteiro e aparecem no quadro, nos relatórios e na agenda."""
+    client.post("/users/", json={"email": "recurring_board@example.com", "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Fixos"})
+    token = client.post("/token", data={"username": "recurring_board@example.com",
+                                        "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 50.0}).json()["id"]
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 2, "start_time": "14:00:00", "end_time": "16:00:00"})
+    rule = {"client_name": "Fixo", "client_email": "fixo@example.com", "service_id": service_id,
+            "appointment_time": "14:00:00", "start_date": "2032-03-02", "end_date": "2032-03-09"}
+    rule_id = client.post("/appointments/recurring/", headers=headers, json=rule).json()["id"]
+
+    booking = {"client_name": "Avulso", "client_email": "avulso@example.com",
+               "appointment_date": "2032-03-02", "service_id": service_id}
+    assert client.post("/appointments/", headers=headers,
+                       json={**booking, "appointment_time": "14:15:00"}).status_code == 409
+    assert client.post("/appointments/", headers=headers,
+                       json={**booking, "appointment_time": "14:30:00"}).status_code == 201
+    assert client.post("/appointments/recurring/", headers=headers,
+                       json={**rule, "appointment_time": "14:45:00"}).status_code == 409
+    assert client.put(f"/appointments/recurring/{rule_id}/occurrences/2032-03-09", headers=headers,
+                      json={"appointment_date": "2032-03-02", "appointment_time": "14:20:00"}).status_code == 409
+
+    board = client.get("/schedule/board/", headers=headers, params={"date_from": "2032-03-02"}).json()
+    barber = board["days"][0]["barbers"][0]
+    assert [(item["appointment_time"], item["id"] is None, item["recurring_id"]) for item in barber["items"]] == [
+        ("14:00:00", True, rule_id), ("14:30:00", False, None),
+    ]
+    assert (barber["appointments"], barber["revenue"], barber["booked_minutes"]) == (2, 100.0, 60)
+
+    period = {"date_from": "2032-03-01", "date_to": "2032-03-31"}
+    assert client.get("/reports/revenue/", headers=headers, params=period).json()["total_revenue"] == 150.0
+    assert client.get("/reports/statuses/", headers=headers, params=period).json()["statuses"] == {"pending": 3}
+    occupancy = client.get("/reports/occupancy/", headers=headers, params=period).json()["barbers"][0]
+    assert (occupancy["appointments"], occupancy["booked_minutes"]) == (3, 90)
+
+    first = client.get("/appointments/me/", headers=headers, params={**period, "limit": 2})
+    assert [(item["appointment_date"], item["recurring_id"]) for item in first.json()] == [
+        ("2032-03-02", rule_id), ("2032-03-02", None),
+    ]
+    rest = client.get("/appointments/me/", headers=headers,
+                      params={**period, "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [(item["appointment_date"], item["recurring_id"]) for item in rest.json()] == [("2032-03-09", rule_id)]
+    assert "X-Next-Cursor" not in rest.headers
+    # Sem date_to a janela não tem fim: só os agendamentos gravados.
+    assert len(client.get("/appointments/me/", headers=headers, params={"date_from": "2032-03-01"}).json()) == 1
+
+def test_new_rule_cannot_overlap_moved_occurrence(client: TestClient):
+    """Uma ocorrência remarcada para outro dia da semana também bloqueia regras novas."""
+    headers = get_auth_headers(client)
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    rule = {"client_name": "Fixo", "client_email": "fixo@example.com", "service_id": service_id,
+            "appointment_time": "11:00:00", "start_date": "2032-05-04", "end_date": "2032-05-11"}
+    rule_id = client.post("/appointments/recurring/", headers=headers, json=rule).json()["id"]
+    assert client.put(f"/appointments/recurring/{rule_id}/occurrences/2032-05-04", headers=headers,
+                      json={"appointment_date": "2032-05-06", "appointment_time": "15:00:00"}).status_code == 200
+
+    thursday = {**rule, "start_date": "2032-04-29", "end_date": None, "appointment_time": "15:15:00"}
+    assert client.post("/appointments/recurring/", headers=headers, json=thursday).status_code == 409
+    assert client.post("/appointments/recurring/", headers=headers,
+                       json={**thursday, "appointment_time": "15:30:00"}).status_code == 201
+    # O agendamento avulso ainda vê a regra e a ocorrência remarcada.
+    booking = {"client_name": "Avulso", "client_email": "avulso@example.com", "service_id": service_id,
+               "appointment_date": "2032-05-06"}
+    assert client.post("/appointments/", headers=headers,
+                       json={**booking, "appointment_time": "15:00:00"}).status_code == 409
+    assert client.post("/appointments/", headers=headers,
+                       json={**booking, "appointment_time": "16:00:00"}).status_code == 201
@@ -0,0 +1,184 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.dialects import postgresql
+
+from app import crud, models, reports
+from tests.conftest import TestingSessionLocal
+
+# --- Dados de Teste ---
+owner_email = "reports_owner@example.com"
+barber_email = "reports_barber@example.com"
+password = "password123"
+period = {"date_from": "2031-01-01", "date_to": "2031-02-28"}
+
+# --- Funções Auxiliares ---
+
+def login(client: TestClient, email: str) -> dict:
+    response = client.post("/token", data={"username": email, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def book(client: TestClient, headers: dict, service_id: int, day: str, hour: str) -> int:
+    response = client.post("/appointments/", headers=headers, json={
+        "client_name": "Cliente Relatório", "client_email": "cliente@example.com",
+        "appointment_date": day, "appointment_time": hour, "service_id": service_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def read_all(client: TestClient, headers: dict) -> list:
+    return [
+        client.get("/reports/revenue/", headers=headers, params=period).json(),
+        client.get("/reports/revenue/", headers=headers, params={**period, "period": "month"}).json(),
+        client.get("/reports/statuses/", headers=headers, params=period).json(),
+        client.get("/reports/occupancy/", headers=headers, params=period).json(),
+    ]
+
+# --- Testes dos Relatórios ---
+
+def test_reports_follow_bookings_and_survive_rebuild(client: TestClient, monkeypatch):
+    """Receita, status e ocupação saem dos resumos, batem com o cálculo direto e com a reconstrução."""
+    client.post("/users/", json={"email": owner_email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Relatórios"})
+    owner = login(client, owner_email)
+    owner_id = client.get("/users/me/", headers=owner).json()["id"]
+    service_id = client.post("/services/", headers=owner,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    client.post("/team/", headers=owner, json={"email": barber_email, "password": password, "name": "Zé"})
+    barber = login(client, barber_email)
+    # Segundas, 09:00-11:00: 8 segundas entre 01/01 e 28/02 de 2031.
+    client.post("/availability/", headers=owner,
+                json={"day_of_week": 1, "start_time": "09:00:00", "end_time": "11:00:00"})
+
+    book(client, owner, service_id, "2031-01-06", "09:00:00")
+    cancelled = book(client, owner, service_id, "2031-01-06", "10:00:00")
+    done = book(client, owner, service_id, "2031-02-03", "09:00:00")
+    book(client, barber, service_id, "2031-02-03", "09:00:00")
+    client.patch(f"/appointments/{cancelled}/status", headers=owner, json={"status": "cancelled"})
+    client.patch(f"/appointments/{done}/status", headers=owner, json={"status": "Completed"})
+
+    daily, monthly, statuses, occupancy = read_all(client, owner)
+    assert daily["total_revenue"] == 120.0
+    assert [(row["period"], row["appointments"], row["cancelled"]) for row in daily["rows"]] == [
+        ("2031-01-06", 1, 1), ("2031-02-03", 2, 0),
+    ]
+    assert [(row["period"], row["revenue"]) for row in monthly["rows"]] == [
+        ("2031-01-01", 40.0), ("2031-02-01", 80.0),
+    ]
+    assert statuses["statuses"] == {"cancelled": 1, "completed": 1, "pending": 2}
+    mine = next(entry for entry in occupancy["barbers"] if entry["user_id"] == owner_id)
+    assert (mine["booked_minutes"], mine["available_minutes"]) == (60, 8 * 120)
+    assert mine["occupancy"] == round(60 / 960, 4)
+
+    # O cálculo direto sobre appointments dá o mesmo resultado.
+    monkeypatch.setattr(crud, "SCHEDULE_SUMMARY_ENABLED", False)
+    assert read_all(client, owner) == [daily, monthly, statuses, occupancy]
+    monkeypatch.setattr(crud, "SCHEDULE_SUMMARY_ENABLED", True)
+
+    # Resumo corrompido: a reconstrução volta aos valores certos.
+    db = TestingSessionLocal()
+    try:
+        db.execute(update(models.ScheduleDaySummary).values(revenue=0, appointments=0))
+        db.commit()
+        organization_id = db.get(models.User, owner_id).organization_id
+        crud.rebuild_summaries(db, organization_id=organization_id)
+    finally:
+        db.close()
+    assert read_all(client, owner) == [daily, monthly, statuses, occupancy]
+
+def test_service_changes_do_not_drift_the_summaries(client: TestClient, monkeypatch):
+    """Preço e duração ficam gravados no agendamento: editar o serviço não desequilibra o +1/-1."""
+    email = "reports_drift@example.com"
+    client.post("/users/", json={"email": email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Preços"})
+    owner = login(client, email)
+    service_id = client.post("/services/", headers=owner,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    kept = book(client, owner, service_id, "2031-01-13", "09:00:00")
+    removed = book(client, owner, service_id, "2031-01-13", "10:00:00")
+
+    client.put(f"/services/{service_id}", headers=owner, json={"price": 100.0, "duration_minutes": 60})
+    assert client.delete(f"/appointments/{removed}", headers=owner).status_code == 200
+    book(client, owner, service_id, "2031-01-14", "09:00:00")
+
+    daily, _, _, occupancy = read_all(client, owner)
+    assert [(row["period"], row["revenue"]) for row in daily["rows"]] == [
+        ("2031-01-13", 40.0), ("2031-01-14", 100.0),
+    ]
+    assert daily["total_revenue"] == 140.0
+    assert occupancy["barbers"][0]["booked_minutes"] == 90
+    # Os horários livres usam a mesma duração gravada: o das 09:00 ainda ocupa 30 minutos.
+    client.post("/availability/", headers=owner,
+                json={"day_of_week": 1, "start_time": "09:00:00", "end_time": "11:00:00"})
+    assert client.get("/appointments/available/", headers=owner, params={"date": "2031-01-13"}).json() == [
+        "09:30:00", "10:00:00", "10:30:00",
+    ]
+
+    monkeypatch.setattr(crud, "SCHEDULE_SUMMARY_ENABLED", False)
+    assert read_all(client, owner)[0] == daily
+    monkeypatch.setattr(crud, "SCHEDULE_SUMMARY_ENABLED", True)
+    assert client.patch(f"/appointments/{kept}/status", headers=owner,
+                        json={"status": "cancelled"}).status_code == 200
+    assert read_all(client, owner)[0]["total_revenue"] == 100.0
+
+def test_rebuild_after_price_change_and_cancel(client: TestClient):
+    """Mudar o preço e depois cancelar: os resumos incrementais já batem com a reconstrução."""
+    email = "reports_rebuild@example.com"
+    client.post("/users/", json={"email": email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Reconstrução"})
+    owner = login(client, email)
+    service_id = client.post("/services/", headers=owner,
+                             json={"name": "Barba", "duration_minutes": 20, "price": 30.0}).json()["id"]
+    first = book(client, owner, service_id, "2031-01-20", "09:00:00")
+    client.put(f"/services/{service_id}", headers=owner, json={"price": 50.0})
+    book(client, owner, service_id, "2031-01-20", "10:00:00")
+    client.patch(f"/appointments/{first}/status", headers=owner, json={"status": "cancelled"})
+
+    before = read_all(client, owner)
+    assert before[0]["total_revenue"] == 50.0
+    db = TestingSessionLocal()
+    try:
+        crud.rebuild_summaries(db)
+    finally:
+        db.close()
+    assert read_all(client, owner) == before
+
+class RecordingSession:
+    """Sessão falsa ligada a um engine Postgres (sem conexão): guarda o SQL emitido."""
+
+    def __init__(self):
+        self.engine = create_engine("postgresql+psycopg2://barber@localhost/barberapi")
+        self.statements = []
+
+    def get_bind(self):
+        return self.engine
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+    def commit(self):
+        self.statements.append("COMMIT")
+
+def test_postgres_rebuild_and_writes_share_an_organization_lock():
+    """No Postgres a reconstrução pega o lock exclusivo da barbearia e cada escrita o compartilhado."""
+    db = RecordingSession()
+    crud.rebuild_summaries(db, organization_id=7)
+    assert db.statements[0].startswith("SELECT pg_advisory_xact_lock(")
+    assert [statement.split()[0] for statement in db.statements[1:]] == ["DELETE", "DELETE", "INSERT", "INSERT", "COMMIT"]
+
+    db = RecordingSession()
+    crud.apply_summary_delta(db, models.Appointment.id == 1, sign=-1)
+    assert "pg_advisory_xact_lock_shared" in db.statements[0]
+    assert [statement.split()[0] for statement in db.statements[1:]] == ["INSERT", "INSERT"]
+
+def test_reports_are_only_for_owners(client: TestClient):
+    """Barbeiros recebem 403."""
+    barber = login(client, barber_email)
+    assert client.get("/reports/revenue/", headers=barber, params=period).status_code == 403
+
+def test_weekday_counts():
+    """Conta as ocorrências de cada dia da semana no intervalo (segunda=0)."""
+    assert reports.weekday_counts(date(2031, 1, 1), date(2031, 1, 1)) == [0, 0, 1, 0, 0, 0, 0]
+    assert reports.weekday_counts(date(2031, 1, 1), date(2031, 2, 28)) == [8, 8, 9, 9, 9, 8, 8]
@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+from app import crud
+
+# --- Dados de Teste ---
+owner_email = "schedule_owner@example.com"
+barber_email = "schedule_barber@example.com"
+password = "password123"
+board_day = "2031-01-06"  # segunda-feira
+
+# --- Função Auxiliar para Autenticação ---
+
+def login(client: TestClient, email: str) -> dict:
+    response = client.post("/token", data={"username": email, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def book(client: TestClient, headers: dict, service_id: int, hour: str) -> int:
+    response = client.post("/appointments/", headers=headers, json={
+        "client_name": "Cliente Quadro", "client_email": "cliente@example.com",
+        "appointment_date": board_day, "appointment_time": hour, "service_id": service_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def barber_entry(board: dict, user_id: int) -> dict:
+    [day] = board["days"]
+    return next(entry for entry in day["barbers"] if entry["user_id"] == user_id)
+
+# --- Testes do Quadro da Agenda ---
+
+def test_schedule_board_shows_whole_shop_and_follows_changes(client: TestClient, monkeypatch):
+    """O quadro traz os agendamentos de todos os barbeiros e o resumo acompanha cancelamentos e exclusões."""
+    client.post("/users/", json={"email": owner_email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Quadro"})
+    owner = login(client, owner_email)
+    owner_id = client.get("/users/me/", headers=owner).json()["id"]
+    service_id = client.post("/services/", headers=owner,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    barber_id = client.post("/team/", headers=owner,
+                            json={"email": barber_email, "password": password, "name": "Zé"}).json()["id"]
+    barber = login(client, barber_email)
+    client.post("/availability/", headers=owner,
+                json={"day_of_week": 1, "start_time": "09:00:00", "end_time": "18:00:00"})
+
+    first = book(client, owner, service_id, "10:00:00")
+    book(client, owner, service_id, "11:00:00")
+    barber_appointment = book(client, barber, service_id, "10:00:00")
+
+    response = client.get("/schedule/board/", headers=owner, params={"date_from": board_day})
+    assert response.status_code == 200
+    board = response.json()
+    assert board["days"][0]["appointments"] == 3
+    assert board["days"][0]["revenue"] == 120.0
+
+    mine = barber_entry(board, owner_id)
+    assert (mine["appointments"], mine["booked_minutes"], mine["available_minutes"]) == (2, 60, 540)
+    assert mine["occupancy"] == round(60 / 540, 4)
+    assert [item["appointment_time"] for item in mine["items"]] == ["10:00:00", "11:00:00"]
+    assert {(item["service_name"], item["price"]) for item in mine["items"]} == {("Corte", 40.0)}
+    assert barber_entry(board, barber_id)["occupancy"] is None
+
+    client.patch(f"/appointments/{first}/status", headers=owner, json={"status": "cancelled"})
+    client.delete(f"/appointments/{barber_appointment}", headers=barber)
+
+    board = client.get("/schedule/board/", headers=owner, params={"date_from": board_day}).json()
+    mine = barber_entry(board, owner_id)
+    assert (mine["appointments"], mine["cancelled"], mine["revenue"]) == (1, 1, 40.0)
+    assert barber_entry(board, barber_id)["appointments"] == 0
+    assert barber_entry(board, barber_id)["items"] == []
+
+    # Sem a tabela de resumo o quadro é calculado dos agendamentos e sai igual.
+    monkeypatch.setattr(crud, "SCHEDULE_SUMMARY_ENABLED", False)
+    assert client.get("/schedule/board/", headers=owner, params={"date_from": board_day}).json() == board
+
+def test_schedule_board_is_only_for_owners(client: TestClient):
+    """Barbeiros recebem 403 e intervalos acima do limite são recusados."""
+    barber = login(client, barber_email)
+    assert client.get("/schedule/board/", headers=barber).status_code == 403
+
+    owner = login(client, owner_email)
+    response = client.get("/schedule/board/", headers=owner,
+                          params={"date_from": "2031-01-01", "date_to": "2031-03-01"})
+    assert response.status_code == 400
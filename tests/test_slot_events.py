@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import slot_events
+
+# --- Dados de Teste ---
+owner_email = "events_owner@example.com"
+password = "password123"
+event_day = "2031-01-07"  # terça-feira
+
+# --- Testes do Broker ---
+
+def test_in_process_broker_delivers_across_threads_and_resyncs_on_overflow():
+    """Eventos publicados de outra thread chegam; fila cheia vira um único resync."""
+    async def scenario():
+        broker = slot_events.InProcessBroker(queue_size=2)
+        subscription = broker.subscribe(["slots:1:2031-01-07", "slots:1"])
+        other = broker.subscribe(["slots:2"])
+
+        publisher = threading.Thread(target=broker.publish, args=("slots:1", {"type": "availability_changed"}))
+        publisher.start()
+        publisher.join()
+        assert await subscription.get(timeout=1) == {"type": "availability_changed"}
+        assert await other.get(timeout=0.01) is None
+
+        for minute in range(3):
+            broker.publish("slots:1:2031-01-07", {"type": "slot_taken", "minute": minute})
+        await asyncio.sleep(0)
+        assert await subscription.get(timeout=1) == {"type": "resync"}
+
+        subscription.close()
+        other.close()
+        assert broker.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+def test_sse_stream_formats_events_and_heartbeats():
+    """O stream começa pelo snapshot, repassa os eventos e manda ping quando fica quieto."""
+    async def scenario():
+        broker = slot_events.InProcessBroker()
+        subscription = broker.subscribe(["slots:1"])
+        stream = slot_events.sse_stream(subscription, {"type": "snapshot", "times": []}, heartbeat=0.01)
+
+        assert await stream.__anext__() == 'event: snapshot\ndata: {"type":"snapshot","times":[]}\n\n'
+        assert await stream.__anext__() == ": ping\n\n"
+        broker.publish("slots:1", {"type": "availability_changed", "user_id": 1})
+        assert await stream.__anext__() == (
+            'event: availability_changed\ndata: {"type":"availability_changed","user_id":1}\n\n'
+        )
+        await stream.aclose()
+        assert broker.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+# --- Teste do WebSocket ---
+
+def test_websocket_pushes_slot_changes(client: TestClient):
+    """O cliente recebe o snapshot e depois cada horário ocupado ou liberado, sem polling."""
+    client.post("/users/", json={"email": owner_email, "password": password,
+                                 "name": "Dono", "organization_name": "Barbearia Eventos"})
+    token = client.post("/token", data={"username": owner_email, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    service_id = client.post("/services/", headers=headers,
+                             json={"name": "Corte", "duration_minutes": 30, "price": 40.0}).json()["id"]
+    client.post("/availability/", headers=headers,
+                json={"day_of_week": 2, "start_time": "09:00:00", "end_time": "10:00:00"})
+
+    with client.websocket_connect(f"/ws/slots?date={event_day}&service_id={service_id}&token={token}") as socket:
+        assert socket.receive_json() == {
+            "type": "snapshot", "date": event_day, "times": ["09:00:00", "09:30:00"],
+        }
+
+        appointment_id = client.post("/appointments/", headers=headers, json={
+            "client_name": "Cliente", "client_email": "cliente@example.com",
+            "appointment_date": event_day, "appointment_time": "09:00:00", "service_id": service_id,
+        }).json()["id"]
+        taken = socket.receive_json()
+        assert (taken["type"], taken["date"], taken["time"], taken["service_id"]) == (
+            "slot_taken", event_day, "09:00:00", service_id,
+        )
+
+        client.patch(f"/appointments/{appointment_id}/status", headers=headers, json={"status": "cancelled"})
+        assert socket.receive_json()["type"] == "slot_freed"
+
+        client.post("/availability/", headers=headers,
+                    json={"day_of_week": 2, "start_time": "14:00:00", "end_time": "15:00:00"})
+        assert socket.receive_json()["type"] == "availability_changed"
+
+def test_websocket_rejects_invalid_token(client: TestClient):
+    """Token inválido fecha a conexão antes do accept."""
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect(f"/ws/slots?date={event_day}&token=invalido"):
+            pass
+    assert error.value.code == 1008
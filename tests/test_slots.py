@@ -0,0 +1,169 @@
+from datetime import date, time, timedelta
+from fastapi.testclient import TestClient
+from app import availability_cache, crud, slots
+from app.cache import TTLCache
+
+test_slots_user_email = "slots_test@example.com"
+test_slots_user_password = "password123"
+
+# --- Testes do motor de intervalos ---
+
+def test_merge_intervals_joins_overlapping_windows():
+    assert slots.merge_intervals([(600, 720), (540, 600), (780, 840), (800, 900)]) == [(540, 720), (780, 900)]
+
+def test_subtract_intervals():
+    free = [(540, 720), (780, 1080)]
+    busy = [(600, 660), (700, 800), (900, 960)]
+    assert slots.subtract_intervals(free, busy) == [(540, 600), (660, 700), (800, 900), (960, 1080)]
+
+def test_free_slots_respect_service_duration():
+    """Um atendimento de 60 min não pode começar 30 min antes de outro agendamento."""
+    windows = [(540, 720)]
+    busy = slots.busy_intervals([(600, 60)])
+    assert slots.free_slots(windows, busy, duration=60, step=30) == [540, 660]
+    assert slots.free_slots(windows, busy, duration=30, step=30) == [540, 570, 660, 690]
+
+def test_free_slots_realign_to_grid_after_busy_interval():
+    windows = [(540, 660)]
+    busy = slots.busy_intervals([(540, 45)])
+    assert slots.free_slots(windows, busy, duration=30, step=30) == [600, 630]
+    assert slots.free_slots(windows, busy, duration=30, step=15) == [585, 600, 615, 630]
+
+# --- Testes do endpoint ---
+
+def get_auth_headers(client: TestClient) -> dict:
+    client.post(
+        "/users/",
+        json={"email": test_slots_user_email, "password": test_slots_user_password,
+              "name": "Slots", "organization_name": "Barbearia Slots"}
+    )
+    response = client.post("/token", data={"username": test_slots_user_email, "password": test_slots_user_password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_available_times_with_service_duration(client: TestClient):
+    """Horários livres consideram a duração do serviço e dos agendamentos."""
+    headers = get_auth_headers(client)
+    query_date = date.today() + timedelta(days=30)
+
+    client.post(
+        "/availability/",
+        headers=headers,
+        # A API recebe domingo = 0.
+        json={"day_of_week": (query_date.weekday() + 1) % 7, "start_time": "09:00:00", "end_time": "12:00:00"},
+    )
+    service = client.post(
+        "/services/", headers=headers,
+        json={"name": "Corte Longo", "duration_minutes": 60, "price": 80.0},
+    ).json()
+    client.post(
+        "/appointments/",
+        headers=headers,
+        json={"client_name": "Cliente Slots", "client_email": "cliente@slots.com",
+              "appointment_date": query_date.isoformat(), "appointment_time": "10:00:00",
+              "service_id": service["id"]},
+    )
+
+    response = client.get(
+        "/appointments/available/",
+        headers=headers,
+        params={"date": query_date.isoformat(), "service_id": service["id"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == ["09:00:00", "11:00:00"]
+
+    response = client.get(
+        "/appointments/available/",
+        headers=headers,
+        params={"date": query_date.isoformat(), "step": 15},
+    )
+    assert response.status_code == 200
+    assert "09:45:00" in response.json()
+    assert "10:30:00" not in response.json()
+
+def test_available_times_unknown_service(client: TestClient):
+    headers = get_auth_headers(client)
+    response = client.get(
+        "/appointments/available/",
+        headers=headers,
+        params={"date": date.today().isoformat(), "service_id": 99999},
+    )
+    assert response.status_code == 404
+
+def test_available_times_range(client: TestClient):
+    """A grade de vários dias reaproveita o cálculo diário."""
+    headers = get_auth_headers(client)
+    query_date = date.today() + timedelta(days=30)
+    me = client.get("/users/me/", headers=headers).json()
+
+    response = client.get(
+        "/appointments/available/range/",
+        headers=headers,
+        params={"date_from": query_date.isoformat(),
+                "date_to": (query_date + timedelta(days=1)).isoformat(),
+                "barber_ids": [me["id"]]},
+    )
+    assert response.status_code == 200
+    grid = response.json()["barbers"][str(me["id"])]
+    assert grid[query_date.isoformat()] == client.get(
+        "/appointments/available/", headers=headers, params={"date": query_date.isoformat()}
+    ).json()
+    assert grid[(query_date + timedelta(days=1)).isoformat()] == []
+
+def test_available_times_range_invalid_interval(client: TestClient):
+    headers = get_auth_headers(client)
+    response = client.get(
+        "/appointments/available/range/",
+        headers=headers,
+        params={"date_from": "2030-01-10", "date_to": "2030-01-01"},
+    )
+    assert response.status_code == 400
+
+def test_available_times_cache_and_etag(client: TestClient, monkeypatch):
+    """Consultas repetidas saem do cache (304 com ETag) até um agendamento mudar o dia."""
+    headers = get_auth_headers(client)
+    query_date = date.today() + timedelta(days=30)
+    params = {"date": query_date.isoformat(), "step": 60}
+
+    first = client.get("/appointments/available/", headers=headers, params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    def fail_query(*args, **kwargs):
+        raise AssertionError("horários recalculados com o cache válido")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(crud, "get_available_times", fail_query)
+        cached = client.get("/appointments/available/", headers={**headers, "If-None-Match": etag}, params=params)
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+
+    service_id = client.get("/services/", headers=headers).json()[0]["id"]
+    booked = client.post(
+        "/appointments/",
+        headers=headers,
+        json={"client_name": "Cliente Cache", "client_email": "cache@slots.com",
+              "appointment_date": query_date.isoformat(), "appointment_time": first.json()[0],
+              "service_id": service_id},
+    )
+    assert booked.status_code == 201
+
+    refreshed = client.get("/appointments/available/", headers={**headers, "If-None-Match": etag}, params=params)
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert first.json()[0] not in refreshed.json()
+
+def test_evicted_generation_does_not_revive_cached_slots(monkeypatch):
+    """Se o LRU despeja a geração de um dia, as respostas antigas continuam inalcançáveis."""
+    monkeypatch.setattr(availability_cache, "backend", TTLCache(maxsize=100, ttl=30))
+    day = date(2031, 1, 7)
+    stale_key = availability_cache.cache_key(1, 1, day, None, 30)
+    availability_cache.store(stale_key, [time(9, 0)])
+
+    availability_cache.invalidate_day(1, day)
+    availability_cache.backend.delete(f"slots:gen:day:1:{day.isoformat()}")
+
+    key = availability_cache.cache_key(1, 1, day, None, 30)
+    assert key != stale_key
+    assert availability_cache.get(key) is None
+    assert availability_cache.cache_key(1, 1, day, None, 30) == key
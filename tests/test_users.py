@@ -1,5 +1,10 @@
+import threading
+
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
 from app.main import app
+from app import auth, crud, models
+from tests.conftest import TestingSessionLocal
 
 test_user_email = "teste@examp.com"
 test_user_password = "senha123"
@@ -60,4 +65,93 @@ def test_login_nonexistent_user(client: TestClient):
         data={"username": "nonexistent@example.com", "password": "password123"}
     )
     assert response.status_code == 401 
-    assert response.json() == {"detail": "E-mail ou senha incorretos"}
\ No newline at end of file
+    assert response.json() == {"detail": "E-mail ou senha incorretos"}
+
+# Testes do principal em cache
+cache_user_email = "principal_cache@example.com"
+
+def get_cache_user_headers(client: TestClient) -> dict:
+    client.post(
+        "/users/",
+        json={"email": cache_user_email, "password": test_user_password,
+              "name": "Cache", "organization_name": "Barbearia Cache"}
+    )
+    response = client.post("/token", data={"username": cache_user_email, "password": test_user_password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_principal_cache_skips_user_lookup(client: TestClient, monkeypatch):
+    """Com o principal em cache, as rotas de leitura não consultam o usuário."""
+    headers = get_cache_user_headers(client)
+    assert client.get("/services/", headers=headers).status_code == 200
+
+    def fail_lookup(*args, **kwargs):
+        raise AssertionError("usuário consultado no banco com cache quente")
+
+    monkeypatch.setattr(auth, "_load_principal", fail_lookup)
+    assert client.get("/services/", headers=headers).status_code == 200
+
+def test_suspended_organization_invalidates_principal(client: TestClient):
+    """Suspender a barbearia invalida o cache e bloqueia o acesso."""
+    headers = get_cache_user_headers(client)
+    assert client.get("/availability/me/", headers=headers).status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == cache_user_email).first()
+        user.organization.is_active = False
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/availability/me/", headers=headers)
+    assert response.status_code == 403
+
+def test_login_rehashes_password_when_cost_changes(client: TestClient, monkeypatch):
+    """Com outro custo do bcrypt configurado, o login refaz o hash da senha."""
+    get_cache_user_headers(client)
+    monkeypatch.setattr(auth, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4))
+
+    response = client.post("/token", data={"username": cache_user_email, "password": test_user_password})
+    assert response.status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == cache_user_email).first()
+        assert user.hashed_password.startswith("$2b$04$")
+    finally:
+        db.close()
+
+def test_login_returns_503_when_hash_pool_is_saturated(client: TestClient, monkeypatch):
+    """Com a fila de hashing cheia, o login falha rápido com 503."""
+    saturated = threading.BoundedSemaphore(1)
+    saturated.acquire()
+    monkeypatch.setattr(auth, "_password_slots", saturated)
+    monkeypatch.setattr(auth, "PASSWORD_HASH_QUEUE_TIMEOUT", 0)
+
+    response = client.post("/token", data={"username": cache_user_email, "password": test_user_password})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_signup_allocates_next_free_slug(client: TestClient):
+    """Barbearias com o mesmo nome recebem o próximo sufixo livre do slug."""
+    slugs = []
+    for index in range(3):
+        email = f"slug{index}@example.com"
+        response = client.post(
+            "/users/",
+            json={"email": email, "password": test_user_password,
+                  "name": "Slug", "organization_name": "Barbearia do Zé"}
+        )
+        assert response.status_code == 200
+        db = TestingSessionLocal()
+        try:
+            slugs.append(db.query(models.User).filter(models.User.email == email).first().organization.slug)
+        finally:
+            db.close()
+    assert slugs == ["barbearia-do-ze", "barbearia-do-ze-1", "barbearia-do-ze-2"]
+
+def test_next_free_slug_fills_gaps():
+    assert crud.next_free_slug("barbearia", set()) == "barbearia"
+    assert crud.next_free_slug("barbearia", {"barbearia", "barbearia-1", "barbearia-3"}) == "barbearia-2"
+    assert crud.next_free_slug("barbearia", {"barbearia", "barbearia-top"}) == "barbearia-1"